@@ -1,24 +1,113 @@
 import maya.OpenMayaMPx as mpx
 import maya.OpenMaya as om
+import maya.cmds as cmds
+import maya.utils
 
-import json
+import logging
 import os
+import weakref
+
+import numpy
+
+import facenetUtils
+
+log = logging.getLogger(__name__)
+
+# shared between every facenetTrack node, created when the plugin loads
+track_cache = None
+track_loader = None
+disk_cache = None
+
+# how often streaming nodes check for a new frame
+STREAM_POLL_SECONDS = 1.0 / 120.0
 
 class FacenetTrack(mpx.MPxNode):
     nodeName = 'facenetTrack'
     nodeId = om.MTypeId(0x0000001)
 
     faceTrack = om.MObject()
+    headTrack = om.MObject()
     startFrame = om.MObject()
     time = om.MObject()
+    outFrame = om.MObject()
     landmarks = om.MObject()
     position = om.MObject()
-    anim_dict = om.MObject()
-    head_dict = om.MObject()
     enableDelta = om.MObject()
+    cacheFrames = om.MObject()
+    windowSize = om.MObject()
+    gapPolicy = om.MObject()
+    actorIndex = om.MObject()
+    landmarkMask = om.MObject()
+    smoothFilter = om.MObject()
+    smoothSigma = om.MObject()
+    smoothWindow = om.MObject()
+    smoothOrder = om.MObject()
+    smoothMinCutoff = om.MObject()
+    smoothBeta = om.MObject()
+    sourceFps = om.MObject()
+    sceneFps = om.MObject()
+    resampleMethod = om.MObject()
+    streamSource = om.MObject()
+    recordPath = om.MObject()
+
+    # python instances by node hash code so the attribute callback can find them, hash codes
+    # are not unique so each one holds weak references to every node sharing it
+    instances = {}
 
     def __init__(self):
         mpx.MPxNode.__init__(self)
+        self.callback_id = None
+        self.handle = None
+        self.tracks = {'face': None, 'head': None}
+        self.track_keys = {}
+        self.loads = {}
+        self.play_track = None
+        self.play_settings = None
+        self.mask_indices = None
+        self.frame_cache = facenetUtils.FrameCache()
+        self.cache_start_frame = None
+        self.stream = None
+        self.stream_timer_id = None
+        self.stream_seq = 0
+        self.stream_output_seq = 0
+        self.stream_mask = (None, None)
+        self.stream_latency = None
+        self.recorder = None
+
+    def __del__(self):
+        if self.callback_id is not None:
+            om.MMessage.removeCallback(self.callback_id)
+        for load in self.loads.values():
+            load.cancel()
+        for slot in self.tracks:
+            self.swapTrack(slot, None, None)
+        self.setStream('')
+        self.setRecording('')
+
+    @classmethod
+    def fromMObject(cls, mobject):
+        handle = om.MObjectHandle(mobject)
+        for node_ref in cls.instances.get(handle.hashCode(), ()):
+            node = node_ref()
+            if node is not None and node.handle == handle:
+                return node
+        return None
+
+    @classmethod
+    def dropInstance(cls, hash_code, node_ref):
+        node_refs = cls.instances.get(hash_code)
+        if node_refs is not None and node_ref in node_refs:
+            node_refs.remove(node_ref)
+            if not node_refs:
+                del cls.instances[hash_code]
+
+    @classmethod
+    def fromName(cls, node_name):
+        selection = om.MSelectionList()
+        selection.add(node_name)
+        mobject = om.MObject()
+        selection.getDependNode(0, mobject)
+        return cls.fromMObject(mobject)
 
     @classmethod
     def creator(cls):
@@ -30,6 +119,7 @@ class FacenetTrack(mpx.MPxNode):
         tAttr = om.MFnTypedAttribute()
         nAttr = om.MFnNumericAttribute()
         cAttr = om.MFnCompoundAttribute()
+        eAttr = om.MFnEnumAttribute()
 
         # create the faceTrack attribute
         FacenetTrack.faceTrack = tAttr.create('faceTrack', 'ft', om.MFnData.kString)
@@ -37,6 +127,80 @@ class FacenetTrack(mpx.MPxNode):
         
         FacenetTrack.enableDelta = nAttr.create('enableDelta', 'ed', om.MFnNumericData.kBoolean)
 
+        # create the cacheFrames attr, the number of evaluated frames kept for scrubbing
+        FacenetTrack.cacheFrames = nAttr.create('cacheFrames', 'cfr', om.MFnNumericData.kInt, 0)
+        nAttr.setMin(0)
+        nAttr.setStorable(True)
+
+        # create the windowSize attr, the number of frames kept resident for binary face tracks
+        FacenetTrack.windowSize = nAttr.create('windowSize', 'ws', om.MFnNumericData.kInt, 0)
+        nAttr.setMin(0)
+        nAttr.setStorable(True)
+
+        # create the gapPolicy attr, how frames dropped by the tracker are played
+        FacenetTrack.gapPolicy = eAttr.create('gapPolicy', 'gp', 0)
+        for value, policy in enumerate(facenetUtils.GAP_POLICIES):
+            eAttr.addField(policy, value)
+        eAttr.setStorable(True)
+        eAttr.setKeyable(True)
+
+        # create the actorIndex attr, the actor played from a multi actor track container
+        FacenetTrack.actorIndex = nAttr.create('actorIndex', 'ai', om.MFnNumericData.kInt, 0)
+        nAttr.setMin(0)
+        nAttr.setStorable(True)
+
+        # create the landmarkMask attr, the landmark indices, ranges or regions written out
+        FacenetTrack.landmarkMask = tAttr.create('landmarkMask', 'lmk', om.MFnData.kString)
+        tAttr.setStorable(True)
+
+        # create the smoothing attrs, the filter runs once over the whole take
+        FacenetTrack.smoothFilter = eAttr.create('smoothFilter', 'smf', 0)
+        for value, method in enumerate(facenetUtils.SMOOTH_FILTERS):
+            eAttr.addField(method, value)
+        eAttr.setStorable(True)
+
+        FacenetTrack.smoothSigma = nAttr.create('smoothSigma', 'sms', om.MFnNumericData.kFloat, 1.0)
+        nAttr.setMin(0.0)
+        nAttr.setStorable(True)
+
+        FacenetTrack.smoothWindow = nAttr.create('smoothWindow', 'smw', om.MFnNumericData.kInt, 5)
+        nAttr.setMin(3)
+        nAttr.setStorable(True)
+
+        FacenetTrack.smoothOrder = nAttr.create('smoothOrder', 'smo', om.MFnNumericData.kInt, 2)
+        nAttr.setMin(0)
+        nAttr.setStorable(True)
+
+        FacenetTrack.smoothMinCutoff = nAttr.create('smoothMinCutoff', 'smc', om.MFnNumericData.kFloat, 1.0)
+        nAttr.setMin(0.001)
+        nAttr.setStorable(True)
+
+        FacenetTrack.smoothBeta = nAttr.create('smoothBeta', 'smb', om.MFnNumericData.kFloat, 0.0)
+        nAttr.setMin(0.0)
+        nAttr.setStorable(True)
+
+        # create the frame rate attrs, tracks are resampled once from the source to the scene rate
+        FacenetTrack.sourceFps = nAttr.create('sourceFps', 'sfps', om.MFnNumericData.kFloat, facenetUtils.DEFAULT_FPS)
+        nAttr.setMin(1.0)
+        nAttr.setStorable(True)
+
+        FacenetTrack.sceneFps = nAttr.create('sceneFps', 'cfps', om.MFnNumericData.kFloat, facenetUtils.DEFAULT_FPS)
+        nAttr.setMin(1.0)
+        nAttr.setStorable(True)
+
+        FacenetTrack.resampleMethod = eAttr.create('resampleMethod', 'rsm', 1)
+        for value, method in enumerate(facenetUtils.RESAMPLE_METHODS):
+            eAttr.addField(method, value)
+        eAttr.setStorable(True)
+
+        # create the streamSource attr, a live stream played instead of the tracks
+        FacenetTrack.streamSource = tAttr.create('streamSource', 'ss', om.MFnData.kString)
+        tAttr.setStorable(True)
+
+        # create the recordPath attr, the track file the live stream is recorded to
+        FacenetTrack.recordPath = tAttr.create('recordPath', 'rcp', om.MFnData.kString)
+        tAttr.setStorable(False)
+
         # create the startFrame attr
         FacenetTrack.startFrame = nAttr.create('startFrame', 'sf', om.MFnNumericData.kInt)
         nAttr.setReadable(False)
@@ -60,13 +224,29 @@ class FacenetTrack(mpx.MPxNode):
         cAttr.setStorable(True)
         cAttr.setKeyable(True)
         cAttr.setArray(True)
-        position = nAttr.createPoint('position', 'pos')
+        FacenetTrack.position = position = nAttr.createPoint('position', 'pos')
         cAttr.addChild(position)
 
         # add all the atributes to the node
         FacenetTrack.addAttribute(FacenetTrack.faceTrack)
         FacenetTrack.addAttribute(FacenetTrack.headTrack)
         FacenetTrack.addAttribute(FacenetTrack.enableDelta)
+        FacenetTrack.addAttribute(FacenetTrack.cacheFrames)
+        FacenetTrack.addAttribute(FacenetTrack.windowSize)
+        FacenetTrack.addAttribute(FacenetTrack.gapPolicy)
+        FacenetTrack.addAttribute(FacenetTrack.actorIndex)
+        FacenetTrack.addAttribute(FacenetTrack.landmarkMask)
+        FacenetTrack.addAttribute(FacenetTrack.smoothFilter)
+        FacenetTrack.addAttribute(FacenetTrack.smoothSigma)
+        FacenetTrack.addAttribute(FacenetTrack.smoothWindow)
+        FacenetTrack.addAttribute(FacenetTrack.smoothOrder)
+        FacenetTrack.addAttribute(FacenetTrack.smoothMinCutoff)
+        FacenetTrack.addAttribute(FacenetTrack.smoothBeta)
+        FacenetTrack.addAttribute(FacenetTrack.sourceFps)
+        FacenetTrack.addAttribute(FacenetTrack.sceneFps)
+        FacenetTrack.addAttribute(FacenetTrack.resampleMethod)
+        FacenetTrack.addAttribute(FacenetTrack.streamSource)
+        FacenetTrack.addAttribute(FacenetTrack.recordPath)
         FacenetTrack.addAttribute(FacenetTrack.startFrame)
         FacenetTrack.addAttribute(FacenetTrack.time)
         FacenetTrack.addAttribute(FacenetTrack.outFrame)
@@ -78,71 +258,527 @@ class FacenetTrack(mpx.MPxNode):
         FacenetTrack.attributeAffects(FacenetTrack.startFrame, position)
         FacenetTrack.attributeAffects(FacenetTrack.outFrame, position)
         FacenetTrack.attributeAffects(FacenetTrack.enableDelta, FacenetTrack.outFrame)
+        FacenetTrack.attributeAffects(FacenetTrack.faceTrack, FacenetTrack.outFrame)
+        FacenetTrack.attributeAffects(FacenetTrack.faceTrack, position)
+        FacenetTrack.attributeAffects(FacenetTrack.headTrack, position)
+        FacenetTrack.attributeAffects(FacenetTrack.enableDelta, position)
+        FacenetTrack.attributeAffects(FacenetTrack.gapPolicy, position)
+        FacenetTrack.attributeAffects(FacenetTrack.actorIndex, FacenetTrack.outFrame)
+        FacenetTrack.attributeAffects(FacenetTrack.actorIndex, position)
+        FacenetTrack.attributeAffects(FacenetTrack.landmarkMask, position)
+        for smooth_attr in (FacenetTrack.smoothFilter, FacenetTrack.smoothSigma, FacenetTrack.smoothWindow,
+                            FacenetTrack.smoothOrder, FacenetTrack.smoothMinCutoff, FacenetTrack.smoothBeta):
+            FacenetTrack.attributeAffects(smooth_attr, position)
+        FacenetTrack.attributeAffects(FacenetTrack.streamSource, FacenetTrack.outFrame)
+        FacenetTrack.attributeAffects(FacenetTrack.streamSource, position)
+        for fps_attr in (FacenetTrack.sourceFps, FacenetTrack.sceneFps, FacenetTrack.resampleMethod):
+            FacenetTrack.attributeAffects(fps_attr, FacenetTrack.outFrame)
+            FacenetTrack.attributeAffects(fps_attr, position)
 
     def compute(self, plug, data):
+        # a live stream replaces the track playback
+        if self.stream is not None:
+            self.computeStream(plug, data)
+            return
+
         # set the anim data time
         time = data.inputValue(FacenetTrack.time).asInt()
-        new_frame = time - data.inputValue(FacenetTrack.startFrame).asInt()
+        start_frame = data.inputValue(FacenetTrack.startFrame).asInt()
+        new_frame = time - start_frame
+
+        # cached frames are keyed by time so moving the start frame invalidates them
+        self.frame_cache.capacity = data.inputValue(FacenetTrack.cacheFrames).asInt()
+        if start_frame != self.cache_start_frame:
+            self.frame_cache.clear()
+            self.cache_start_frame = start_frame
 
         # need to clamp the new_frame to the anim data frames only
-        if new_frame < 0:
+        play_track = self.playTrack(*self.playSettings(data.inputValue))
+        if play_track is not None:
+            new_frame = play_track.clampFrame(new_frame)
+        elif new_frame < 0:
             new_frame = 0
-        if isinstance(FacenetTrack.anim_dict, dict):
-            if new_frame > len(FacenetTrack.anim_dict):
-                new_frame = len(FacenetTrack.anim_dict)
-        data.outputValue(FacenetTrack.outFrame).setInt(new_frame)
-
-        # need to use the data handle instead of the plug
-        if isinstance(FacenetTrack.anim_dict, dict):
-            # update all the landmark positions to the current anim data time
-            landmark_plug = om.MPlug(self.thisMObject(), FacenetTrack.landmarks)
+        out_frame_handle = data.outputValue(FacenetTrack.outFrame)
+        out_frame_handle.setInt(new_frame)
+        out_frame_handle.setClean()
+
+        # a pull of outFrame alone never touches the landmarks
+        if plug == FacenetTrack.outFrame or play_track is None:
+            data.setClean(plug)
+            return
+
+        idx = FacenetTrack.landmarkIndex(plug)
+        # positions only hold the masked landmarks, element indices map them back to the track
+        mask_indices = self.mask_indices
+        if idx is not None and mask_indices is not None:
+            position_idx = int(numpy.searchsorted(mask_indices, idx))
+            if position_idx == len(mask_indices) or mask_indices[position_idx] != idx:
+                # masked landmarks are never written
+                data.setClean(plug)
+                return
+        else:
+            position_idx = idx
+
+        positions = self.frame_cache.get(time)
+        if positions is None:
+            if idx is None or self.frame_cache.capacity:
+                positions = self.framePositions(play_track, new_frame).tolist()
+                self.frame_cache.put(time, positions)
+            else:
+                # an uncached element pull only converts the pulled landmark
+                positions = self.framePositions(play_track, new_frame)
+        landmark_handle = data.outputArrayValue(FacenetTrack.landmarks)
+        z_pos = 0.0
+
+        if idx is None:
+            # update all the landmark positions in one array build on the data block
+            builder = om.MArrayDataBuilder(data, FacenetTrack.landmarks, len(positions))
+            if mask_indices is None:
+                for idx, (x_pos, y_pos) in enumerate(positions):
+                    builder.addElement(idx).child(FacenetTrack.position).set3Float(x_pos, y_pos, z_pos)
+            else:
+                for idx, (x_pos, y_pos) in zip(mask_indices.tolist(), positions):
+                    builder.addElement(idx).child(FacenetTrack.position).set3Float(x_pos, y_pos, z_pos)
+            landmark_handle.set(builder)
+            landmark_handle.setAllClean()
+        elif position_idx < len(positions):
+            # only the pulled element is written
+            x_pos, y_pos = map(float, positions[position_idx])
+            builder = landmark_handle.builder()
+            builder.addElement(idx).child(FacenetTrack.position).set3Float(x_pos, y_pos, z_pos)
+            landmark_handle.set(builder)
+
+        data.setClean(plug)
+
+    def computeStream(self, plug, data):
+        frame = self.stream.latest()
+        if frame is None:
+            data.setClean(plug)
+            return
+        self.stream_seq = frame.seq
+
+        out_frame_handle = data.outputValue(FacenetTrack.outFrame)
+        out_frame_handle.setInt(frame.frame)
+        out_frame_handle.setClean()
+        if plug == FacenetTrack.outFrame:
+            data.setClean(plug)
+            return
+
+        # the newest frame is read in place, only the masked rows are converted
+        mask = data.inputValue(FacenetTrack.landmarkMask).asString()
+        mask_key = (mask, len(frame.landmarks))
+        if self.stream_mask[0] != mask_key:
             try:
-                for idx, landmark in enumerate(FacenetTrack.anim_dict[str(new_frame)]):
-                    x_pos = landmark[0]
-                    y_pos = landmark[1]
-                    z_pos = 0.0
-
-                    if data.outputValue(FacenetTrack.enableDelta).asInt():
-                        if isinstance(FacenetTrack.head_dict, dict):
-                            head_pos = FacenetTrack.head_dict[str(new_frame)]
-                            x_pos -= head_pos[0]
-                            y_pos -= head_pos[1]
-
-                    landmark_plug.elementByLogicalIndex(idx).child(0).child(0).setFloat(x_pos)
-                    landmark_plug.elementByLogicalIndex(idx).child(0).child(1).setFloat(y_pos)
-                    landmark_plug.elementByLogicalIndex(idx).child(0).child(2).setFloat(z_pos)
-                    data.setClean(landmark_plug)
-            except:
-                raise
+                self.stream_mask = (mask_key, facenetUtils.resolveLandmarkMask(mask, len(frame.landmarks)))
+            except ValueError as e:
+                log.error('Ignoring the landmark mask: %s', e)
+                self.stream_mask = (mask_key, None)
+        mask_indices = self.stream_mask[1]
+        if mask_indices is None:
+            indices = range(len(frame.landmarks))
+            positions = frame.landmarks.tolist()
+        else:
+            indices = mask_indices.tolist()
+            positions = frame.landmarks[mask_indices].tolist()
+
+        if not self.stream.isCurrent(frame.seq):
+            # the producer lapped the ring while the frame was read, the next poll catches up
+            log.debug('dropped overwritten stream frame %s', frame.seq)
+            data.setClean(plug)
+            return
 
+        landmark_handle = data.outputArrayValue(FacenetTrack.landmarks)
+        builder = om.MArrayDataBuilder(data, FacenetTrack.landmarks, len(positions))
+        for idx, (x_pos, y_pos) in zip(indices, positions):
+            builder.addElement(idx).child(FacenetTrack.position).set3Float(x_pos, y_pos, 0.0)
+        landmark_handle.set(builder)
+        landmark_handle.setAllClean()
+        if frame.seq != self.stream_output_seq:
+            # latency counts each frame once, however often it is evaluated
+            self.stream_output_seq = frame.seq
+            self.stream_latency.addSince(frame.timestamp)
         data.setClean(plug)
+
+    def setStream(self, spec):
+        if self.stream_timer_id is not None:
+            om.MMessage.removeCallback(self.stream_timer_id)
+            self.stream_timer_id = None
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.stream_seq = 0
+        self.stream_output_seq = 0
+        if self.stream_latency is not None:
+            self.stream_latency.clear()
+        if self.recorder is not None:
+            self.recorder.reset()
+        if not spec:
+            return
+
+        try:
+            # imported on first use, the shared memory reader needs python 3.8
+            import facenetStream
+            self.stream = facenetStream.openStreamReader(spec)
+        except ImportError as e:
+            log.error('Landmark streaming is not available in this python: %s', e)
+            return
+        except (OSError, ValueError) as e:
+            log.error('Failed to open the landmark stream %s: %s', spec, e)
+            return
+        if self.stream_latency is None:
+            self.stream_latency = facenetStream.LatencyStats()
+
+        node_ref = weakref.ref(self)
+        self.stream_timer_id = om.MTimerMessage.addTimerCallback(STREAM_POLL_SECONDS,
+                                                                 lambda *args: pollStream(node_ref))
+
+    def setRecording(self, filepath):
+        if self.recorder is not None:
+            try:
+                if self.stream is not None:
+                    self.recorder.drain(self.stream)
+                written = self.recorder.close()
+                if written:
+                    log.info('Recorded the landmark stream to %s', written)
+            except (OSError, IOError) as e:
+                log.error('Failed to write the stream recording %s: %s', self.recorder.filepath, e)
+            self.recorder = None
+        if filepath:
+            try:
+                import facenetStream
+            except ImportError as e:
+                log.error('Landmark stream recording is not available in this python: %s', e)
+                return
+            self.recorder = facenetStream.StreamRecorder(filepath)
+
+    def streamStats(self):
+        stats = self.stream_latency.stats() if self.stream_latency is not None else {'samples': 0}
+        stats['seq'] = self.stream_seq
+        stats['recordedFrames'] = len(self.recorder) if self.recorder is not None else 0
+        stats['lostFrames'] = self.recorder.lost if self.recorder is not None else 0
+        return stats
+
+    @staticmethod
+    def landmarkIndex(plug):
+        # the logical index of the landmarks element a plug belongs to, None for any other plug
+        while plug.isChild():
+            plug = plug.parent()
+        if plug.isElement() and plug.attribute() == FacenetTrack.landmarks:
+            return plug.logicalIndex()
+        return None
     
-    def attributeChangedCallback(node, plug, other_plug, client_data):
-        if plug == FacenetTrack.faceTrack:
-            if os.path.exists(plug.asString()):
-                FacenetTrack.anim_dict = dict(json.load(open(plug.asString())))
+    def slotTrack(self, slot, actor_index=0):
+        # containers hold every actor, the slot plays the track of the selected one,
+        # without a headTrack file a container on faceTrack also gives the head track
+        track = self.tracks[slot]
+        if track is None and slot == 'head' and isinstance(self.tracks['face'], facenetUtils.TrackContainer):
+            track = self.tracks['face']
+        if isinstance(track, facenetUtils.TrackContainer):
+            return track.track(actor_index, slot)
+        return track
+
+    def framePositions(self, play_track, frame):
+        # windowed tracks read whole rows, the mask is applied per frame
+        positions = play_track.frameData(frame)
+        if self.mask_indices is not None and isinstance(play_track, facenetUtils.WindowedTrack):
+            positions = positions[self.mask_indices]
+        return positions
+
+    def plugValue(self, attribute):
+        # reads an input outside of compute, plugs share the as* getters of data handles
+        return om.MPlug(self.thisMObject(), attribute)
+
+    @staticmethod
+    def playSettings(value):
+        # the playTrack arguments, value gets a data handle or plug for an attribute
+        gap_policy = facenetUtils.GAP_POLICIES[value(FacenetTrack.gapPolicy).asShort()]
+        resampling = (value(FacenetTrack.sourceFps).asFloat(),
+                      value(FacenetTrack.sceneFps).asFloat(),
+                      facenetUtils.RESAMPLE_METHODS[value(FacenetTrack.resampleMethod).asShort()])
+        return (value(FacenetTrack.enableDelta).asBool(),
+                gap_policy,
+                value(FacenetTrack.actorIndex).asInt(),
+                value(FacenetTrack.landmarkMask).asString(),
+                FacenetTrack.smoothSettings(value),
+                resampling)
+
+    @staticmethod
+    def smoothSettings(value):
+        # only the parameters of the selected filter are part of the settings
+        method = facenetUtils.SMOOTH_FILTERS[value(FacenetTrack.smoothFilter).asShort()]
+        if method == 'gaussian':
+            return (method, {'sigma': value(FacenetTrack.smoothSigma).asFloat()})
+        if method == 'savitzkyGolay':
+            return (method, {'window': value(FacenetTrack.smoothWindow).asInt(),
+                             'order': value(FacenetTrack.smoothOrder).asInt()})
+        if method == 'oneEuro':
+            return (method, {'minCutoff': value(FacenetTrack.smoothMinCutoff).asFloat(),
+                             'beta': value(FacenetTrack.smoothBeta).asFloat()})
+        return None
+
+    def bakeData(self, start, end, mask=None):
+        """Evaluates the landmarks of every scene frame from start to end in one pass.
+
+        :parameters:
+            start : int
+                The first scene frame.
+
+            end : int
+                The last scene frame.
+
+            mask : str
+                A landmark mask used instead of the landmarkMask attr. Default: None
+
+        :return: The scene frames, the outFrame of each, the landmark indices \
+                 written and the frames x landmarks x 2 positions.
+        :rtype: tuple
+        """
+        if self.stream is not None:
+            raise RuntimeError('Live streams can not be baked, record them to a track first')
+        settings = list(self.playSettings(self.plugValue))
+        if mask is not None:
+            settings[3] = mask
+        play_track = self.playTrack(*settings)
+        if play_track is None:
+            raise RuntimeError('No face track is loaded')
+
+        times = numpy.arange(start, end + 1, dtype=numpy.int32)
+        start_frame = self.plugValue(FacenetTrack.startFrame).asInt()
+        frames = numpy.clip(times - start_frame, play_track.firstFrame, play_track.lastFrame)
+        if isinstance(play_track, facenetUtils.WindowedTrack):
+            positions = numpy.stack([self.framePositions(play_track, frame) for frame in frames.tolist()])
+        else:
+            positions = play_track.data[play_track.rowsForFrames(frames)]
+
+        indices = self.mask_indices
+        if indices is None:
+            indices = numpy.arange(positions.shape[1], dtype=numpy.int32)
+        return times, frames, indices, positions
+
+    def playTrack(self, delta, gap_policy='hold', actor_index=0, mask='', smoothing=None, resampling=None):
+        # the track compute plays from, derived once from the loaded tracks and settings
+        face_track = self.slotTrack('face', actor_index)
+        head_track = self.slotTrack('head', actor_index)
+        if face_track is None or face_track.isEmpty():
+            return None
+        if head_track is None or head_track.isEmpty():
+            delta = False
+
+        source_fps, scene_fps, resample_method = resampling or (facenetUtils.DEFAULT_FPS, facenetUtils.DEFAULT_FPS, 'linear')
+        if source_fps == scene_fps:
+            resampling = None
+
+        settings = (face_track, head_track if delta else None, gap_policy, mask, smoothing, resampling)
+        if settings != self.play_settings:
+            self.frame_cache.clear()
+            # the mask is resolved once, masked landmarks are dropped before any other processing
+            try:
+                self.mask_indices = facenetUtils.resolveLandmarkMask(mask, face_track.landmarkCount)
+            except ValueError as e:
+                log.error('Ignoring the landmark mask: %s', e)
+                self.mask_indices = None
+            if isinstance(face_track, facenetUtils.WindowedTrack):
+                # windowed tracks apply the delta to each block as it is read
+                face_track.setHeadTrack(settings[1])
+                face_track.setGapPolicy(gap_policy)
+                if smoothing is not None or resampling is not None:
+                    log.warning('Windowed face tracks are played unsmoothed at the source frame rate, '
+                                'set windowSize to 0 to smooth or resample them')
+                self.play_track = face_track
+            else:
+                play_track = face_track.subset(self.mask_indices)
+                if delta:
+                    play_track = facenetUtils.relativeTrack(play_track, head_track)
+                # gaps are filled, the take smoothed and resampled up front so compute only indexes rows
+                play_track = play_track.filled(gap_policy)
+                if smoothing is not None:
+                    play_track = facenetUtils.smoothTrack(play_track, smoothing[0], fps=source_fps, **smoothing[1])
+                if resampling is not None:
+                    play_track = facenetUtils.resampleTrack(play_track, source_fps, scene_fps, resample_method)
+                self.play_track = play_track
+            self.play_settings = settings
+        return self.play_track
+
+    def setTrack(self, slot, filepath):
+        # the current track keeps playing as the placeholder until the new one is loaded
+        pending = self.loads.pop(slot, None)
+        if pending is not None:
+            pending.cancel()
+
+        if not filepath or not os.path.exists(filepath):
+            self.swapTrack(slot, None, None)
+            return
+
+        window_size = om.MPlug(self.thisMObject(), FacenetTrack.windowSize).asInt()
+        if slot == 'face' and window_size and facenetUtils.isBinaryTrack(filepath):
+            # only the header and frame numbers are read up front
+            self.swapTrack(slot, None, facenetUtils.WindowedTrack(filepath, window_size))
+            cmds.dgdirty(om.MFnDependencyNode(self.thisMObject()).name())
+            return
+
+        if om.MGlobal.mayaState() != om.MGlobal.kInteractive:
+            # batch sessions have no idle queue and must not render placeholders
+            load = facenetUtils.TrackLoad(filepath)
+            self.loads[slot] = load
+            try:
+                load.key, load.track = track_cache.acquire(filepath, progress=load.setProgress)
+                load.state = facenetUtils.TrackLoad.READY
+            except Exception as e:
+                load.error = str(e)
+                load.state = facenetUtils.TrackLoad.ERROR
+            self.applyLoad(slot, load)
+            return
+
+        node_ref = weakref.ref(self)
+        self.loads[slot] = track_loader.submit(filepath, lambda load: maya.utils.executeDeferred(applyDeferredLoad, node_ref, slot, load))
+
+    def applyLoad(self, slot, load):
+        if self.loads.get(slot) is not load:
+            # superseded by a newer load
+            if load.key is not None:
+                track_cache.release(load.key)
+            return
+
+        if load.state == facenetUtils.TrackLoad.READY:
+            self.swapTrack(slot, load.key, load.track)
+        else:
+            log.error('Failed to load %s track %s: %s', slot, load.filepath, load.error)
+
+        cmds.dgdirty(om.MFnDependencyNode(self.thisMObject()).name())
+
+    def swapTrack(self, slot, key, track):
+        old_key = self.track_keys.pop(slot, None)
+        if isinstance(self.tracks[slot], facenetUtils.WindowedTrack):
+            self.tracks[slot].close()
+        self.tracks[slot] = track
+        self.play_track = None
+        self.play_settings = None
+        self.frame_cache.clear()
+        if key is not None:
+            self.track_keys[slot] = key
+        if old_key is not None:
+            track_cache.release(old_key)
+
+    def cacheStats(self):
+        stats = self.frame_cache.stats()
+        face_track = self.tracks['face']
+        if isinstance(face_track, facenetUtils.WindowedTrack):
+            stats['window'] = face_track.stats()
+        else:
+            stats['window'] = None
+        return stats
+
+    def loadStatus(self):
+        status = {}
+        for slot in self.tracks:
+            if slot in self.loads:
+                status[slot] = self.loads[slot].status()
             else:
-                FacenetTrack.anim_dict = None
+                status[slot] = {'filepath': None, 'state': 'idle', 'progress': 0.0, 'error': None}
+        return status
+
+    @staticmethod
+    def attributeChangedCallback(msg, plug, other_plug, client_data):
+        node = FacenetTrack.fromMObject(plug.node())
+        if node is None:
+            return
+
+        if plug == FacenetTrack.faceTrack:
+            node.setTrack('face', plug.asString())
         
         if plug == FacenetTrack.headTrack:
-            if os.path.exists(plug.asString()):
-                FacenetTrack.head_dict = dict(json.load(open(plug.asString())))
-            else:
-                FacenetTrack.head_dict = None
+            node.setTrack('head', plug.asString())
+
+        if plug == FacenetTrack.windowSize:
+            node.setTrack('face', om.MPlug(plug.node(), FacenetTrack.faceTrack).asString())
+
+        if plug == FacenetTrack.streamSource:
+            node.setStream(plug.asString())
+
+        if plug == FacenetTrack.recordPath:
+            node.setRecording(plug.asString())
 
     def postConstructor(self):
+        self.handle = om.MObjectHandle(self.thisMObject())
+        hash_code = self.handle.hashCode()
+        FacenetTrack.instances.setdefault(hash_code, []).append(
+            weakref.ref(self, lambda node_ref: FacenetTrack.dropInstance(hash_code, node_ref)))
         self.callback_id = om.MNodeMessage.addAttributeChangedCallback(self.thisMObject(), FacenetTrack.attributeChangedCallback)
 
+def applyDeferredLoad(node_ref, slot, load):
+    node = node_ref()
+    if node is None:
+        if load.key is not None:
+            track_cache.release(load.key)
+        return
+    node.applyLoad(slot, load)
+
+def pollStream(node_ref):
+    # records every frame received since the last tick, whether or not the node is evaluated,
+    # then dirties the node once per new stream frame so it is only evaluated when there is one
+    node = node_ref()
+    if node is None or node.stream is None:
+        return
+    if node.recorder is not None:
+        node.recorder.drain(node.stream)
+    if node.stream.latestSeq() != node.stream_seq:
+        cmds.dgdirty(om.MFnDependencyNode(node.thisMObject()).name())
+
+def getStreamStats(node_name):
+    """Gets the newest evaluated stream frame, the recorded and lost frame counts and the producer to output latency of a facenetTrack node."""
+    node = FacenetTrack.fromName(node_name)
+    if node is None:
+        raise ValueError('{} is not a facenetTrack node'.format(node_name))
+    return node.streamStats()
+
+def getLoadStatus(node_name):
+    """Gets the face and head track load state, progress and error of a facenetTrack node."""
+    node = FacenetTrack.fromName(node_name)
+    if node is None:
+        raise ValueError('{} is not a facenetTrack node'.format(node_name))
+    return node.loadStatus()
+
+def getCacheStats(node_name):
+    """Gets the frame cache capacity, size, hits and misses of a facenetTrack node."""
+    node = FacenetTrack.fromName(node_name)
+    if node is None:
+        raise ValueError('{} is not a facenetTrack node'.format(node_name))
+    return node.cacheStats()
+
+def getDiskCacheStats():
+    """Gets the directory, size, hits and misses of the on disk track cache, None if it is off."""
+    if disk_cache is None:
+        return None
+    return disk_cache.stats()
+
 def initializePlugin(obj):
+    global track_cache, track_loader, disk_cache
+    # parsed tracks persist between sessions in the disk cache
+    disk_cache = facenetUtils.DiskTrackCache.fromEnvironment()
+    if disk_cache is not None:
+        track_cache = facenetUtils.TrackCache(loader=disk_cache.load)
+    else:
+        track_cache = facenetUtils.TrackCache()
+    track_loader = facenetUtils.TrackLoader(track_cache)
+
     plugin = mpx.MFnPlugin(obj, 'Justin Phillips', '1.0', 'Any')
     try:
         plugin.registerNode(FacenetTrack.nodeName, FacenetTrack.nodeId, FacenetTrack.creator, FacenetTrack.initialize)
     except:
         raise RuntimeError('Failed to register Facenet plugin')
 
+    if om.MGlobal.mayaState() == om.MGlobal.kInteractive:
+        import facenetBake
+        maya.utils.executeDeferred(facenetBake.createMenu)
+
 def uninitializePlugin(obj):
     plugin = mpx.MFnPlugin(obj)
     try:
         plugin.deregisterNode(FacenetTrack.nodeId)
     except:
-        raise RuntimeError('Failed to register Facenet plguin')
\ No newline at end of file
+        raise RuntimeError('Failed to register Facenet plguin')
+    if om.MGlobal.mayaState() == om.MGlobal.kInteractive:
+        import facenetBake
+        facenetBake.deleteMenu()
+    track_loader.shutdown()
+    track_cache.clear()
\ No newline at end of file
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------#
+# ------------------------------------------------------------------ HEADER --#
+"""
+:Authors:
+    juphillips
+
+:Description:
+    Offline benchmark of the facenetTrack node load and compute paths, run \
+    against the mayaStub stand-in so it works on any box with numpy.
+
+============
+Notes
+============
+
+    Sweeps landmark counts, track lengths, track formats and enableDelta, \
+    then reports the load time, per frame compute latency percentiles for a \
+    full landmarks pull and an outFrame pull, and peak memory. Peak traced \
+    memory covers the python and numpy allocations made by the load and \
+    playback, the max rss is for the whole process. The track disk cache is \
+    turned off so json loads measure the parse.
+
+        python benchmarks/benchFacenetNode.py
+        python benchmarks/benchFacenetNode.py --landmarks 468 --frames 10000 --json
+
+"""
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- IMPORTS --#
+
+# Built-in
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Third party
+import numpy
+
+# Custom
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mayaStub
+mayaStub.install()
+
+import facenetUtils
+import FacenetNode
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+LANDMARK_COUNTS = [68, 106, 468]
+FRAME_COUNTS = [1000, 10000]
+FORMATS = ['json', 'binary', 'compressed']
+PERCENTILES = [50, 90, 99]
+
+# ----------------------------------------------------------------------------#
+# --------------------------------------------------------------- FUNCTIONS --#
+
+
+def writeTracks(directory, landmarkCount, frameCount, seed=0):
+    """Writes a random face and head track pair in every format.
+
+    :return: The face and head filepaths keyed by format.
+    :rtype: dict
+    """
+    rng = numpy.random.RandomState(seed)
+    frames = numpy.arange(frameCount, dtype=numpy.int32)
+    face = facenetUtils.Track(frames, rng.rand(frameCount, landmarkCount, 2).astype(numpy.float32))
+    head = facenetUtils.Track(frames, rng.rand(frameCount, 1, 2).astype(numpy.float32))
+
+    paths = {}
+    for name, track, jsonData in (('face', face, face.data), ('head', head, head.data[:, 0, :])):
+        jsonPath = os.path.join(directory, '{}_{}_{}.json'.format(name, landmarkCount, frameCount))
+        with open(jsonPath, 'w') as outfile:
+            json.dump({str(frame): row for frame, row in zip(frames.tolist(), jsonData.tolist())}, outfile)
+        paths.setdefault('json', {})[name] = jsonPath
+        paths.setdefault('binary', {})[name] = facenetUtils.writeBinaryTrack(
+            os.path.splitext(jsonPath)[0] + facenetUtils.BINARY_TRACK_EXT, track)
+        paths.setdefault('compressed', {})[name] = facenetUtils.writeCompressedTrack(
+            os.path.splitext(jsonPath)[0] + facenetUtils.COMPRESSED_TRACK_EXT, track)
+    return paths
+
+
+def percentiles(samples):
+    samples = numpy.asarray(samples) * 1e6
+    return dict(('p{}'.format(p), float(numpy.percentile(samples, p))) for p in PERCENTILES)
+
+
+def playCase(paths, delta, playFrames):
+    """Loads the tracks on a fresh node and plays them back.
+
+    :return: The load time and the per frame landmarks and outFrame compute times.
+    :rtype: tuple
+    """
+    FacenetNode.track_cache.clear()
+    Node = FacenetNode.FacenetTrack
+
+    node = mayaStub.createNode(Node, 'facenetTrack1')
+    mayaStub.setAttr(node, Node.enableDelta, delta)
+
+    start = timeit.default_timer()
+    mayaStub.setAttr(node, Node.faceTrack, paths['face'])
+    mayaStub.setAttr(node, Node.headTrack, paths['head'])
+    loadTime = timeit.default_timer() - start
+
+    landmarkTimes = []
+    outFrameTimes = []
+    for frame in range(playFrames):
+        mayaStub.setAttr(node, Node.time, frame)
+
+        start = timeit.default_timer()
+        mayaStub.compute(node, Node.landmarks)
+        landmarkTimes.append(timeit.default_timer() - start)
+
+        start = timeit.default_timer()
+        mayaStub.compute(node, Node.outFrame)
+        outFrameTimes.append(timeit.default_timer() - start)
+
+    mayaStub.deleteNode(node)
+    node.swapTrack('face', None, None)
+    node.swapTrack('head', None, None)
+    return loadTime, landmarkTimes, outFrameTimes
+
+
+def benchCase(paths, delta, playFrames):
+    """Times a load and playback, then repeats it under tracemalloc for the peak memory.
+
+    :return: The timings and memory of the case.
+    :rtype: dict
+    """
+    loadTime, landmarkTimes, outFrameTimes = playCase(paths, delta, playFrames)
+
+    # tracing slows every allocation down so it gets its own pass
+    tracemalloc.start()
+    playCase(paths, delta, playFrames)
+    peakTraced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'loadMs': loadTime * 1e3,
+            'landmarksUs': percentiles(landmarkTimes),
+            'outFrameUs': percentiles(outFrameTimes),
+            'peakTracedMb': peakTraced / float(1024 ** 2)}
+
+
+def maxRssMb():
+    if resource is None:
+        return None
+    # linux reports kilobytes, macos bytes
+    scale = 1024.0 if sys.platform != 'darwin' else 1024.0 ** 2
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def runBenchmarks(landmarkCounts=LANDMARK_COUNTS,
+                  frameCounts=FRAME_COUNTS,
+                  formats=FORMATS,
+                  playFrames=500):
+    """Runs the sweep and returns one result per case."""
+    os.environ[facenetUtils.DISK_CACHE_ENV] = ''
+    FacenetNode.initializePlugin(None)
+    directory = tempfile.mkdtemp(prefix='facenetBench')
+    results = []
+    try:
+        for landmarkCount in landmarkCounts:
+            for frameCount in frameCounts:
+                paths = writeTracks(directory, landmarkCount, frameCount)
+                for trackFormat in formats:
+                    for delta in (False, True):
+                        result = benchCase(paths[trackFormat], delta, min(playFrames, frameCount))
+                        result.update({'landmarks': landmarkCount,
+                                       'frames': frameCount,
+                                       'format': trackFormat,
+                                       'delta': delta})
+                        results.append(result)
+                        log.info('finished %s landmarks %s frames %s delta=%s',
+                                 landmarkCount, frameCount, trackFormat, delta)
+    finally:
+        FacenetNode.uninitializePlugin(None)
+        shutil.rmtree(directory)
+    return results
+
+
+def formatResults(results):
+    header = ('landmarks', 'frames', 'format', 'delta', 'load ms',
+              'lm p50 us', 'lm p90 us', 'lm p99 us', 'of p50 us', 'peak MB')
+    rows = [header]
+    for result in results:
+        rows.append((str(result['landmarks']),
+                     str(result['frames']),
+                     result['format'],
+                     'on' if result['delta'] else 'off',
+                     '{:.2f}'.format(result['loadMs']),
+                     '{:.1f}'.format(result['landmarksUs']['p50']),
+                     '{:.1f}'.format(result['landmarksUs']['p90']),
+                     '{:.1f}'.format(result['landmarksUs']['p99']),
+                     '{:.1f}'.format(result['outFrameUs']['p50']),
+                     '{:.1f}'.format(result['peakTracedMb'])))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the facenetTrack node outside of Maya.')
+    parser.add_argument('--landmarks', type=int, nargs='+', default=LANDMARK_COUNTS)
+    parser.add_argument('--frames', type=int, nargs='+', default=FRAME_COUNTS)
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+    parser.add_argument('--play', type=int, default=500, help='frames evaluated per case')
+    parser.add_argument('--json', action='store_true', help='print the results as json')
+    options = parser.parse_args(args)
+
+    results = runBenchmarks(options.landmarks, options.frames, options.formats, options.play)
+    if options.json:
+        print(json.dumps({'results': results, 'maxRssMb': maxRssMb()}, indent=2))
+    else:
+        print(formatResults(results))
+        print('max rss: {} MB'.format(maxRssMb()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------#
+# ------------------------------------------------------------------ HEADER --#
+"""
+:Authors:
+    juphillips
+
+:Description:
+    Offline check of the taggingInterface search engines, run against the \
+    mayaStub stand-in scene so it works on any box without Maya.
+
+============
+Notes
+============
+
+    Builds a small rig like scene and runs every engine over exact and \
+    substring terms, userDefined on and off and every selection, dagObjects \
+    and nodeType scope, then compares the resolved hits of each engine with \
+    those of the scan engine. The attributes cover the message, enum, bool, \
+    long, double3, doubleLinear, doubleAngle, time, string and matrix types, \
+    so the api reading and its cmds fallback are both compared. Exits with 1 \
+    when an engine differs.
+
+    --nodes adds that many tagged transforms and times each engine on the \
+    stub scene. The stub answers cmds and api calls alike from python dicts, \
+    the timings compare the search code only and say nothing of how the \
+    engines compare in a Maya session.
+
+        python benchmarks/benchTagSearch.py
+        python benchmarks/benchTagSearch.py --nodes 5000
+
+"""
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- IMPORTS --#
+
+# Built-in
+import argparse
+import itertools
+import logging
+import os
+import sys
+import timeit
+import types
+
+# Custom
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'taggingInterface'))
+import mayaStub
+mayaStub.install()
+
+try:
+    from rig_tools.ui.pyside import dialog
+except ImportError:
+    # only the ui facing helpers of taggingUtils use the dialogs, none of the searches
+    for name in ('rig_tools', 'rig_tools.ui', 'rig_tools.ui.pyside', 'rig_tools.ui.pyside.dialog'):
+        sys.modules.setdefault(name, types.ModuleType(name))
+    sys.modules['rig_tools.ui.pyside'].dialog = sys.modules['rig_tools.ui.pyside.dialog']
+
+import taggingUtils
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+ENGINES = ['scan', 'attributes', 'api', 'index']
+
+EXACT_TERMS = ['rigHookup', 'ignoreDuringUpdate', 'IKCTRL', 'offsetPivot', 'childLength', 'parentSpace',
+               'parentMatrixCache', 'twistAngle', 'holdTime', 'owningModuleID', 'children', 'translate',
+               'visibility', 'message', 'missingTag']
+SUBSTRING_TERMS = ['ctrl', 'parent', 'child', 'hookup', 'trans', 'during', 'TIME']
+
+NODE_TYPES = [None, 'transform', 'joint', 'network']
+SELECTION = ['ctrl_L', 'moduleInfo']
+
+# ----------------------------------------------------------------------------#
+# --------------------------------------------------------------- FUNCTIONS --#
+
+
+def buildScene():
+    """Builds the check scene, a small hierarchy, a network node and a connection."""
+    mayaStub.clearScene()
+    mayaStub.addSceneNode('rig')
+    mayaStub.addSceneNode('ctrl_L', parent='rig')
+    mayaStub.addSceneAttr('ctrl_L', 'rigHookup', 'message')
+    mayaStub.addSceneAttr('ctrl_L', 'ignoreDuringUpdate', 'bool', True)
+    mayaStub.addSceneAttr('ctrl_L', 'IKCTRL', 'enum', 2)
+    mayaStub.addSceneAttr('ctrl_L', 'offsetPivot', 'double3', (1.0, 2.5, -3.0))
+    mayaStub.addSceneAttr('ctrl_L', 'childLength', 'doubleLinear', 4.5)
+    mayaStub.addSceneAttr('ctrl_L', 'parentSpace', 'string', 'world')
+    mayaStub.addSceneAttr('ctrl_L', 'parentMatrixCache', 'matrix')
+    mayaStub.addSceneAttr('ctrl_L', 'twistAngle', 'doubleAngle', 90.0)
+    mayaStub.addSceneAttr('ctrl_L', 'holdTime', 'time', 12.0)
+
+    mayaStub.addSceneNode('joint1', 'joint', parent='ctrl_L')
+    mayaStub.addSceneAttr('joint1', 'unparentDuringUpdate', 'bool')
+    mayaStub.addSceneAttr('joint1', 'owningModuleID', 'long', 7)
+    mayaStub.addSceneAttr('joint1', 'Parent', 'string', 'ctrl_L')
+
+    mayaStub.addSceneNode('body')
+    mayaStub.addSceneNode('bodyShape', 'mesh', parent='body')
+    mayaStub.addSceneAttr('bodyShape', 'rigHookup', 'bool', True)
+
+    mayaStub.addSceneNode('moduleInfo', 'network')
+    mayaStub.addSceneAttr('moduleInfo', 'children', 'message')
+    mayaStub.addSceneAttr('moduleInfo', 'owningModuleID', 'string', 'arm_L')
+    mayaStub.connectSceneAttr('moduleInfo.children', 'ctrl_L.rigHookup')
+
+    mayaStub.addSceneNode('md1', 'multiplyDivide')
+    mayaStub.selectSceneNodes(SELECTION)
+
+
+def addTaggedNodes(count):
+    for i in range(count):
+        name = 'bulk{}'.format(i)
+        mayaStub.addSceneNode(name)
+        mayaStub.addSceneAttr(name, 'rigHookup' if i % 10 == 0 else 'note{}'.format(i % 50), 'string', name)
+
+
+def cases():
+    for terms, searchExact in ((EXACT_TERMS, True), (SUBSTRING_TERMS, False)):
+        for userDefined, nodeType, selection, dagObjects in itertools.product((True, False), NODE_TYPES,
+                                                                            (False, True), (False, True)):
+            yield {'terms': terms,
+                   'searchExact': searchExact,
+                   'userDefined': userDefined,
+                   'nodeType': nodeType,
+                   'selection': selection,
+                   'dagObjects': dagObjects}
+
+
+def describeCase(case):
+    return 'exact={searchExact} userDefined={userDefined} nodeType={nodeType} ' \
+           'selection={selection} dagObjects={dagObjects}'.format(**case)
+
+
+def checkEngines(engines=ENGINES):
+    """Compares every engine with the scan engine over every case.
+
+    :return: The problems found, empty when the engines agree.
+    :rtype: list
+    """
+    problems = []
+    caseCount = 0
+    hitCount = 0
+    for case in cases():
+        caseCount += 1
+        expected = taggingUtils.resolveHits(taggingUtils.searchWithTerms(engine='scan', **case))
+        hitCount += sum(len(attr_dict) for attr_dict in expected.values())
+        for engine in engines:
+            found = taggingUtils.resolveHits(taggingUtils.searchWithTerms(engine=engine, **case))
+            if found == expected:
+                continue
+            for obj in sorted(set(found) | set(expected)):
+                if found.get(obj) != expected.get(obj):
+                    problems.append('{} {} {}: {} expected {}'.format(engine, describeCase(case), obj,
+                                                                     found.get(obj), expected.get(obj)))
+    log.info('compared %s engines over %s cases and %s hits', len(engines), caseCount, hitCount)
+    return problems
+
+
+def checkIndex(collide=False):
+    """Edits the scene under an attached tag index and compares the index with a scan after each edit.
+
+    :parameters:
+        collide : bool
+            If True, every node handle gets the same hash code. Default: False
+
+    :return: The problems found, empty when the index followed every edit without a build.
+    :rtype: list
+    """
+    hashCode = mayaStub.MObjectHandle.hashCode
+    if collide:
+        mayaStub.MObjectHandle.hashCode = lambda handle: 0
+    taggingUtils.removeTagIndex()
+    index = taggingUtils.getTagIndex()
+    builds = []
+    build = index.build
+    index.build = lambda: (builds.append(True), build())
+    edits = [('add a tagged node', lambda: (mayaStub.addSceneNode('ctrl_R', parent='rig'),
+                                             mayaStub.addSceneAttr('ctrl_R', 'rigHookup', 'message'))),
+             ('add a tag to a tagged node', lambda: mayaStub.addSceneAttr('joint1', 'removeAtPublish', 'bool')),
+             ('rename a tag', lambda: mayaStub.renameSceneAttr('joint1.removeAtPublish', 'replaceAtPublish')),
+             ('delete a tag', lambda: mayaStub.deleteSceneAttr('bodyShape.rigHookup')),
+             ('tag an untagged node', lambda: mayaStub.addSceneAttr('md1', 'ignoreDuringUpdate', 'bool')),
+             ('delete a tagged node', lambda: mayaStub.removeSceneNode('moduleInfo'))]
+
+    problems = []
+    for description, edit in edits:
+        edit()
+        problems.extend('{}: {}'.format(description, problem) for problem in index.validate())
+        if set(index.handles) != set(index.nodeTags) or set(index.nodeCallbacks) != set(index.nodeTags):
+            problems.append('{}: untagged nodes are kept or tagged nodes are not watched'.format(description))
+        if set(index.keyHashes) != set(index.handles):
+            problems.append('{}: keys are kept for nodes not in the index'.format(description))
+        if builds:
+            problems.append('{}: the index was built again'.format(description))
+            del builds[:]
+    log.info('checked the tag index over %s scene edits, collide=%s', len(edits), collide)
+    taggingUtils.removeTagIndex()
+    mayaStub.MObjectHandle.hashCode = hashCode
+    return problems
+
+
+def timeEngines(engines=ENGINES, repeat=5):
+    """Times an exact and a substring search of every engine on the current stub scene.
+
+    :return: The best time of each engine in milliseconds, keyed by (engine, exact).
+    :rtype: dict
+    """
+    timings = {}
+    for engine in engines:
+        for terms, searchExact in ((EXACT_TERMS, True), (SUBSTRING_TERMS, False)):
+            def search():
+                taggingUtils.resolveHits(taggingUtils.searchWithTerms(terms, engine=engine, searchExact=searchExact))
+            timings[(engine, searchExact)] = min(timeit.repeat(search, number=1, repeat=repeat)) * 1e3
+    return timings
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Check the tag search engines against each other outside of Maya.')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--nodes', type=int, default=0, help='tagged nodes added to time the engines on the stub')
+    options = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+
+    buildScene()
+    problems = checkEngines(options.engines)
+    if 'index' in options.engines:
+        for collide in (False, True):
+            problems.extend(checkIndex(collide))
+            buildScene()
+    for problem in problems:
+        print(problem)
+    print('{} problems'.format(len(problems)))
+
+    if options.nodes:
+        addTaggedNodes(options.nodes)
+        taggingUtils.getTagIndex().rebuild()
+        print('stub scene timings, not representative of a Maya session')
+        for (engine, searchExact), milliseconds in sorted(timeEngines(options.engines).items()):
+            print('{:>10} {:>9} {:10.2f} ms'.format(engine, 'exact' if searchExact else 'substring', milliseconds))
+
+    taggingUtils.removeTagIndex()
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1070 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------#
+# ------------------------------------------------------------------ HEADER --#
+"""
+:Authors:
+    juphillips
+
+:Description:
+    Lightweight in-process stand-in for the parts of maya.OpenMaya, \
+    maya.OpenMayaMPx, maya.cmds and maya.utils that FacenetNode and the \
+    taggingInterface searches use, so they can be driven outside a Maya \
+    session.
+
+============
+Notes
+============
+
+    Call install() before importing FacenetNode. Nodes are created with \
+    createNode, attributes set with setAttr (which fires the attribute \
+    changed callbacks like Maya does) and evaluated with compute. The stub \
+    reports itself as a batch session so track loads happen synchronously.
+
+    Plain scene nodes for the tag searches are made with addSceneNode, given \
+    attributes with addSceneAttr and wired with connectSceneAttr. The \
+    attributes are declared by their cmds.getAttr type name, the api view \
+    of them, function set types and unit types, is derived from that, so a \
+    search through maya.cmds and one through maya.OpenMaya can be compared.
+
+"""
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- IMPORTS --#
+
+# Built-in
+import fnmatch
+import itertools
+import sys
+import types
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- GLOBALS --#
+_nodes = {}
+_callbacks = {}
+_timers = {}
+_callbackIds = itertools.count(1)
+_connections = []
+_selection = []
+
+# the scene node types and the types they derive from
+_NODE_TYPES = {'transform': ['dagNode'],
+               'joint': ['transform', 'dagNode'],
+               'mesh': ['shape', 'dagNode'],
+               'nurbsCurve': ['shape', 'dagNode'],
+               'network': [],
+               'multiplyDivide': []}
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- Classes --#
+
+
+class _NoOp(object):
+    """Accepts any attribute setter call, like setKeyable or setStorable."""
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class MObject(object):
+    def __init__(self):
+        self._stubId = id(self)
+
+    def hasFn(self, fnType):
+        record = _nodes.get(self._stubId)
+        return fnType == MFn.kDagNode and record is not None and record.isDag()
+
+
+class MTypeId(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class MObjectHandle(object):
+    def __init__(self, mobject):
+        self._mobject = mobject
+
+    def __eq__(self, other):
+        return self._mobject._stubId == other._mobject._stubId
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def hashCode(self):
+        return self._mobject._stubId
+
+    def isValid(self):
+        return self._mobject._stubId in _nodes
+
+    isAlive = isValid
+
+    def object(self):
+        return self._mobject
+
+
+class Attribute(MObject):
+    """An attribute created by one of the attribute function sets or addSceneAttr."""
+    def __init__(self, name, shortName, default=None, children=(), kind=None, dataType=None):
+        MObject.__init__(self)
+        self.name = name
+        self.shortName = shortName
+        self.default = default
+        self.children = list(children)
+        self.parent = None
+        self.array = False
+        self.fields = {}
+        self.kind = kind
+        self.dataType = dataType
+        self.cmdsType = None
+        self.dynamic = False
+        for child in self.children:
+            child.parent = self
+
+    def hasFn(self, fnType):
+        return fnType == self.kind
+
+
+class MFn(object):
+    kInvalid = 0
+    kDagNode = 'dagNode'
+    kWorld = 'world'
+    kNumericAttribute = 'numeric'
+    kEnumAttribute = 'enum'
+    kUnitAttribute = 'unit'
+    kTypedAttribute = 'typed'
+    kMessageAttribute = 'message'
+    kMatrixAttribute = 'matrix'
+    kCompoundAttribute = 'compound'
+
+
+class MFnData(object):
+    kString = 'string'
+    kMatrix = 'matrix'
+    kStringArray = 'stringArray'
+    kDoubleArray = 'doubleArray'
+    kPointArray = 'pointArray'
+    kVectorArray = 'vectorArray'
+    kIntArray = 'intArray'
+
+
+class MFnNumericData(object):
+    kBoolean = 'bool'
+    kByte = 'byte'
+    kChar = 'char'
+    kShort = 'short'
+    kInt = 'int'
+    kLong = 'int'
+    kFloat = 'float'
+    kDouble = 'double'
+    k2Short = 'short2'
+    k2Long = 'long2'
+    k2Float = 'float2'
+    k2Double = 'double2'
+    k3Short = 'short3'
+    k3Long = 'long3'
+    k3Float = 'float3'
+    k3Double = 'double3'
+    k4Double = 'double4'
+
+
+class _AttributeFn(_NoOp):
+    def __init__(self, attribute=None):
+        self._attribute = attribute
+
+    def setObject(self, attribute):
+        self._attribute = attribute
+
+    def name(self):
+        return self._attribute.name
+
+    def isArray(self):
+        return self._attribute.array
+
+    def isDynamic(self):
+        return self._attribute.dynamic
+
+    def setArray(self, state):
+        self._attribute.array = state
+
+    def setDefault(self, *args):
+        self._attribute.default = args[0] if len(args) == 1 else args
+
+
+class MFnAttribute(_AttributeFn):
+    pass
+
+
+class MFnTypedAttribute(_AttributeFn):
+    def create(self, name, shortName, dataType, default=None):
+        self._attribute = Attribute(name, shortName, '' if dataType == MFnData.kString else default,
+                                    kind=MFn.kTypedAttribute, dataType=dataType)
+        return self._attribute
+
+    def attrType(self):
+        return self._attribute.dataType
+
+
+class MFnNumericAttribute(_AttributeFn):
+    def create(self, name, shortName, dataType, default=0):
+        self._attribute = Attribute(name, shortName, default, kind=MFn.kNumericAttribute, dataType=dataType)
+        return self._attribute
+
+    def createPoint(self, name, shortName):
+        children = [Attribute(name + axis, shortName + axis.lower(), 0.0,
+                              kind=MFn.kNumericAttribute, dataType=MFnNumericData.kFloat) for axis in 'XYZ']
+        self._attribute = Attribute(name, shortName, (0.0, 0.0, 0.0), children,
+                                    kind=MFn.kNumericAttribute, dataType=MFnNumericData.k3Float)
+        return self._attribute
+
+    def unitType(self):
+        return self._attribute.dataType
+
+
+class MFnEnumAttribute(_AttributeFn):
+    def create(self, name, shortName, default=0):
+        self._attribute = Attribute(name, shortName, default, kind=MFn.kEnumAttribute)
+        return self._attribute
+
+    def addField(self, fieldName, value):
+        self._attribute.fields[fieldName] = value
+
+
+class MFnUnitAttribute(_AttributeFn):
+    kDistance = 'distance'
+    kAngle = 'angle'
+    kTime = 'time'
+
+    def unitType(self):
+        return self._attribute.dataType
+
+
+class MFnMessageAttribute(_AttributeFn):
+    pass
+
+
+class MFnCompoundAttribute(_AttributeFn):
+    def create(self, name, shortName):
+        self._attribute = Attribute(name, shortName, kind=MFn.kCompoundAttribute)
+        return self._attribute
+
+    def addChild(self, child):
+        self._attribute.children.append(child)
+        child.parent = self._attribute
+
+
+class MPlug(object):
+    def __init__(self, mobject=None, attribute=None, index=None, parent=None):
+        self._mobject = mobject
+        self._attribute = attribute
+        self._index = index
+        self._parent = parent
+
+    def __eq__(self, other):
+        if isinstance(other, MPlug):
+            return (self._mobject is other._mobject and self._attribute is other._attribute
+                    and self._index == other._index)
+        return self._attribute is other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def node(self):
+        return self._mobject
+
+    def attribute(self):
+        return self._attribute
+
+    def isElement(self):
+        return self._index is not None
+
+    def isChild(self):
+        return self._parent is not None
+
+    def parent(self):
+        return self._parent
+
+    def logicalIndex(self):
+        return self._index
+
+    def elementByLogicalIndex(self, index):
+        return MPlug(self._mobject, self._attribute, index, self._parent)
+
+    def child(self, index):
+        return MPlug(self._mobject, self._attribute.children[index], parent=self)
+
+    def numChildren(self):
+        return len(self._attribute.children)
+
+    def connectedTo(self, plugArray, asDst, asSrc):
+        # sources the plug is a destination of first, then the destinations it feeds
+        del plugArray[:]
+        key = (self._mobject._stubId, self._attribute)
+        if asDst:
+            plugArray.extend(MPlug(_nodes[src].mobject, srcAttr)
+                             for src, srcAttr, dst, dstAttr in _connections if (dst, dstAttr) == key)
+        if asSrc:
+            plugArray.extend(MPlug(_nodes[dst].mobject, dstAttr)
+                             for src, srcAttr, dst, dstAttr in _connections if (src, srcAttr) == key)
+
+    def _value(self):
+        return _nodes[self._mobject._stubId].values.get(self._attribute, self._attribute.default)
+
+    def asMDistance(self):
+        return _UnitValue(self._value())
+
+    def asMAngle(self):
+        return _UnitValue(self._value())
+
+    def asMTime(self):
+        return _UnitValue(self._value())
+
+    def asInt(self):
+        return int(self._value())
+
+    def asShort(self):
+        return int(self._value())
+
+    def asBool(self):
+        return bool(self._value())
+
+    def asFloat(self):
+        return float(self._value())
+
+    def asDouble(self):
+        return float(self._value())
+
+    def asString(self):
+        return str(self._value())
+
+    def name(self):
+        return '{}.{}'.format(_nodes[self._mobject._stubId].name, self._attribute.name)
+
+
+class MPlugArray(list):
+    def length(self):
+        return len(self)
+
+
+class _UnitValue(object):
+    """A distance, angle or time, scene values are kept in the ui units."""
+    def __init__(self, value):
+        self._value = value
+
+    def asUnits(self, unit):
+        return float(self._value)
+
+    @staticmethod
+    def uiUnit():
+        return 'ui'
+
+
+MDistance = MAngle = MTime = _UnitValue
+
+
+class MDataHandle(object):
+    def __init__(self, value=None, store=None, key=None):
+        self._value = value
+        self._store = store
+        self._key = key
+
+    def _set(self, value):
+        self._value = value
+        if self._store is not None:
+            self._store[self._key] = value
+
+    def asInt(self):
+        return int(self._value)
+
+    def asShort(self):
+        return int(self._value)
+
+    def asBool(self):
+        return bool(self._value)
+
+    def asFloat(self):
+        return float(self._value)
+
+    def asDouble(self):
+        return float(self._value)
+
+    def asString(self):
+        return str(self._value)
+
+    def data(self):
+        return self._value
+
+    def setInt(self, value):
+        self._set(value)
+
+    def setShort(self, value):
+        self._set(value)
+
+    def setBool(self, value):
+        self._set(value)
+
+    def setFloat(self, value):
+        self._set(value)
+
+    def setDouble(self, value):
+        self._set(value)
+
+    def setString(self, value):
+        self._set(value)
+
+    def setMObject(self, value):
+        self._set(value)
+
+    def set3Float(self, x, y, z):
+        self._set((x, y, z))
+
+    def child(self, attribute):
+        if self._value is None:
+            self._set({})
+        return MDataHandle(self._value.get(attribute), self._value, attribute)
+
+    def setClean(self):
+        pass
+
+
+class MArrayDataBuilder(object):
+    def __init__(self, data=None, attribute=None, count=0, elements=None):
+        self._elements = dict(elements or {})
+
+    def addElement(self, index):
+        element = self._elements.setdefault(index, {})
+        return MDataHandle(element)
+
+    def removeElement(self, index):
+        self._elements.pop(index, None)
+
+
+class MArrayDataHandle(object):
+    def __init__(self, store, attribute):
+        self._store = store
+        self._attribute = attribute
+
+    def builder(self):
+        return MArrayDataBuilder(elements=self._store.get(self._attribute, {}))
+
+    def set(self, builder):
+        self._store[self._attribute] = builder._elements
+
+    def elementCount(self):
+        return len(self._store.get(self._attribute, {}))
+
+    def setAllClean(self):
+        pass
+
+    def setClean(self):
+        pass
+
+
+class MDataBlock(object):
+    def __init__(self, node):
+        self._values = _nodes[node.thisMObject()._stubId].values
+        self._outputs = _nodes[node.thisMObject()._stubId].outputs
+
+    def inputValue(self, attribute):
+        return MDataHandle(self._values.get(attribute, attribute.default))
+
+    def outputValue(self, attribute):
+        return MDataHandle(self._outputs.get(attribute), self._outputs, attribute)
+
+    def outputArrayValue(self, attribute):
+        return MArrayDataHandle(self._outputs, attribute)
+
+    def setClean(self, plug):
+        pass
+
+
+class MMessage(object):
+    @staticmethod
+    def removeCallback(callbackId):
+        _callbacks.pop(callbackId, None)
+        _timers.pop(callbackId, None)
+
+
+class MNodeMessage(MMessage):
+    kAttributeSet = 8
+    kAttributeAdded = 64
+    kAttributeRemoved = 128
+    kAttributeRenamed = 256
+
+    @staticmethod
+    def addAttributeChangedCallback(mobject, function, clientData=None):
+        callbackId = next(_callbackIds)
+        _callbacks[callbackId] = (mobject, function, clientData)
+        return callbackId
+
+    @staticmethod
+    def addAttributeAddedOrRemovedCallback(mobject, function, clientData=None):
+        callbackId = next(_callbackIds)
+        _callbacks[callbackId] = (('addedOrRemoved', mobject), function, clientData)
+        return callbackId
+
+
+class MDGMessage(MMessage):
+    @staticmethod
+    def addNodeAddedCallback(function, nodeType='dependNode', clientData=None):
+        callbackId = next(_callbackIds)
+        _callbacks[callbackId] = ('nodeAdded', function, clientData)
+        return callbackId
+
+    @staticmethod
+    def addNodeRemovedCallback(function, nodeType='dependNode', clientData=None):
+        callbackId = next(_callbackIds)
+        _callbacks[callbackId] = ('nodeRemoved', function, clientData)
+        return callbackId
+
+
+class MCommandMessage(MMessage):
+    @staticmethod
+    def addCommandCallback(function, clientData=None):
+        callbackId = next(_callbackIds)
+        _callbacks[callbackId] = ('command', function, clientData)
+        return callbackId
+
+
+class MSceneMessage(MMessage):
+    kBeforeOpen = 'beforeOpen'
+    kAfterOpen = 'afterOpen'
+    kBeforeNew = 'beforeNew'
+    kAfterNew = 'afterNew'
+
+    @staticmethod
+    def addCallback(message, function, clientData=None):
+        callbackId = next(_callbackIds)
+        _callbacks[callbackId] = (message, function, clientData)
+        return callbackId
+
+
+class MTimerMessage(MMessage):
+    @staticmethod
+    def addTimerCallback(period, function, clientData=None):
+        callbackId = next(_callbackIds)
+        _timers[callbackId] = (period, function, clientData)
+        return callbackId
+
+
+class MGlobal(object):
+    kInteractive = 0
+    kBatch = 1
+
+    @staticmethod
+    def mayaState():
+        return MGlobal.kBatch
+
+    @staticmethod
+    def getActiveSelectionList(selectionList):
+        selectionList._items = list(_selection)
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._items = []
+
+    def add(self, name):
+        for stubId, record in _nodes.items():
+            if record.name == name:
+                self._items.append(stubId)
+                return
+        raise RuntimeError('No object matches name: {}'.format(name))
+
+    def length(self):
+        return len(self._items)
+
+    def getDependNode(self, index, mobject):
+        mobject._stubId = self._items[index]
+
+
+class MFnDependencyNode(object):
+    def __init__(self, mobject=None):
+        self._mobject = mobject
+
+    def setObject(self, mobject):
+        self._mobject = mobject
+
+    def name(self):
+        return _nodes[self._mobject._stubId].name
+
+    def typeName(self):
+        return _nodes[self._mobject._stubId].nodeType
+
+    def attributeCount(self):
+        return len(_nodes[self._mobject._stubId].attributes)
+
+    def attribute(self, index):
+        return _nodes[self._mobject._stubId].attributes[index]
+
+    def findPlug(self, attribute, wantNetworkedPlug=False):
+        if attribute.parent is not None:
+            return MPlug(self._mobject, attribute, parent=MPlug(self._mobject, attribute.parent))
+        return MPlug(self._mobject, attribute)
+
+
+class MFnDagNode(MFnDependencyNode):
+    def partialPathName(self):
+        return self.name()
+
+
+class _NodeIterator(object):
+    def __init__(self, stubIds):
+        self._stubIds = stubIds
+        self._index = 0
+
+    def isDone(self):
+        return self._index >= len(self._stubIds)
+
+    def next(self):
+        self._index += 1
+
+    def thisNode(self):
+        return _nodes[self._stubIds[self._index]].mobject
+
+    currentItem = thisNode
+
+
+class MItDependencyNodes(_NodeIterator):
+    def __init__(self, filterType=None):
+        _NodeIterator.__init__(self, [stubId for stubId, record in _nodes.items() if record.nodeType])
+
+
+class MItDag(_NodeIterator):
+    kDepthFirst = 0
+
+    def __init__(self, traversal=0, filterType=None):
+        _NodeIterator.__init__(self, _dagOrder([stubId for stubId, record in _nodes.items()
+                                                if record.isDag() and record.parent is None]))
+
+    def reset(self, root, traversal=0, filterType=None):
+        self._stubIds = _dagOrder([root._stubId])
+        self._index = 0
+
+
+class MPxNode(object):
+    _stubAttributes = []
+    _stubAffects = []
+
+    def __init__(self):
+        self._stubObject = MObject()
+
+    def thisMObject(self):
+        return self._stubObject
+
+    def postConstructor(self):
+        pass
+
+    @classmethod
+    def addAttribute(cls, attribute):
+        cls._stubAttributes.append(attribute)
+
+    @classmethod
+    def attributeAffects(cls, source, destination):
+        cls._stubAffects.append((source, destination))
+
+
+class MFnPlugin(_NoOp):
+    def __init__(self, *args):
+        pass
+
+    def registerNode(self, name, typeId, creator, initialize, *args):
+        initialize()
+
+
+class _NodeRecord(object):
+    def __init__(self, node, name, nodeType=None, parent=None):
+        self.node = node
+        self.name = name
+        self.values = {}
+        self.outputs = {}
+        # plain scene nodes only
+        self.nodeType = nodeType
+        self.parent = parent
+        self.attributes = []
+        self.mobject = None
+
+    def isDag(self):
+        return self.nodeType is not None and 'dagNode' in [self.nodeType] + _NODE_TYPES[self.nodeType]
+
+    def findAttribute(self, name):
+        for attribute in self.attributes:
+            if attribute.name == name:
+                return attribute
+        return None
+
+
+# ----------------------------------------------------------------------------#
+# --------------------------------------------------------------- FUNCTIONS --#
+
+
+def asMPxPtr(node):
+    return node
+
+
+def dgdirty(*args, **kwargs):
+    pass
+
+
+def executeDeferred(function, *args, **kwargs):
+    function(*args, **kwargs)
+
+
+def createNode(nodeClass, name):
+    """Creates a node of the class and runs its postConstructor.
+
+    :parameters:
+        nodeClass : type
+            The MPxNode subclass.
+
+        name : str
+            The name the node can be looked up with.
+
+    :return: The node.
+    :rtype: MPxNode
+    """
+    node = nodeClass.creator()
+    _nodes[node.thisMObject()._stubId] = _NodeRecord(node, name)
+    node.postConstructor()
+    return node
+
+
+def deleteNode(node):
+    _nodes.pop(node.thisMObject()._stubId, None)
+
+
+def setAttr(node, attribute, value):
+    """Sets an input attribute and fires the attribute changed callbacks of the node."""
+    mobject = node.thisMObject()
+    _nodes[mobject._stubId].values[attribute] = value
+    plug = MPlug(mobject, attribute)
+    for callbackNode, function, clientData in list(_callbacks.values()):
+        if callbackNode is mobject:
+            function(MNodeMessage.kAttributeSet, plug, MPlug(), clientData)
+
+
+def compute(node, attribute, index=None):
+    """Evaluates the node for a plug of the attribute, or one element of an array attribute."""
+    plug = MPlug(node.thisMObject(), attribute, index)
+    node.compute(plug, MDataBlock(node))
+
+
+def _dagOrder(roots):
+    # the roots and their descendants, depth first
+    order = []
+    for root in roots:
+        order.append(root)
+        order.extend(_dagOrder([stubId for stubId, record in _nodes.items() if record.parent == root]))
+    return order
+
+
+def _sceneRecords():
+    return [record for record in _nodes.values() if record.nodeType]
+
+
+def _findRecord(name):
+    for record in _sceneRecords():
+        if record.name == name:
+            return record
+    raise ValueError('No object matches name: {}'.format(name))
+
+
+def _findPlug(plug):
+    nodeName, attrName = plug.split('.', 1)
+    record = _findRecord(nodeName)
+    attribute = record.findAttribute(attrName)
+    if attribute is None:
+        raise ValueError('No object matches name: {}'.format(plug))
+    return record, attribute
+
+
+def _newSceneAttr(name, attrType, value=None):
+    # the api kind and data type of the cmds attribute types
+    if attrType in ('bool', 'byte', 'short', 'long', 'float', 'double'):
+        numericType = {'long': MFnNumericData.kLong}.get(attrType, attrType)
+        default = {'bool': False, 'float': 0.0, 'double': 0.0}.get(attrType, 0)
+        attribute = Attribute(name, name, default, kind=MFn.kNumericAttribute, dataType=numericType)
+    elif attrType in ('double3', 'float3'):
+        childType = attrType[:-1]
+        children = [_newSceneAttr(name + axis, childType) for axis in 'XYZ']
+        attribute = Attribute(name, name, None, children, kind=MFn.kNumericAttribute, dataType=attrType)
+    elif attrType == 'enum':
+        attribute = Attribute(name, name, 0, kind=MFn.kEnumAttribute)
+    elif attrType in ('doubleLinear', 'doubleAngle', 'time'):
+        unitType = {'doubleLinear': MFnUnitAttribute.kDistance,
+                    'doubleAngle': MFnUnitAttribute.kAngle,
+                    'time': MFnUnitAttribute.kTime}[attrType]
+        attribute = Attribute(name, name, 0.0, kind=MFn.kUnitAttribute, dataType=unitType)
+    elif attrType in ('string', 'matrix', 'stringArray'):
+        default = {'string': '', 'matrix': [float(i % 5 == 0) for i in range(16)], 'stringArray': []}[attrType]
+        attribute = Attribute(name, name, default, kind=MFn.kTypedAttribute, dataType=attrType)
+    elif attrType == 'message':
+        attribute = Attribute(name, name, None, kind=MFn.kMessageAttribute)
+    else:
+        raise ValueError('Unsupported attribute type {}'.format(attrType))
+    attribute.cmdsType = attrType
+    return attribute
+
+
+def addSceneNode(name, nodeType='transform', parent=None):
+    """Adds a plain scene node with the static attributes of its type.
+
+    :parameters:
+        name : str
+            The unique node name.
+
+        nodeType : str
+            One of the _NODE_TYPES. Default: transform
+
+        parent : str
+            The dag parent of a dag node. Default: None
+
+    :return: The node.
+    :rtype: MObject
+    """
+    mobject = MObject()
+    record = _NodeRecord(None, name, nodeType, _findRecord(parent).mobject._stubId if parent else None)
+    record.mobject = mobject
+    _nodes[mobject._stubId] = record
+    addSceneAttr(name, 'message', 'message', userDefined=False)
+    if record.isDag():
+        addSceneAttr(name, 'visibility', 'bool', True, userDefined=False)
+        addSceneAttr(name, 'translate', 'double3', (0.0, 0.0, 0.0), userDefined=False)
+    for callbackNode, function, clientData in list(_callbacks.values()):
+        if callbackNode == 'nodeAdded':
+            function(mobject, clientData)
+    return mobject
+
+
+def removeSceneNode(name):
+    record = _findRecord(name)
+    for callbackNode, function, clientData in list(_callbacks.values()):
+        if callbackNode == 'nodeRemoved':
+            function(record.mobject, clientData)
+    stubId = record.mobject._stubId
+    _connections[:] = [connection for connection in _connections if stubId not in (connection[0], connection[2])]
+    if stubId in _selection:
+        _selection.remove(stubId)
+    del _nodes[stubId]
+
+
+def _commandMessage(command):
+    for callbackNode, function, clientData in list(_callbacks.values()):
+        if callbackNode == 'command':
+            function(command, clientData)
+
+
+def _attributeMessage(record, attribute, message):
+    # attribute changed callbacks get every message, added or removed ones only those two
+    plug = MPlug(record.mobject, attribute)
+    for callbackNode, function, clientData in list(_callbacks.values()):
+        if callbackNode is record.mobject:
+            function(message, plug, MPlug(), clientData)
+        elif (isinstance(callbackNode, tuple) and callbackNode[1] is record.mobject
+              and message != MNodeMessage.kAttributeRenamed):
+            function(message, plug, clientData)
+
+
+def addSceneAttr(node, name, attrType, value=None, userDefined=True):
+    """Adds an attribute to a scene node, like cmds.addAttr.
+
+    :parameters:
+        node : str
+            The scene node.
+
+        name : str
+            The attribute name.
+
+        attrType : str
+            The cmds.getAttr type name, bool, byte, short, long, float, double, \
+            double3, float3, enum, doubleLinear, doubleAngle, time, string, \
+            matrix, stringArray or message.
+
+        value : object
+            The value, a tuple for double3 and float3. Default: None, the type default
+
+        userDefined : bool
+            If True, the attribute is dynamic and listed by listAttr ud. Default: True
+    """
+    record = _findRecord(node)
+    attribute = _newSceneAttr(name, attrType)
+    for added in [attribute] + attribute.children:
+        added.dynamic = userDefined
+        record.attributes.append(added)
+    if value is not None:
+        if attribute.children:
+            for child, childValue in zip(attribute.children, value):
+                record.values[child] = childValue
+        else:
+            record.values[attribute] = value
+    if userDefined:
+        _commandMessage('addAttr -ln "{}" -at "{}" {}'.format(name, attrType, node))
+        for added in [attribute] + attribute.children:
+            _attributeMessage(record, added, MNodeMessage.kAttributeAdded)
+    return attribute
+
+
+def deleteSceneAttr(plug):
+    record, attribute = _findPlug(plug)
+    _commandMessage('deleteAttr {}'.format(plug))
+    for removed in [attribute] + attribute.children:
+        _attributeMessage(record, removed, MNodeMessage.kAttributeRemoved)
+        record.attributes.remove(removed)
+        record.values.pop(removed, None)
+
+
+def renameSceneAttr(plug, newName):
+    record, attribute = _findPlug(plug)
+    _commandMessage('renameAttr {} {}'.format(plug, newName))
+    attribute.name = attribute.shortName = newName
+    _attributeMessage(record, attribute, MNodeMessage.kAttributeRenamed)
+
+
+def connectSceneAttr(source, destination):
+    srcRecord, srcAttribute = _findPlug(source)
+    dstRecord, dstAttribute = _findPlug(destination)
+    _connections.append((srcRecord.mobject._stubId, srcAttribute, dstRecord.mobject._stubId, dstAttribute))
+
+
+def selectSceneNodes(names):
+    _selection[:] = [_findRecord(name).mobject._stubId for name in names]
+
+
+def clearScene():
+    """Removes every plain scene node, connection and the selection."""
+    for stubId in [stubId for stubId, record in _nodes.items() if record.nodeType]:
+        del _nodes[stubId]
+    del _connections[:]
+    del _selection[:]
+
+
+def _isType(record, nodeTypes):
+    if not isinstance(nodeTypes, (list, tuple)):
+        nodeTypes = [nodeTypes]
+    return bool(set(nodeTypes) & set([record.nodeType] + _NODE_TYPES[record.nodeType]))
+
+
+def ls(*args, **kwargs):
+    """cmds.ls over the scene nodes, with the type, sl, dag, r and o flags."""
+    nodeType = kwargs.get('type')
+    selection = kwargs.get('sl', kwargs.get('selection', False))
+    dag = kwargs.get('dag', False)
+    objectsOnly = kwargs.get('o', False)
+    if len(args) == 1 and isinstance(args[0], (list, tuple)):
+        args = tuple(args[0])
+
+    found = []
+    if args:
+        for pattern in args:
+            nodePattern, _, attrPattern = pattern.partition('.')
+            for record in _sceneRecords():
+                if not fnmatch.fnmatchcase(record.name, nodePattern):
+                    continue
+                if not attrPattern:
+                    found.append((record, record.name))
+                    continue
+                for attribute in record.attributes:
+                    if fnmatch.fnmatchcase(attribute.name, attrPattern):
+                        found.append((record, record.name if objectsOnly else
+                                       '{}.{}'.format(record.name, attribute.name)))
+    elif selection:
+        # dag lists the selected dag nodes and their descendants only
+        stubIds = _dagOrder([stubId for stubId in _selection if _nodes[stubId].isDag()]) if dag else _selection
+        found = [(_nodes[stubId], _nodes[stubId].name) for stubId in stubIds]
+    else:
+        found = [(record, record.name) for record in _sceneRecords() if not dag or record.isDag()]
+
+    if nodeType:
+        found = [(record, name) for record, name in found if _isType(record, nodeType)]
+    names = []
+    for record, name in found:
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def listAttr(node, ud=False, userDefined=False):
+    attributes = [attribute.name for attribute in _findRecord(node).attributes
+                  if attribute.dynamic or not (ud or userDefined)]
+    return attributes or None
+
+
+def getAttr(plug, type=False, **kwargs):
+    record, attribute = _findPlug(plug)
+    if type:
+        return attribute.cmdsType
+    if attribute.kind == MFn.kMessageAttribute:
+        raise RuntimeError('The value for the attribute could not be retrieved.')
+    if attribute.children:
+        return [tuple(record.values.get(child, child.default) for child in attribute.children)]
+    return record.values.get(attribute, attribute.default)
+
+
+def listConnections(plug, **kwargs):
+    record, attribute = _findPlug(plug)
+    plugs = MPlugArray()
+    MPlug(record.mobject, attribute).connectedTo(plugs, True, True)
+    return [_nodes[connected.node()._stubId].name for connected in plugs] or None
+
+
+def objExists(name):
+    try:
+        if '.' in name:
+            _findPlug(name)
+        else:
+            _findRecord(name)
+    except ValueError:
+        return False
+    return True
+
+
+def nodeType(name, derived=False, isTypeName=False, **kwargs):
+    if isTypeName:
+        if derived:
+            return [typeName for typeName, bases in _NODE_TYPES.items() if typeName == name or name in bases]
+        return name
+    return _findRecord(name.split('.', 1)[0]).nodeType
+
+
+def fireTimers():
+    """Runs every timer callback once, like one tick of Maya's idle timer."""
+    for period, function, clientData in list(_timers.values()):
+        function(period, period, clientData)
+
+
+def getOutput(node, attribute):
+    return _nodes[node.thisMObject()._stubId].outputs.get(attribute)
+
+
+def install():
+    """Registers the stand-in modules as maya, maya.OpenMaya, maya.OpenMayaMPx, maya.cmds and maya.utils."""
+    module = sys.modules[__name__]
+
+    maya = types.ModuleType('maya')
+    openMaya = types.ModuleType('maya.OpenMaya')
+    openMayaMPx = types.ModuleType('maya.OpenMayaMPx')
+    mayaCmds = types.ModuleType('maya.cmds')
+    mayaUtils = types.ModuleType('maya.utils')
+
+    for name in ('MObject', 'MTypeId', 'MObjectHandle', 'MFn', 'MFnData', 'MFnNumericData',
+                 'MFnAttribute', 'MFnTypedAttribute', 'MFnNumericAttribute', 'MFnEnumAttribute',
+                 'MFnUnitAttribute', 'MFnMessageAttribute', 'MFnCompoundAttribute', 'MPlug', 'MPlugArray',
+                 'MDistance', 'MAngle', 'MTime', 'MDataHandle', 'MArrayDataBuilder',
+                 'MArrayDataHandle', 'MDataBlock', 'MMessage', 'MNodeMessage', 'MDGMessage', 'MCommandMessage',
+                 'MSceneMessage',
+                 'MTimerMessage', 'MGlobal', 'MSelectionList', 'MFnDependencyNode', 'MFnDagNode',
+                 'MItDependencyNodes', 'MItDag'):
+        setattr(openMaya, name, getattr(module, name))
+    openMayaMPx.MPxNode = MPxNode
+    openMayaMPx.MFnPlugin = MFnPlugin
+    openMayaMPx.asMPxPtr = asMPxPtr
+    for name in ('dgdirty', 'ls', 'listAttr', 'getAttr', 'listConnections', 'objExists', 'nodeType'):
+        setattr(mayaCmds, name, getattr(module, name))
+    mayaUtils.executeDeferred = executeDeferred
+
+    maya.OpenMaya = openMaya
+    maya.OpenMayaMPx = openMayaMPx
+    maya.cmds = mayaCmds
+    maya.utils = mayaUtils
+    sys.modules.update({'maya': maya,
+                        'maya.OpenMaya': openMaya,
+                        'maya.OpenMayaMPx': openMayaMPx,
+                        'maya.cmds': mayaCmds,
+                        'maya.utils': mayaUtils})
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------#
+# ------------------------------------------------------------------ HEADER --#
+"""
+:Authors:
+    juphillips
+
+:Description:
+    Bakes facenetTrack nodes to native animation curves so shots play and \
+    render without the plugin, and links baked shots back to a live node.
+
+============
+Notes
+============
+
+    A bake evaluates the whole frame range in one pass, the node's mask, \
+    head delta, gap policy, smoothing and resampling included, and keys a \
+    network node with the same landmarks and outFrame attributes as the \
+    facenetTrack. Every key of a curve is added with one addKeys call. The \
+    downstream connections of the facenetTrack are moved to the bake node, \
+    so the facenetTrack can be deleted.
+
+    The bake node keeps the facenetTrack settings and input connections in \
+    its facenetNode attribute. relinkFacenetTrack recreates the facenetTrack \
+    from them if it was deleted, moves the connections back and deletes the \
+    bake.
+
+        import facenetBake
+        bake = facenetBake.bakeFacenetTrack('facenetTrack1', deleteNode=True)
+        facenetBake.relinkFacenetTrack(bake)
+
+"""
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- IMPORTS --#
+
+# Built-in
+import json
+import logging
+
+# Third party
+import maya.OpenMaya as om
+import maya.OpenMayaAnim as oma
+import maya.cmds as cmds
+import maya.mel as mel
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+NODE_TYPE = 'facenetTrack'
+BAKE_INFO_ATTR = 'facenetNode'
+BAKED_ATTRS = ('landmarks', 'outFrame')
+MENU_NAME = 'facenetMenu'
+
+# the facenetTrack inputs restored when a bake is relinked
+SETTINGS_ATTRS = ['faceTrack', 'headTrack', 'startFrame', 'enableDelta', 'cacheFrames', 'windowSize',
+                  'gapPolicy', 'actorIndex', 'landmarkMask', 'smoothFilter', 'smoothSigma',
+                  'smoothWindow', 'smoothOrder', 'smoothMinCutoff', 'smoothBeta', 'sourceFps',
+                  'sceneFps', 'resampleMethod']
+
+# ----------------------------------------------------------------------------#
+# --------------------------------------------------------------- FUNCTIONS --#
+
+
+def isBake(node):
+    return cmds.objExists(node) and cmds.attributeQuery(BAKE_INFO_ATTR, node=node, exists=True)
+
+
+def _getDependNode(node):
+    selection = om.MSelectionList()
+    selection.add(node)
+    mobject = om.MObject()
+    selection.getDependNode(0, mobject)
+    return mobject
+
+
+def _timeArray(times):
+    # built once per bake and shared by every curve
+    timeArray = om.MTimeArray(len(times), om.MTime())
+    unit = om.MTime.uiUnit()
+    for index, time in enumerate(times):
+        timeArray.set(om.MTime(float(time), unit), index)
+    return timeArray
+
+
+def _doubleArray(values):
+    # filled from the list in one call instead of one set per key
+    util = om.MScriptUtil()
+    util.createFromList(values, len(values))
+    return om.MDoubleArray(util.asDoublePtr(), len(values))
+
+
+def _keyPlug(plug, timeArray, values, modifier):
+    curveFn = oma.MFnAnimCurve()
+    curveFn.create(plug, oma.MFnAnimCurve.kAnimCurveTU, modifier)
+    curveFn.addKeys(timeArray, _doubleArray(values),
+                    oma.MFnAnimCurve.kTangentLinear, oma.MFnAnimCurve.kTangentLinear)
+    return curveFn
+
+
+def _nodeInfo(node):
+    # the settings and input connections a relink needs to rebuild the node
+    settings = {}
+    for attr in SETTINGS_ATTRS:
+        if cmds.attributeQuery(attr, node=node, exists=True):
+            settings[attr] = cmds.getAttr('{}.{}'.format(node, attr))
+
+    inputs = cmds.listConnections(node, source=True, destination=False, connections=True, plugs=True) or []
+    return {'name': node,
+            'settings': settings,
+            'inputs': [(inputs[i + 1], inputs[i].split('.', 1)[1]) for i in range(0, len(inputs), 2)]}
+
+
+def _bakedConnections(node):
+    # the downstream connections of the baked attributes as (attribute path, destination) pairs
+    outputs = cmds.listConnections(node, source=False, destination=True, connections=True, plugs=True) or []
+    connections = []
+    for i in range(0, len(outputs), 2):
+        attrPath = outputs[i].split('.', 1)[1]
+        if attrPath.split('[')[0].split('.')[0] in BAKED_ATTRS:
+            connections.append((attrPath, outputs[i + 1]))
+    return connections
+
+
+def _moveConnections(target, connections):
+    for attrPath, destination in connections:
+        cmds.connectAttr('{}.{}'.format(target, attrPath), destination, force=True)
+
+
+def createBakeNode(name):
+    """Creates the network node a facenetTrack is baked to, with the same output attributes."""
+    bake = cmds.createNode('network', name=name)
+    cmds.addAttr(bake, longName='landmarks', shortName='lm', attributeType='compound',
+                 numberOfChildren=1, multi=True)
+    cmds.addAttr(bake, longName='position', shortName='pos', attributeType='double3', parent='landmarks')
+    for axis in 'XYZ':
+        cmds.addAttr(bake, longName='position' + axis, shortName='pos' + axis.lower(),
+                     attributeType='double', parent='position')
+    cmds.addAttr(bake, longName='outFrame', shortName='of', attributeType='long')
+    cmds.addAttr(bake, longName=BAKE_INFO_ATTR, dataType='string')
+    return bake
+
+
+def bakeFacenetTrack(node, start=None, end=None, mask=None, deleteNode=False):
+    """Bakes a facenetTrack node to animation curves.
+
+    :parameters:
+        node : str
+            The facenetTrack node to bake.
+
+        start : int
+            The first frame to bake. Default: None, the playback start
+
+        end : int
+            The last frame to bake. Default: None, the playback end
+
+        mask : str
+            A landmark mask overriding the node's landmarkMask. Default: None
+
+        deleteNode : bool
+            If True, deletes the facenetTrack once it is baked. Default: False
+
+    :return: The bake node.
+    :rtype: str
+    """
+    import FacenetNode
+
+    if cmds.nodeType(node) != NODE_TYPE:
+        raise ValueError('{} is not a {} node'.format(node, NODE_TYPE))
+    facenetTrack = FacenetNode.FacenetTrack.fromName(node)
+    if facenetTrack is None:
+        raise RuntimeError('{} has no loaded {} instance, reload the plugin or recreate the node'.format(node,
+                                                                                                      NODE_TYPE))
+    if start is None:
+        start = int(cmds.playbackOptions(query=True, minTime=True))
+    if end is None:
+        end = int(cmds.playbackOptions(query=True, maxTime=True))
+
+    times, frames, indices, positions = facenetTrack.bakeData(start, end, mask)
+
+    bake = createBakeNode('{}_bake'.format(node))
+    cmds.setAttr('{}.{}'.format(bake, BAKE_INFO_ATTR), json.dumps(_nodeInfo(node)), type='string')
+
+    timeArray = _timeArray(times.tolist())
+    modifier = om.MDGModifier()
+    bakeFn = om.MFnDependencyNode(_getDependNode(bake))
+    landmarksPlug = bakeFn.findPlug('landmarks')
+    for column, index in enumerate(indices.tolist()):
+        positionPlug = landmarksPlug.elementByLogicalIndex(index).child(0)
+        for axis in range(2):
+            _keyPlug(positionPlug.child(axis), timeArray, positions[:, column, axis].tolist(), modifier)
+    _keyPlug(bakeFn.findPlug('outFrame'), timeArray, frames.astype(float).tolist(), modifier)
+    modifier.doIt()
+
+    _moveConnections(bake, _bakedConnections(node))
+    log.info('Baked %s landmarks of %s over frames %s to %s to %s', len(indices), node, start, end, bake)
+
+    if deleteNode:
+        cmds.delete(node)
+    return bake
+
+
+def relinkFacenetTrack(bake):
+    """Moves the connections of a bake back to its facenetTrack and deletes the bake.
+
+    The facenetTrack is recreated from the settings kept on the bake if it was deleted.
+
+    :parameters:
+        bake : str
+            The bake node made by bakeFacenetTrack.
+
+    :return: The facenetTrack node.
+    :rtype: str
+    """
+    if not isBake(bake):
+        raise ValueError('{} is not a facenetTrack bake'.format(bake))
+    info = json.loads(cmds.getAttr('{}.{}'.format(bake, BAKE_INFO_ATTR)))
+
+    node = info['name']
+    if not cmds.objExists(node) or cmds.nodeType(node) != NODE_TYPE:
+        node = cmds.createNode(NODE_TYPE, name=node)
+        for attr, value in info['settings'].items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                cmds.setAttr('{}.{}'.format(node, attr), value, type='string')
+            else:
+                cmds.setAttr('{}.{}'.format(node, attr), value)
+        for source, attrPath in info['inputs']:
+            if cmds.objExists(source):
+                cmds.connectAttr(source, '{}.{}'.format(node, attrPath), force=True)
+            else:
+                log.warning('Skipped the missing input %s of %s', source, node)
+
+    _moveConnections(node, _bakedConnections(bake))
+    curves = cmds.listConnections(bake, source=True, destination=False, type='animCurve') or []
+    cmds.delete([bake] + curves)
+    return node
+
+
+def bakeSelected(deleteNode=False):
+    """Bakes the selected facenetTrack nodes over the playback range."""
+    bakes = [bakeFacenetTrack(node, deleteNode=deleteNode)
+             for node in cmds.ls(selection=True, type=NODE_TYPE) or []]
+    if not bakes:
+        log.warning('Select the facenetTrack nodes to bake')
+    return bakes
+
+
+def relinkSelected():
+    """Relinks the selected bake nodes to their facenetTrack nodes."""
+    nodes = [relinkFacenetTrack(bake) for bake in cmds.ls(selection=True) or [] if isBake(bake)]
+    if not nodes:
+        log.warning('Select the facenetTrack bake nodes to relink')
+    return nodes
+
+
+def createMenu():
+    """Adds the Facenet menu with the bake and relink commands to the main window."""
+    deleteMenu()
+    mainWindow = mel.eval('$tmp = $gMainWindow')
+    menu = cmds.menu(MENU_NAME, label='Facenet', parent=mainWindow, tearOff=True)
+    cmds.menuItem(label='Bake Selected Tracks', parent=menu,
+                  command='import facenetBake; facenetBake.bakeSelected()')
+    cmds.menuItem(label='Bake Selected Tracks And Delete Nodes', parent=menu,
+                  command='import facenetBake; facenetBake.bakeSelected(deleteNode=True)')
+    cmds.menuItem(divider=True, parent=menu)
+    cmds.menuItem(label='Relink Selected Bakes', parent=menu,
+                  command='import facenetBake; facenetBake.relinkSelected()')
+    return menu
+
+
+def deleteMenu():
+    if cmds.menu(MENU_NAME, exists=True):
+        cmds.deleteUI(MENU_NAME)
@@ -0,0 +1,701 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------#
+# ------------------------------------------------------------------ HEADER --#
+"""
+:Authors:
+    juphillips
+
+:Description:
+    Maya independent live landmark streaming between a tracker process and \
+    the facenetTrack node, over a shared memory ring buffer or a local socket.
+
+============
+Notes
+============
+
+    Streams are named by a spec string:
+
+        shm:<name>          a shared memory ring buffer the producer creates
+        tcp:<port>          a localhost socket the consumer listens on
+        tcp:<host>:<port>
+
+    Shared memory ring buffer layout, all values little endian:
+
+        ======  =====  ==============================================
+        offset  bytes  field
+        ======  =====  ==============================================
+        0       4      magic b'FNRB'
+        4       2      format version (uint16)
+        6       2      header size in bytes (uint16)
+        8       4      landmark count L (uint32)
+        12      4      slot count S (uint32)
+        16      8      sequence number of the newest frame (uint64)
+        64      S * n  slots, sequence (uint64), timestamp (float64), \
+                       frame (int32), landmarks at offset 32 L x 2 float32
+        ======  =====  ==============================================
+
+    A producer fills the slot after the newest one, setting its sequence \
+    number to 0 while it writes and to the new sequence number once done, \
+    then publishes the sequence number in the header. Readers view the \
+    newest slot in place without copying and check it was not overwritten \
+    with isCurrent once they are done with it. frameAt reads any frame still \
+    held in the ring, which a StreamRecorder drains on every poll so frames \
+    written between evaluations are recorded too.
+
+    Socket frames are a FRAME_HEADER followed by the L x 2 float32 \
+    landmarks, received straight into the consumer's own ring of slots.
+
+    Timestamps are time.perf_counter seconds, which share one clock between \
+    the processes of a machine, so the latency from the producer write to \
+    any point of the consumer is perf_counter() - timestamp.
+
+        python facenetStream.py produce shm:facenet0 --landmarks 68 --fps 60
+        python facenetStream.py latency shm:facenetBench --frames 2000
+
+"""
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- IMPORTS --#
+
+# Built-in
+import argparse
+import collections
+import json
+import logging
+import socket
+import struct
+import sys
+import threading
+import time
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Third party
+import numpy
+
+# Custom
+import facenetUtils
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+RING_MAGIC = b'FNRB'
+RING_VERSION = 1
+RING_HEADER = struct.Struct('<4sHHIIQ')
+RING_HEADER_SIZE = 64
+RING_SEQ_OFFSET = 16
+SLOT_HEADER_SIZE = 32
+DEFAULT_SLOTS = 8
+
+FRAME_MAGIC = b'FNSF'
+FRAME_HEADER = struct.Struct('<4sIiQd')
+
+StreamFrame = collections.namedtuple('StreamFrame', 'seq frame timestamp landmarks')
+
+# ----------------------------------------------------------------------------#
+# --------------------------------------------------------------- FUNCTIONS --#
+
+
+def parseSpec(spec):
+    """Splits a stream spec into its transport and address.
+
+    :return: shm and the buffer name, or tcp and the host and port.
+    :rtype: tuple
+    """
+    transport, _, address = spec.partition(':')
+    if transport == 'shm' and address:
+        return transport, address
+    if transport == 'tcp' and address:
+        host, _, port = address.rpartition(':')
+        try:
+            return transport, (host or '127.0.0.1', int(port))
+        except ValueError:
+            pass
+    raise ValueError('Invalid stream {}, use shm:<name>, tcp:<port> or tcp:<host>:<port>'.format(spec))
+
+
+def slotStride(landmarkCount):
+    stride = SLOT_HEADER_SIZE + landmarkCount * 2 * 4
+    return stride + -stride % 64
+
+
+def openStreamReader(spec):
+    """Opens the consuming end of a stream spec."""
+    transport, address = parseSpec(spec)
+    if transport == 'shm':
+        return RingBufferReader(address)
+    return SocketStreamReader(address[1], address[0])
+
+
+def openStreamWriter(spec, landmarkCount, slots=DEFAULT_SLOTS):
+    """Opens the producing end of a stream spec."""
+    transport, address = parseSpec(spec)
+    if transport == 'shm':
+        return RingBufferWriter(address, landmarkCount, slots)
+    return SocketStreamWriter(address[1], address[0])
+
+
+def _attachSharedMemory(name):
+    # readers must not unlink the producer's buffer when they exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        except Exception:
+            pass
+        return memory
+
+
+def _recvInto(connection, view):
+    # fills the whole view, False once the producer disconnects
+    received = 0
+    while received < len(view):
+        try:
+            count = connection.recv_into(view[received:])
+        except OSError:
+            return False
+        if not count:
+            return False
+        received += count
+    return True
+
+
+def runStubProducer(spec, landmarkCount=68, fps=60.0, frames=None, seed=0):
+    """Writes a random walk of landmarks to a stream at a fixed rate, a stand-in for a tracker.
+
+    :parameters:
+        spec : str
+            The stream to write to.
+
+        landmarkCount : int
+            The landmarks of every frame. Default: 68
+
+        fps : float
+            The rate frames are written at. Default: 60.0
+
+        frames : int
+            The number of frames to write. Default: None, until interrupted
+    """
+    rng = numpy.random.RandomState(seed)
+    landmarks = rng.rand(landmarkCount, 2).astype(numpy.float32)
+    writer = openStreamWriter(spec, landmarkCount)
+    period = 1.0 / fps
+    start = time.perf_counter()
+    frame = 0
+    try:
+        while frames is None or frame < frames:
+            landmarks += rng.randn(landmarkCount, 2).astype(numpy.float32) * 0.001
+            writer.write(frame, landmarks)
+            frame += 1
+            time.sleep(max(start + frame * period - time.perf_counter(), 0.0))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+    return frame
+
+
+def measureLatency(spec, landmarkCount=68, frames=1000, fps=240.0):
+    """Measures the write to read latency of a transport in this process.
+
+    A stub producer process writes frames while this process polls the \
+    newest frame and converts it like the node does.
+
+    :return: The latency stats and the number of frames seen.
+    :rtype: dict
+    """
+    transport, address = parseSpec(spec)
+    reader = None
+    if transport == 'tcp':
+        reader = SocketStreamReader(address[1], address[0])
+        spec = 'tcp:{}:{}'.format(address[0], reader.port)
+
+    producer = multiprocessing.Process(target=runStubProducer, args=(spec, landmarkCount, fps, frames))
+    producer.daemon = True
+    producer.start()
+
+    latency = LatencyStats(frames)
+    lastSeq = 0
+    seen = 0
+    try:
+        while producer.is_alive():
+            if reader is None:
+                try:
+                    reader = RingBufferReader(address)
+                except (FileNotFoundError, ValueError):
+                    # the producer has not created or filled in the header yet
+                    time.sleep(0.001)
+                    continue
+            frame = reader.latest()
+            if frame is None or frame.seq == lastSeq:
+                time.sleep(0.0002)
+                continue
+            frame.landmarks.tolist()
+            latency.add(time.perf_counter() - frame.timestamp)
+            lastSeq = frame.seq
+            seen += 1
+    finally:
+        producer.join()
+        if reader is not None:
+            reader.close()
+
+    stats = latency.stats()
+    stats['framesSeen'] = seen
+    stats['framesWritten'] = frames
+    return stats
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Stream live landmarks to facenetTrack nodes.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    produceParser = subparsers.add_parser('produce', help='write random landmarks to a stream')
+    produceParser.add_argument('--frames', type=int, help='frames to write, until interrupted by default')
+    produceParser.add_argument('--fps', type=float, default=60.0)
+
+    latencyParser = subparsers.add_parser('latency', help='measure the write to read latency of a transport')
+    latencyParser.add_argument('--frames', type=int, default=1000)
+    latencyParser.add_argument('--fps', type=float, default=240.0)
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument('spec', help='shm:<name>, tcp:<port> or tcp:<host>:<port>')
+        subparser.add_argument('--landmarks', type=int, default=68)
+    options = parser.parse_args(args)
+
+    if options.command == 'produce':
+        count = runStubProducer(options.spec, options.landmarks, options.fps, options.frames)
+        print('wrote {} frames'.format(count))
+    else:
+        print(json.dumps(measureLatency(options.spec, options.landmarks, options.frames, options.fps), indent=2))
+    return 0
+
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- CLASSES --#
+
+
+class RingBufferWriter(object):
+    """Creates a shared memory ring buffer and writes landmark frames into it.
+
+    :parameters:
+        name : str
+            The shared memory name readers attach with.
+
+        landmarkCount : int
+            The landmarks of every frame.
+
+        slots : int
+            The frames kept in the ring. Default: DEFAULT_SLOTS
+    """
+    def __init__(self, name, landmarkCount, slots=DEFAULT_SLOTS):
+        self.name = name
+        self.landmarkCount = landmarkCount
+        self.slots = slots
+        self.seq = 0
+        self._stride = slotStride(landmarkCount)
+        self._memory = shared_memory.SharedMemory(name=name, create=True,
+                                                  size=RING_HEADER_SIZE + slots * self._stride)
+        self._memory.buf[:RING_HEADER.size] = RING_HEADER.pack(RING_MAGIC, RING_VERSION, RING_HEADER_SIZE,
+                                                               landmarkCount, slots, 0)
+        self._writeSeq = numpy.ndarray(1, dtype='<u8', buffer=self._memory.buf, offset=RING_SEQ_OFFSET)
+        self._slots = [_SlotView(self._memory.buf, RING_HEADER_SIZE + slot * self._stride, landmarkCount)
+                       for slot in range(slots)]
+
+    def write(self, frame, landmarks, timestamp=None):
+        """Writes a landmarks x 2 frame into the next slot and publishes it.
+
+        :return: The sequence number of the frame.
+        :rtype: int
+        """
+        seq = self.seq + 1
+        slot = self._slots[(seq - 1) % self.slots]
+        slot.seq[0] = 0
+        slot.landmarks[:] = landmarks
+        slot.frame[0] = frame
+        slot.timestamp[0] = time.perf_counter() if timestamp is None else timestamp
+        slot.seq[0] = seq
+        self._writeSeq[0] = seq
+        self.seq = seq
+        return seq
+
+    def close(self):
+        self._writeSeq = None
+        self._slots = []
+        self._memory.close()
+        try:
+            self._memory.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RingBufferReader(object):
+    """Attaches to a shared memory ring buffer and reads its newest frame in place.
+
+    :parameters:
+        name : str
+            The shared memory name of the producer's buffer.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._memory = _attachSharedMemory(name)
+        magic, version, headerSize, landmarkCount, slots, _ = RING_HEADER.unpack_from(self._memory.buf)
+        if magic != RING_MAGIC:
+            self._memory.close()
+            raise ValueError('{} is not a landmark ring buffer'.format(name))
+        if version > RING_VERSION:
+            self._memory.close()
+            raise ValueError('{} is ring buffer version {}, only {} is supported'.format(name, version,
+                                                                                         RING_VERSION))
+
+        self.landmarkCount = landmarkCount
+        self.slots = slots
+        stride = slotStride(landmarkCount)
+        self._writeSeq = numpy.ndarray(1, dtype='<u8', buffer=self._memory.buf, offset=RING_SEQ_OFFSET)
+        self._slots = [_SlotView(self._memory.buf, headerSize + slot * stride, landmarkCount)
+                       for slot in range(slots)]
+
+    def latestSeq(self):
+        return int(self._writeSeq[0])
+
+    def latest(self):
+        """Gets the newest frame, its landmarks are a view of the shared memory.
+
+        :return: The newest frame, None if nothing has been written yet.
+        :rtype: StreamFrame
+        """
+        for _ in range(2):
+            seq = int(self._writeSeq[0])
+            if not seq:
+                return None
+            slot = self._slots[(seq - 1) % self.slots]
+            frame = StreamFrame(seq, int(slot.frame[0]), float(slot.timestamp[0]), slot.landmarks)
+            if int(slot.seq[0]) == seq:
+                return frame
+        return None
+
+    def frameAt(self, seq):
+        """Gets a frame still held in the ring, its landmarks are a view of the shared memory.
+
+        :return: The frame, None if its slot was overwritten or is being written.
+        :rtype: StreamFrame
+        """
+        if seq < 1 or not self._slots:
+            return None
+        slot = self._slots[(seq - 1) % self.slots]
+        frame = StreamFrame(seq, int(slot.frame[0]), float(slot.timestamp[0]), slot.landmarks)
+        if int(slot.seq[0]) != seq:
+            return None
+        return frame
+
+    def isCurrent(self, seq):
+        """Checks the slot of a frame read with latest or frameAt was not overwritten since."""
+        return self._slots and int(self._slots[(seq - 1) % self.slots].seq[0]) == seq
+
+    def close(self):
+        self._writeSeq = None
+        self._slots = []
+        try:
+            self._memory.close()
+        except BufferError:
+            # a frame view is still referenced, the mapping goes with it
+            log.debug('ring buffer %s still has frame views', self.name)
+
+
+class _SlotView(object):
+    """The numpy views of one ring buffer slot."""
+    def __init__(self, buf, offset, landmarkCount):
+        self.seq = numpy.ndarray(1, dtype='<u8', buffer=buf, offset=offset)
+        self.timestamp = numpy.ndarray(1, dtype='<f8', buffer=buf, offset=offset + 8)
+        self.frame = numpy.ndarray(1, dtype='<i4', buffer=buf, offset=offset + 16)
+        self.landmarks = numpy.ndarray((landmarkCount, 2), dtype='<f4', buffer=buf,
+                                       offset=offset + SLOT_HEADER_SIZE)
+
+
+class SocketStreamWriter(object):
+    """Connects to a consumer listening on a local socket and sends it landmark frames.
+
+    :parameters:
+        port : int
+            The port the consumer listens on.
+
+        host : str
+            The consumer host. Default: 127.0.0.1
+    """
+    def __init__(self, port, host='127.0.0.1'):
+        self.seq = 0
+        self._socket = socket.create_connection((host, port))
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def write(self, frame, landmarks, timestamp=None):
+        """Sends a landmarks x 2 frame.
+
+        :return: The sequence number of the frame.
+        :rtype: int
+        """
+        landmarks = numpy.ascontiguousarray(landmarks, dtype='<f4')
+        self.seq += 1
+        header = FRAME_HEADER.pack(FRAME_MAGIC, len(landmarks), frame, self.seq,
+                                   time.perf_counter() if timestamp is None else timestamp)
+        self._socket.sendall(header + landmarks.tobytes())
+        return self.seq
+
+    def close(self):
+        self._socket.close()
+
+
+class SocketStreamReader(object):
+    """Listens on a local socket and receives the frames of one producer at a time.
+
+    A receive thread reads each frame straight into the next slot of a \
+    small ring, so latest and isCurrent work like the shared memory reader.
+
+    :parameters:
+        port : int
+            The port to listen on, 0 picks a free port.
+
+        host : str
+            The interface to listen on. Default: 127.0.0.1
+
+        slots : int
+            The frames kept in the ring. Default: DEFAULT_SLOTS
+    """
+    def __init__(self, port, host='127.0.0.1', slots=DEFAULT_SLOTS):
+        self.slots = slots
+        self.landmarkCount = 0
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+
+        self._lock = threading.Lock()
+        self._slots = []
+        self._slotSeqs = []
+        self._slotFrames = []
+        self._latest = None
+        self._closed = False
+        self._connection = None
+        self._thread = threading.Thread(target=self._receive, name='facenetStreamReceive')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def latestSeq(self):
+        latest = self._latest
+        return latest.seq if latest is not None else 0
+
+    def latest(self):
+        """Gets the newest frame, its landmarks are a view of the receive ring.
+
+        :return: The newest frame, None if nothing has been received yet.
+        :rtype: StreamFrame
+        """
+        return self._latest
+
+    def frameAt(self, seq):
+        """Gets a frame still held in the receive ring, its landmarks are a view of the ring.
+
+        :return: The frame, None if its slot was overwritten or is being received.
+        :rtype: StreamFrame
+        """
+        with self._lock:
+            if seq < 1 or not self._slotSeqs:
+                return None
+            index = (seq - 1) % self.slots
+            if self._slotSeqs[index] != seq:
+                return None
+            frame, timestamp = self._slotFrames[index]
+            return StreamFrame(seq, frame, timestamp, self._slots[index])
+
+    def isCurrent(self, seq):
+        with self._lock:
+            return bool(self._slotSeqs) and self._slotSeqs[(seq - 1) % self.slots] == seq
+
+    def close(self):
+        self._closed = True
+        self._server.close()
+        # unblocks a receive waiting on the producer so the thread ends straight away
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+        self._thread.join(1.0)
+
+    def _resize(self, landmarkCount):
+        with self._lock:
+            self.landmarkCount = landmarkCount
+            self._slots = [numpy.empty((landmarkCount, 2), dtype='<f4') for _ in range(self.slots)]
+            self._slotSeqs = [0] * self.slots
+            self._slotFrames = [(0, 0.0)] * self.slots
+            self._latest = None
+
+    def _receive(self):
+        header = bytearray(FRAME_HEADER.size)
+        seq = 0
+        while not self._closed:
+            try:
+                connection, address = self._server.accept()
+            except OSError:
+                return
+            self._connection = connection
+            if self._closed:
+                connection.close()
+                return
+            log.info('stream producer connected from %s', address)
+            with connection:
+                while not self._closed:
+                    if not _recvInto(connection, memoryview(header)):
+                        break
+                    magic, landmarkCount, frame, _, timestamp = FRAME_HEADER.unpack(header)
+                    if magic != FRAME_MAGIC:
+                        log.error('stream producer %s sent a bad frame, disconnecting', address)
+                        break
+                    if landmarkCount != self.landmarkCount:
+                        self._resize(landmarkCount)
+
+                    seq += 1
+                    index = (seq - 1) % self.slots
+                    with self._lock:
+                        self._slotSeqs[index] = 0
+                    landmarks = self._slots[index]
+                    if not _recvInto(connection, memoryview(landmarks).cast('B')):
+                        break
+                    with self._lock:
+                        self._slotSeqs[index] = seq
+                        self._slotFrames[index] = (frame, timestamp)
+                    self._latest = StreamFrame(seq, frame, timestamp, landmarks)
+            self._connection = None
+            log.info('stream producer %s disconnected', address)
+
+
+class StreamRecorder(object):
+    """Records the frames of a stream and writes them to a track file when closed.
+
+    drain copies every frame a reader received since the last drain, not \
+    only the ones something evaluated. Frames the producer overwrote in the \
+    ring before they were drained are counted in lost.
+
+    :parameters:
+        filepath : str
+            The track file to write, .fntz writes the compressed format, \
+            anything else the binary format.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.lastSeq = None
+        self.lost = 0
+        self._frames = {}
+
+    def __len__(self):
+        return len(self._frames)
+
+    def reset(self):
+        """Restarts the sequence numbering for a new stream, the recorded frames are kept."""
+        self.lastSeq = None
+
+    def drain(self, reader):
+        """Copies the frames received since the last drain.
+
+        The first drain starts at the oldest frame still in the ring.
+
+        :parameters:
+            reader : RingBufferReader or SocketStreamReader
+                The stream to record.
+
+        :return: The number of frames recorded.
+        :rtype: int
+        """
+        latestSeq = reader.latestSeq()
+        if self.lastSeq is None or latestSeq < self.lastSeq:
+            # a new or restarted stream
+            self.lastSeq = max(latestSeq - reader.slots, 0)
+        if latestSeq == self.lastSeq:
+            return 0
+
+        firstSeq = self.lastSeq + 1
+        oldestSeq = max(latestSeq - reader.slots + 1, 1)
+        if firstSeq < oldestSeq:
+            self.lost += oldestSeq - firstSeq
+            log.debug('the stream lapped the recorder, lost %s frames', oldestSeq - firstSeq)
+            firstSeq = oldestSeq
+
+        recorded = 0
+        for seq in range(firstSeq, latestSeq + 1):
+            frame = reader.frameAt(seq)
+            if frame is not None:
+                landmarks = numpy.array(frame.landmarks, dtype=numpy.float32)
+                if reader.isCurrent(seq):
+                    self._frames[int(frame.frame)] = landmarks
+                    recorded += 1
+                    continue
+            self.lost += 1
+        self.lastSeq = latestSeq
+        return recorded
+
+    def add(self, frame, landmarks):
+        """Copies a frame in, a repeated frame number keeps the newest landmarks."""
+        self._frames[int(frame)] = numpy.array(landmarks, dtype=numpy.float32)
+
+    def close(self):
+        """Writes the recorded frames.
+
+        :return: The written filepath, None if nothing was recorded.
+        :rtype: str
+        """
+        if not self._frames:
+            return None
+        frames = sorted(self._frames)
+        track = facenetUtils.Track(numpy.array(frames, dtype=numpy.int32),
+                                   numpy.stack([self._frames[frame] for frame in frames]))
+        self._frames = {}
+        if self.filepath.endswith(facenetUtils.COMPRESSED_TRACK_EXT):
+            return facenetUtils.writeCompressedTrack(self.filepath, track)
+        return facenetUtils.writeBinaryTrack(self.filepath, track)
+
+
+class LatencyStats(object):
+    """Keeps the most recent latency samples in seconds.
+
+    :parameters:
+        size : int
+            The number of samples kept. Default: 1000
+    """
+    def __init__(self, size=1000):
+        self._samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, latency):
+        self._samples.append(latency)
+        self.count += 1
+
+    def addSince(self, timestamp):
+        """Adds the time since a perf_counter timestamp."""
+        self.add(time.perf_counter() - timestamp)
+
+    def clear(self):
+        self._samples.clear()
+        self.count = 0
+
+    def stats(self):
+        """Gets the sample count and the p50, p90, p99 and max latency in milliseconds."""
+        stats = {'samples': self.count}
+        if self._samples:
+            samples = numpy.array(self._samples) * 1e3
+            stats.update({'p50Ms': float(numpy.percentile(samples, 50)),
+                          'p90Ms': float(numpy.percentile(samples, 90)),
+                          'p99Ms': float(numpy.percentile(samples, 99)),
+                          'maxMs': float(samples.max())})
+        return stats
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------#
+# ------------------------------------------------------------------ HEADER --#
+"""
+:Authors:
+    juphillips
+
+:Description:
+    Command line tool to convert, validate and summarize facenet track files \
+    outside of Maya, using the same track code as the facenetTrack node.
+
+============
+Notes
+============
+
+    Every file is processed in its own worker of a process pool, so a day of \
+    capture uses every core of the machine. Directories are searched for \
+    json track files, --recursive searches their sub directories too. With \
+    --out, converted files keep their path relative to the searched \
+    directory, so same named files of different sub directories do not \
+    overwrite each other.
+
+        python facenetTrackTool.py convert /capture/day01 --recursive
+        python facenetTrackTool.py convert /capture/day01 --compressed --out /cache/day01
+        python facenetTrackTool.py validate /capture/day01 --landmarks 468 --max-gap 2
+        python facenetTrackTool.py stats /capture/day01/shot010_face.fntrk --json
+
+    validate exits with 1 when any file has a problem or fails to load. \
+    Containers are validated and summarized per actor face and head track, \
+    convert does not take them, they are already binary.
+
+"""
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- IMPORTS --#
+
+# Built-in
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+import timeit
+
+# Custom
+import facenetUtils
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+TRACK_EXTS = ('.json',
+              facenetUtils.BINARY_TRACK_EXT,
+              facenetUtils.COMPRESSED_TRACK_EXT,
+              facenetUtils.CONTAINER_TRACK_EXT)
+
+# ----------------------------------------------------------------------------#
+# --------------------------------------------------------------- FUNCTIONS --#
+
+
+def findTracks(paths, exts=TRACK_EXTS, recursive=False):
+    """Finds the track files among files and directories.
+
+    :parameters:
+        paths : list
+            Track files and directories to search.
+
+        exts : tuple
+            The file extensions searched for in directories. Default: TRACK_EXTS
+
+        recursive : bool
+            If True, searches the sub directories too. Default: False
+
+    :return: The sorted track filepaths.
+    :rtype: list
+    """
+    found = set()
+    for path in paths:
+        if os.path.isfile(path):
+            found.add(path)
+            continue
+        if not os.path.isdir(path):
+            log.warning('%s does not exist', path)
+            continue
+        for root, dirs, files in os.walk(path):
+            found.update(os.path.join(root, name) for name in files if name.lower().endswith(exts))
+            if not recursive:
+                break
+    return sorted(found)
+
+
+def outputRoots(paths, filepaths):
+    """Gets the directory each found file is kept relative to under an output directory.
+
+    Files found in a searched directory are relative to the outermost one \
+    holding them, files given directly to their own directory.
+
+    :return: The root directory by filepath.
+    :rtype: dict
+    """
+    directories = sorted((os.path.abspath(path) for path in paths if os.path.isdir(path)), key=len)
+    roots = {}
+    for filepath in filepaths:
+        absolute = os.path.abspath(filepath)
+        roots[filepath] = next((directory for directory in directories
+                                if absolute.startswith(os.path.join(directory, ''))), os.path.dirname(absolute))
+    return roots
+
+
+def outputPath(filepath, outDir, ext, root=None):
+    # converted files go next to the source unless an output directory is given,
+    # where they keep their path relative to the root
+    name = os.path.splitext(os.path.basename(filepath))[0] + ext
+    if not outDir:
+        return os.path.join(os.path.dirname(filepath), name)
+    relative = os.path.relpath(os.path.dirname(os.path.abspath(filepath)), root) if root else os.curdir
+    return os.path.normpath(os.path.join(outDir, relative, name))
+
+
+def convertFile(filepath, outDir=None, root=None, compressed=False, precision=facenetUtils.DEFAULT_PRECISION,
+                codec='zlib', overwrite=False):
+    """Converts one track file, run in a worker process.
+
+    Containers are refused, they are already binary and hold several tracks.
+
+    :return: The result of the file with the written path and timings.
+    :rtype: dict
+    """
+    ext = facenetUtils.COMPRESSED_TRACK_EXT if compressed else facenetUtils.BINARY_TRACK_EXT
+    outPath = outputPath(filepath, outDir, ext, root)
+    result = {'file': filepath, 'output': outPath, 'skipped': False}
+
+    if not overwrite and os.path.exists(outPath) and os.path.getmtime(outPath) >= os.path.getmtime(filepath):
+        result['skipped'] = True
+        return result
+
+    start = timeit.default_timer()
+    track = facenetUtils.loadTrack(filepath)
+    result['loadSeconds'] = timeit.default_timer() - start
+    if isinstance(track, facenetUtils.TrackContainer):
+        raise ValueError('{} is a multi actor container, convert only writes single tracks'.format(filepath))
+    if os.path.dirname(outPath):
+        os.makedirs(os.path.dirname(outPath), exist_ok=True)
+
+    start = timeit.default_timer()
+    if compressed:
+        facenetUtils.writeCompressedTrack(outPath, track, precision=precision, codec=codec)
+    else:
+        facenetUtils.writeBinaryTrack(outPath, track)
+    result['writeSeconds'] = timeit.default_timer() - start
+    result['inputBytes'] = os.path.getsize(filepath)
+    result['outputBytes'] = os.path.getsize(outPath)
+    result.update(facenetUtils.trackStats(track))
+    return result
+
+
+def fileTracks(loaded):
+    """Gets the tracks of a loaded track file.
+
+    :parameters:
+        loaded : Track or TrackContainer
+            The result of facenetUtils.loadTrack.
+
+    :return: (name, kind, track) for every track, the name is None for single \
+             track files and actor/kind for the tracks of a container.
+    :rtype: list
+    """
+    if not isinstance(loaded, facenetUtils.TrackContainer):
+        kind = 'head' if loaded.frameCount and loaded.landmarkCount == 1 else 'face'
+        return [(None, kind, loaded)]
+    tracks = []
+    for actorIndex, actorName in enumerate(loaded.names()):
+        for kind in facenetUtils.CONTAINER_KINDS:
+            track = loaded.track(actorIndex, kind)
+            if track is not None:
+                tracks.append(('{}/{}'.format(actorName, kind), kind, track))
+    return tracks
+
+
+def trackResults(loaded, function):
+    # the results of the single track of a file, or a result per track of a container
+    results = []
+    for name, kind, track in fileTracks(loaded):
+        result = function(kind, track)
+        result.update(facenetUtils.trackStats(track))
+        if name is None:
+            return result
+        result['track'] = name
+        results.append(result)
+    return {'tracks': results}
+
+
+def validateFile(filepath, landmarkCount=None, maxGap=0):
+    """Validates one track file, run in a worker process.
+
+    Head tracks, tracks with one landmark, are not checked against the landmark \
+    count. Every track of a container is validated and its problems are \
+    prefixed with the actor and kind.
+
+    :return: The stats and problems of the file.
+    :rtype: dict
+    """
+    def _validate(kind, track):
+        count = None if kind == 'head' else landmarkCount
+        return {'problems': facenetUtils.validateTrack(track, count, maxGap)}
+
+    loaded = facenetUtils.loadTrack(filepath)
+    result = {'file': filepath}
+    result.update(trackResults(loaded, _validate))
+    if 'tracks' in result:
+        result['problems'] = ['{}: {}'.format(track['track'], problem)
+                              for track in result['tracks'] for problem in track['problems']]
+        if not result['tracks']:
+            result['problems'].append('container holds no tracks')
+    return result
+
+
+def statsFile(filepath):
+    """Summarizes one track file, run in a worker process, containers per track."""
+    start = timeit.default_timer()
+    loaded = facenetUtils.loadTrack(filepath)
+    result = {'file': filepath, 'loadSeconds': timeit.default_timer() - start}
+    result.update(trackResults(loaded, lambda kind, track: {}))
+    return result
+
+
+def runPool(function, filepaths, workers=None, fileKwargs=None, **kwargs):
+    """Runs the function on every file across a process pool.
+
+    :parameters:
+        function : callable
+            A module level function taking a filepath and the kwargs.
+
+        filepaths : list
+            The files to process.
+
+        workers : int
+            The number of worker processes. Default: None, one per core
+
+        fileKwargs : dict
+            Extra kwargs of single files by filepath. Default: None
+
+    :return: One result per file in the order of filepaths, files that \
+             raise get an error entry instead.
+    :rtype: list
+    """
+    results = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = dict((pool.submit(function, filepath, **dict(kwargs, **(fileKwargs or {}).get(filepath, {}))),
+                        filepath) for filepath in filepaths)
+        for future in concurrent.futures.as_completed(futures):
+            filepath = futures[future]
+            try:
+                results[filepath] = future.result()
+            except Exception as e:
+                results[filepath] = {'file': filepath, 'error': '{}: {}'.format(type(e).__name__, e)}
+            log.info('finished %s', filepath)
+    return [results[filepath] for filepath in filepaths]
+
+
+def formatBytes(count):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return '{:.1f} {}'.format(count, unit)
+        count /= 1024.0
+
+
+def formatResult(command, result):
+    if 'error' in result:
+        return '{}  ERROR {}'.format(result['file'], result['error'])
+    if command == 'convert' and result['skipped']:
+        return '{}  up to date'.format(result['file'])
+    if 'tracks' in result:
+        lines = ['{}  {} tracks'.format(result['file'], len(result['tracks']))]
+        if command == 'stats':
+            lines[0] += '  {:.3f}s load'.format(result['loadSeconds'])
+        elif not result['tracks']:
+            lines[0] += '  ' + '; '.join(result['problems'])
+        for track in result['tracks']:
+            lines.append(formatResult(command, dict(track, file='  ' + track['track'])))
+        return '\n'.join(lines)
+
+    line = '{}  {} frames [{}, {}]  {} landmarks  {} missing'.format(result['file'],
+                                                                     result['frames'],
+                                                                     result['firstFrame'],
+                                                                     result['lastFrame'],
+                                                                     result['landmarks'],
+                                                                     result['missingFrames'])
+    if command == 'convert':
+        line += '  {} -> {} ({:.1f}x)  {:.2f}s'.format(formatBytes(result['inputBytes']),
+                                                       formatBytes(result['outputBytes']),
+                                                       result['inputBytes'] / float(max(result['outputBytes'], 1)),
+                                                       result['loadSeconds'] + result['writeSeconds'])
+    elif command == 'validate':
+        line += '  ' + ('; '.join(result['problems']) if result['problems'] else 'ok')
+    else:
+        line += '  {}'.format(formatBytes(result['bytes']))
+        if 'loadSeconds' in result:
+            line += '  {:.3f}s load'.format(result['loadSeconds'])
+    return line
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Convert, validate and summarize facenet track files.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    convertParser = subparsers.add_parser('convert', help='convert json tracks to the binary or compressed format')
+    convertParser.add_argument('--out', help='output directory, defaults to next to each source')
+    convertParser.add_argument('--compressed', action='store_true', help='write the compressed format')
+    convertParser.add_argument('--precision', type=float, default=facenetUtils.DEFAULT_PRECISION,
+                               help='compressed quantization step')
+    convertParser.add_argument('--codec', choices=sorted(facenetUtils.COMPRESSED_CODECS), default='zlib')
+    convertParser.add_argument('--overwrite', action='store_true', help='convert files that are up to date')
+
+    validateParser = subparsers.add_parser('validate', help='check landmark counts and frame continuity')
+    validateParser.add_argument('--landmarks', type=int, help='expected face landmark count')
+    validateParser.add_argument('--max-gap', type=int, default=0, help='largest allowed run of missing frames')
+
+    subparsers.add_parser('stats', help='print per file stats')
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument('paths', nargs='+', help='track files or directories')
+        subparser.add_argument('--recursive', '-r', action='store_true', help='search sub directories')
+        subparser.add_argument('--workers', '-j', type=int, help='worker processes, defaults to one per core')
+        subparser.add_argument('--json', action='store_true', help='print the results as json')
+    options = parser.parse_args(args)
+
+    if options.command == 'convert':
+        filepaths = findTracks(options.paths, ('.json',), options.recursive)
+        roots = outputRoots(options.paths, filepaths)
+        ext = facenetUtils.COMPRESSED_TRACK_EXT if options.compressed else facenetUtils.BINARY_TRACK_EXT
+        outputs = {}
+        for filepath in filepaths:
+            outPath = os.path.abspath(outputPath(filepath, options.out, ext, roots[filepath]))
+            if outPath in outputs:
+                log.error('%s and %s would both be converted to %s', outputs[outPath], filepath, outPath)
+                return 1
+            outputs[outPath] = filepath
+        if options.out and not os.path.isdir(options.out):
+            os.makedirs(options.out)
+        results = runPool(convertFile, filepaths, options.workers,
+                          fileKwargs=dict((filepath, {'root': roots[filepath]}) for filepath in filepaths),
+                          outDir=options.out,
+                          compressed=options.compressed,
+                          precision=options.precision,
+                          codec=options.codec,
+                          overwrite=options.overwrite)
+    elif options.command == 'validate':
+        filepaths = findTracks(options.paths, recursive=options.recursive)
+        results = runPool(validateFile, filepaths, options.workers,
+                          landmarkCount=options.landmarks,
+                          maxGap=options.max_gap)
+    else:
+        filepaths = findTracks(options.paths, recursive=options.recursive)
+        results = runPool(statsFile, filepaths, options.workers)
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(formatResult(options.command, result))
+        print('{} files'.format(len(results)))
+
+    failed = any('error' in result or result.get('problems') for result in results)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,2005 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------------#
+# ------------------------------------------------------------------ HEADER --#
+"""
+:Authors:
+    juphillips
+
+:Description:
+    Maya independent track reading and processing used by the facenetTrack \
+    node. Tracks are held as one contiguous frames x landmarks x 2 float32 \
+    array with an O(1) frame to row lookup.
+
+============
+Notes
+============
+
+    A faceTrack json file maps str(frame) to a list of [x, y] landmarks. A \
+    headTrack json file maps str(frame) to a single [x, y] position, it is \
+    stored as a track with one landmark.
+
+    Binary track format (.fntrk), all values little endian:
+
+        ======  =====  ==============================================
+        offset  bytes  field
+        ======  =====  ==============================================
+        0       4      magic b'FNTK'
+        4       2      format version (uint16)
+        6       2      header size in bytes (uint16)
+        8       4      frame count F (uint32)
+        12      4      landmark count L (uint32)
+        16      4      values per landmark, always 2 (uint32)
+        20      4      first frame (int32)
+        24      8      landmark block offset (uint64)
+        32      F * 4  sorted frame numbers (int32)
+        offset  F*L*8  landmark block, F x L x 2 float32
+        ======  =====  ==============================================
+
+    The landmark block starts on a BINARY_ALIGNMENT boundary and is memory \
+    mapped on load so frames only page in when they are touched.
+
+    Compressed track format (.fntz), all values little endian:
+
+        ======  =====  ==============================================
+        offset  bytes  field
+        ======  =====  ==============================================
+        0       4      magic b'FNTZ'
+        4       2      format version (uint16)
+        6       2      header size in bytes (uint16)
+        8       4      frame count F (uint32)
+        12      4      landmark count L (uint32)
+        16      4      values per landmark, always 2 (uint32)
+        20      4      frames per block B (uint32)
+        24      4      block count N (uint32)
+        28      2      codec, 0 zlib or 1 lzma (uint16)
+        30      2      reserved
+        32      8      quantization step (float64)
+        40      F * 4  sorted frame numbers (int32)
+        ..      N * 16 block table, offset (uint64), size (uint32), first row (uint32)
+        ..      ..     compressed blocks
+        ======  =====  ==============================================
+
+    Coordinates are quantized to int32 multiples of the step. The first row \
+    of each block is a keyframe holding absolute values, the other rows hold \
+    the difference to the previous row. The values are zigzag encoded, split \
+    into byte planes and compressed with the codec, so any block can be \
+    decoded on its own.
+
+    Track container format (.fnact), all values little endian:
+
+        ======  =====  ==============================================
+        offset  bytes  field
+        ======  =====  ==============================================
+        0       4      magic b'FNMA'
+        4       2      format version (uint16)
+        6       2      header size in bytes (uint16)
+        8       4      table of contents entry count E (uint32)
+        12      4      actor count A (uint32)
+        16      E * 48 table of contents, actor index (uint32), kind \
+                       0 face or 1 head (uint32), track offset (uint64), \
+                       track size (uint64), actor name (24 bytes utf-8)
+        ..      ..     binary tracks, each starting on a BINARY_ALIGNMENT boundary
+        ======  =====  ==============================================
+
+    A container holds the face and head tracks of many actors as embedded \
+    binary tracks, their offsets are relative to the start of the track. \
+    Every actor is memory mapped from the one file, so all the nodes of a \
+    crowd shot share one open and one cache entry.
+
+    Parsed json and compressed tracks are kept in a local DiskTrackCache \
+    directory as binary tracks, so the next scene open memory maps them \
+    instead of parsing again. The disk cache is off unless \
+    FACENET_TRACK_CACHE names its directory.
+
+"""
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- IMPORTS --#
+
+# Built-in
+import collections
+import hashlib
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import lzma
+
+# Third party
+import numpy
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- GLOBALS --#
+log = logging.getLogger(__name__)
+
+BINARY_TRACK_EXT = '.fntrk'
+BINARY_MAGIC = b'FNTK'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHHIIIiQ')
+BINARY_ALIGNMENT = 64
+
+DEFAULT_CACHE_BUDGET = 2 * 1024 ** 3
+
+DISK_CACHE_ENV = 'FACENET_TRACK_CACHE'
+DEFAULT_DISK_CACHE_BUDGET = 2 * 1024 ** 3
+TEMP_EXT = '.tmp'
+# temp files older than this are left by a writer that died, younger ones may still be written
+STALE_TEMP_SECONDS = 60 * 60
+HASH_READ_CHUNK = 4 * 1024 ** 2
+
+JSON_READ_CHUNK = 4 * 1024 ** 2
+
+WINDOW_BLOCK_FRAMES = 64
+
+COMPRESSED_TRACK_EXT = '.fntz'
+COMPRESSED_MAGIC = b'FNTZ'
+COMPRESSED_VERSION = 1
+COMPRESSED_HEADER = struct.Struct('<4sHHIIIIIHHd')
+COMPRESSED_BLOCK = struct.Struct('<QII')
+COMPRESSED_CODECS = {'zlib': 0, 'lzma': 1}
+DEFAULT_PRECISION = 1e-3
+DEFAULT_BLOCK_FRAMES = 256
+
+CONTAINER_TRACK_EXT = '.fnact'
+CONTAINER_MAGIC = b'FNMA'
+CONTAINER_VERSION = 1
+CONTAINER_HEADER = struct.Struct('<4sHHII')
+CONTAINER_NAME_SIZE = 24
+CONTAINER_ENTRY = struct.Struct('<IIQQ{}s'.format(CONTAINER_NAME_SIZE))
+CONTAINER_KINDS = ['face', 'head']
+
+# how frames missing from a track are filled, in gapPolicy enum order
+GAP_POLICIES = ['hold', 'nearest', 'interpolate']
+
+# temporal smoothing filters, in smoothFilter enum order
+SMOOTH_FILTERS = ['none', 'oneEuro', 'savitzkyGolay', 'gaussian']
+DEFAULT_FPS = 24.0
+
+# frame rate resampling methods, in resampleMethod enum order
+RESAMPLE_METHODS = ['nearest', 'linear', 'cubic']
+
+# named landmark regions by the landmark count of the layout they index
+LANDMARK_REGIONS = {
+    68: {'jaw': range(0, 17),
+         'brows': range(17, 27),
+         'rightBrow': range(17, 22),
+         'leftBrow': range(22, 27),
+         'nose': range(27, 36),
+         'eyes': range(36, 48),
+         'rightEye': range(36, 42),
+         'leftEye': range(42, 48),
+         'lips': range(48, 68),
+         'outerLips': range(48, 60),
+         'innerLips': range(60, 68)},
+    # the 106 point layout, brows, eyes and nose each add a second row of points
+    106: {'jaw': range(0, 33),
+          'brows': list(range(33, 43)) + list(range(64, 72)),
+          'rightBrow': list(range(33, 38)) + list(range(64, 68)),
+          'leftBrow': list(range(38, 43)) + list(range(68, 72)),
+          'nose': list(range(43, 52)) + list(range(78, 84)),
+          'eyes': list(range(52, 64)) + list(range(72, 78)) + [104, 105],
+          'rightEye': list(range(52, 58)) + [72, 73, 74, 104],
+          'leftEye': list(range(58, 64)) + [75, 76, 77, 105],
+          'lips': range(84, 104),
+          'outerLips': range(84, 96),
+          'innerLips': range(96, 104)},
+    # the 468 point face mesh, regions follow its contour connections
+    468: {'jaw': [454, 323, 361, 288, 397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136, 172, 58,
+                  132, 93, 234],
+          'faceOval': [10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288, 397, 365, 379, 378, 400,
+                       377, 152, 148, 176, 149, 150, 136, 172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67,
+                       109],
+          'brows': [46, 53, 52, 65, 55, 70, 63, 105, 66, 107, 276, 283, 282, 295, 285, 300, 293, 334, 296,
+                    336],
+          'rightBrow': [46, 53, 52, 65, 55, 70, 63, 105, 66, 107],
+          'leftBrow': [276, 283, 282, 295, 285, 300, 293, 334, 296, 336],
+          'nose': [168, 6, 197, 195, 5, 4, 1, 19, 94, 2, 98, 97, 326, 327, 294, 278, 344, 440, 275, 45,
+                   220, 115, 48, 64],
+          'eyes': [33, 7, 163, 144, 145, 153, 154, 155, 133, 246, 161, 160, 159, 158, 157, 173, 263, 249,
+                   390, 373, 374, 380, 381, 382, 362, 466, 388, 387, 386, 385, 384, 398],
+          'rightEye': [33, 7, 163, 144, 145, 153, 154, 155, 133, 246, 161, 160, 159, 158, 157, 173],
+          'leftEye': [263, 249, 390, 373, 374, 380, 381, 382, 362, 466, 388, 387, 386, 385, 384, 398],
+          'lips': [61, 146, 91, 181, 84, 17, 314, 405, 321, 375, 291, 185, 40, 39, 37, 0, 267, 269, 270,
+                   409, 78, 95, 88, 178, 87, 14, 317, 402, 318, 324, 308, 191, 80, 81, 82, 13, 312, 311,
+                   310, 415],
+          'outerLips': [61, 146, 91, 181, 84, 17, 314, 405, 321, 375, 291, 185, 40, 39, 37, 0, 267, 269,
+                        270, 409],
+          'innerLips': [78, 95, 88, 178, 87, 14, 317, 402, 318, 324, 308, 191, 80, 81, 82, 13, 312, 311,
+                        310, 415]},
+}
+
+# ----------------------------------------------------------------------------#
+# --------------------------------------------------------------- FUNCTIONS --#
+
+
+def trackFromDict(trackDict):
+    """Builds a track from the json layout of a faceTrack or headTrack.
+
+    :parameters:
+        trackDict : dict
+            str(frame) keys holding a list of [x, y] landmarks or a single [x, y].
+
+    :return: The track holding every frame of the dict.
+    :rtype: Track
+    """
+    frames = sorted(int(frame) for frame in trackDict)
+    if not frames:
+        return Track(numpy.zeros(0, dtype=numpy.int32),
+                     numpy.zeros((0, 0, 2), dtype=numpy.float32))
+
+    try:
+        data = numpy.array([trackDict[str(frame)] for frame in frames], dtype=numpy.float32)
+    except ValueError:
+        raise ValueError('Track frames do not all hold the same number of landmarks.')
+
+    # a head track holds one position per frame
+    if data.ndim == 2:
+        data = data.reshape(len(frames), 1, data.shape[-1])
+    if data.ndim != 3 or data.shape[-1] != 2:
+        raise ValueError('Track landmarks must be [x, y] pairs, got shape {}'.format(data.shape))
+
+    return Track(numpy.array(frames, dtype=numpy.int32), data)
+
+
+def gapRows(frames, span, policy='hold'):
+    """Gets the row of the present frames to play for each frame of a span.
+
+    :parameters:
+        frames : numpy.ndarray
+            The sorted frame numbers present in the track.
+
+        span : numpy.ndarray
+            The frames to look up, within the first and last present frame.
+
+        policy : str
+            hold plays the previous present frame, nearest the closest one. \
+            Default: hold
+
+    :return: The int32 rows, one per frame of the span.
+    :rtype: numpy.ndarray
+    """
+    if policy not in GAP_POLICIES:
+        raise ValueError('Unknown gap policy {}, use one of {}'.format(policy, GAP_POLICIES))
+    rows = numpy.searchsorted(frames, span, side='right').astype(numpy.int32) - 1
+    if policy != 'hold' and len(frames):
+        after = numpy.minimum(rows + 1, len(frames) - 1)
+        closer = (frames[after] - span) < (span - frames[rows])
+        rows = numpy.where(closer, after, rows).astype(numpy.int32)
+    return rows
+
+
+def resolveLandmarkMask(mask, landmarkCount):
+    """Resolves a landmark mask string into the sorted landmark indices it selects.
+
+    :parameters:
+        mask : str
+            Space or comma separated landmark indices, inclusive index ranges \
+            like 48-67 and LANDMARK_REGIONS names like lips or brows.
+
+        landmarkCount : int
+            The landmark count of the track, picks the region layout and bounds the indices.
+
+    :return: The int32 landmark indices, None if the mask is empty and selects every landmark.
+    :rtype: numpy.ndarray
+    """
+    tokens = mask.replace(',', ' ').split() if mask else []
+    if not tokens:
+        return None
+
+    regions = LANDMARK_REGIONS.get(landmarkCount, {})
+    indices = []
+    for token in tokens:
+        if token in regions:
+            indices.extend(regions[token])
+        elif token.lstrip('-').isdigit():
+            indices.append(int(token))
+        elif '-' in token and all(part.isdigit() for part in token.split('-', 1)):
+            first, last = (int(part) for part in token.split('-', 1))
+            indices.extend(range(first, last + 1))
+        else:
+            raise ValueError('Unknown landmark region {} for {} landmarks, use one of {}'.format(
+                token, landmarkCount, sorted(regions)))
+
+    indices = numpy.unique(numpy.array(indices, dtype=numpy.int32))
+    if indices[0] < 0 or indices[-1] >= landmarkCount:
+        raise ValueError('Landmark mask {} is outside the {} landmarks of the track'.format(mask, landmarkCount))
+    return indices
+
+
+def convolveFrames(data, weights):
+    """Convolves every landmark coordinate over the frames with the weights, holding the edge frames.
+
+    :parameters:
+        data : numpy.ndarray
+            The frames x landmarks x 2 block.
+
+        weights : numpy.ndarray
+            An odd length kernel centred on the frame.
+
+    :return: The float32 filtered block.
+    :rtype: numpy.ndarray
+    """
+    radius = len(weights) // 2
+    padded = numpy.concatenate([numpy.repeat(data[:1], radius, axis=0),
+                                data,
+                                numpy.repeat(data[-1:], radius, axis=0)])
+    # one pass per kernel tap, each over the whole take
+    out = numpy.zeros(data.shape, dtype=numpy.float64)
+    for tap, weight in enumerate(weights):
+        out += weight * padded[tap:tap + len(data)]
+    return out.astype(numpy.float32)
+
+
+def gaussianWeights(sigma):
+    radius = max(int(numpy.ceil(3.0 * sigma)), 1)
+    offsets = numpy.arange(-radius, radius + 1, dtype=numpy.float64)
+    weights = numpy.exp(-0.5 * (offsets / sigma) ** 2)
+    return weights / weights.sum()
+
+
+def savitzkyGolayWeights(window, order):
+    # the least squares polynomial fit of the window evaluated at its centre
+    radius = max(int(window) // 2, 1)
+    order = min(max(int(order), 0), 2 * radius)
+    offsets = numpy.arange(-radius, radius + 1, dtype=numpy.float64)
+    vandermonde = offsets[:, None] ** numpy.arange(order + 1)
+    return numpy.linalg.pinv(vandermonde)[0]
+
+
+def oneEuroFilter(data, frames, fps=DEFAULT_FPS, minCutoff=1.0, beta=0.0, dCutoff=1.0):
+    """Runs a one euro filter over the frames, on every landmark coordinate at once.
+
+    The filter is recursive in time so it steps through the frames, each \
+    step works on the whole landmarks x 2 row.
+
+    :parameters:
+        data : numpy.ndarray
+            The frames x landmarks x 2 block.
+
+        frames : numpy.ndarray
+            The frame number of each row, spaces the samples in time.
+
+        fps : float
+            The frame rate of the frame numbers. Default: DEFAULT_FPS
+
+        minCutoff : float
+            The cutoff frequency in hz when the landmarks are still, lower smooths more. Default: 1.0
+
+        beta : float
+            How fast the cutoff rises with the landmark speed, higher lags less. Default: 0.0
+
+        dCutoff : float
+            The cutoff frequency of the speed estimate. Default: 1.0
+
+    :return: The float32 filtered block.
+    :rtype: numpy.ndarray
+    """
+    def alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * numpy.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    out = numpy.empty(data.shape, dtype=numpy.float32)
+    if not len(data):
+        return out
+
+    steps = numpy.maximum(numpy.diff(frames), 1) / float(fps)
+    value = data[0].astype(numpy.float64)
+    speed = numpy.zeros_like(value)
+    out[0] = value
+    for row in range(1, len(data)):
+        dt = steps[row - 1]
+        sample = data[row]
+        dAlpha = alpha(dCutoff, dt)
+        speed = dAlpha * (sample - value) / dt + (1.0 - dAlpha) * speed
+        cutoffAlpha = alpha(minCutoff + beta * numpy.abs(speed), dt)
+        value = cutoffAlpha * sample + (1.0 - cutoffAlpha) * value
+        out[row] = value
+    return out
+
+
+def smoothTrack(track,
+                method,
+                sigma=1.0,
+                window=5,
+                order=2,
+                minCutoff=1.0,
+                beta=0.0,
+                dCutoff=1.0,
+                fps=DEFAULT_FPS):
+    """Smooths a whole track over time.
+
+    :parameters:
+        track : Track
+            The track to smooth.
+
+        method : str
+            One of SMOOTH_FILTERS.
+
+        sigma : float
+            The gaussian standard deviation in frames. Default: 1.0
+
+        window : int
+            The Savitzky-Golay window in frames, rounded up to odd. Default: 5
+
+        order : int
+            The Savitzky-Golay polynomial order. Default: 2
+
+        minCutoff, beta, dCutoff : float
+            The one euro filter parameters, see oneEuroFilter.
+
+        fps : float
+            The frame rate of the track for the one euro filter. Default: DEFAULT_FPS
+
+    :return: The smoothed track, or this track for none.
+    :rtype: Track
+    """
+    if method not in SMOOTH_FILTERS:
+        raise ValueError('Unknown smooth filter {}, use one of {}'.format(method, SMOOTH_FILTERS))
+    if method == 'none' or track.frameCount < 2:
+        return track
+
+    if method == 'gaussian':
+        if sigma <= 0:
+            return track
+        data = convolveFrames(track.data, gaussianWeights(sigma))
+    elif method == 'savitzkyGolay':
+        data = convolveFrames(track.data, savitzkyGolayWeights(window, order))
+    else:
+        data = oneEuroFilter(track.data, track.frames, fps, minCutoff, beta, dCutoff)
+    return Track(track.frames, data)
+
+
+def resampleTrack(track, sourceFps, targetFps, method='linear'):
+    """Resamples a whole track from one frame rate to another.
+
+    Frame f of the result plays the track at frame f * sourceFps / targetFps, \
+    the result covers every target frame inside the track range.
+
+    :parameters:
+        track : Track
+            The track to resample, gaps are interpolated first.
+
+        sourceFps : float
+            The frame rate the track was captured at.
+
+        targetFps : float
+            The frame rate to resample to.
+
+        method : str
+            One of RESAMPLE_METHODS, cubic is a Catmull-Rom spline through the \
+            neighbouring frames. Default: linear
+
+    :return: The resampled track, or this track if the frame rates match.
+    :rtype: Track
+    """
+    if method not in RESAMPLE_METHODS:
+        raise ValueError('Unknown resample method {}, use one of {}'.format(method, RESAMPLE_METHODS))
+    if sourceFps <= 0 or targetFps <= 0:
+        raise ValueError('Frame rates must be positive, got {} and {}'.format(sourceFps, targetFps))
+    if sourceFps == targetFps or track.frameCount < 2:
+        return track
+
+    track = track.filled('interpolate')
+    ratio = float(sourceFps) / targetFps
+    first = int(numpy.ceil(track.firstFrame / ratio - 1e-9))
+    last = int(numpy.floor(track.lastFrame / ratio + 1e-9))
+    frames = numpy.arange(first, last + 1, dtype=numpy.int32)
+
+    # fractional rows of the source data to sample
+    rows = numpy.clip(frames * ratio - track.firstFrame, 0, track.frameCount - 1)
+    if method == 'nearest':
+        return Track(frames, track.data[numpy.rint(rows).astype(numpy.intp)])
+
+    lastRow = track.frameCount - 1
+    base = numpy.minimum(numpy.floor(rows).astype(numpy.intp), lastRow - 1)
+    weight = (rows - base).astype(numpy.float32)[:, None, None]
+    p1 = track.data[base]
+    p2 = track.data[base + 1]
+    if method == 'linear':
+        data = p1 + (p2 - p1) * weight
+    else:
+        p0 = track.data[numpy.maximum(base - 1, 0)]
+        p3 = track.data[numpy.minimum(base + 2, lastRow)]
+        weight2 = weight * weight
+        weight3 = weight2 * weight
+        data = 0.5 * ((2.0 * p1) + (p2 - p0) * weight
+                      + (2.0 * p0 - 5.0 * p1 + 4.0 * p2 - p3) * weight2
+                      + (3.0 * p1 - p0 - 3.0 * p2 + p3) * weight3)
+    return Track(frames, data.astype(numpy.float32, copy=False))
+
+
+def relativeTrack(track, headTrack):
+    """Builds the head relative track by subtracting the head position of \
+    each frame from every landmark of the track, over the whole take at once.
+
+    :parameters:
+        track : Track
+            The landmark track.
+
+        headTrack : Track
+            The head track, looked up by the same frame numbers as the track.
+
+    :return: A new track holding the head relative landmarks.
+    :rtype: Track
+    """
+    headRows = headTrack.rowsForFrames(track.frames)
+    data = numpy.subtract(track.data, headTrack.data[headRows, :1, :], dtype=numpy.float32)
+    return Track(track.frames, data)
+
+
+def loadJsonTrack(filepath, progress=None):
+    """Loads a faceTrack or headTrack json file.
+
+    :parameters:
+        filepath : str
+            The json file to load.
+
+        progress : callable
+            Called with the loaded fraction from 0.0 to 1.0. Default: None
+
+    :return: The loaded track.
+    :rtype: Track
+    """
+    if progress is None:
+        with open(filepath) as infile:
+            track = trackFromDict(json.load(infile))
+    else:
+        # read in chunks so the progress follows the bytes read, parsing is the last step
+        size = max(os.path.getsize(filepath), 1)
+        chunks = []
+        with open(filepath, 'rb') as infile:
+            for chunk in iter(lambda: infile.read(JSON_READ_CHUNK), b''):
+                chunks.append(chunk)
+                progress(0.9 * min(infile.tell(), size) / size)
+        track = trackFromDict(json.loads(b''.join(chunks).decode('utf-8')))
+        progress(1.0)
+    log.debug('loaded %s frames x %s landmarks from %s',
+              track.frameCount, track.landmarkCount, filepath)
+    return track
+
+
+def _tempPath(filepath):
+    # unique per process and thread, so concurrent writers of one file never share a temp file
+    return '{}{}{}.{}'.format(filepath, TEMP_EXT, os.getpid(), threading.current_thread().ident)
+
+
+def _discard(tempPath):
+    try:
+        os.remove(tempPath)
+    except OSError:
+        pass
+
+
+def writeBinaryTrack(filepath, track):
+    """Writes the track to the binary track format.
+
+    :parameters:
+        filepath : str
+            The .fntrk file to write. Written to a temp file then renamed.
+
+        track : Track
+            The track to write.
+
+    :return: The written filepath.
+    :rtype: str
+    """
+    tempPath = _tempPath(filepath)
+    try:
+        with open(tempPath, 'wb') as outfile:
+            writeBinaryTrackData(outfile, track)
+        # atomic on posix and windows, readers see the old file or the new one
+        os.replace(tempPath, filepath)
+    except BaseException:
+        _discard(tempPath)
+        raise
+
+    log.debug('wrote %s frames x %s landmarks to %s', track.frameCount,
+              track.landmarkCount if track.frameCount else 0, filepath)
+    return filepath
+
+
+def writeBinaryTrackData(outfile, track):
+    """Writes the track in the binary track format at the current position of an open file.
+
+    :return: The number of bytes written.
+    :rtype: int
+    """
+    frameCount = track.frameCount
+    landmarkCount = track.landmarkCount if frameCount else 0
+    framesSize = frameCount * 4
+    dataOffset = BINARY_HEADER.size + framesSize
+    dataOffset += -dataOffset % BINARY_ALIGNMENT
+
+    header = BINARY_HEADER.pack(BINARY_MAGIC,
+                                BINARY_VERSION,
+                                BINARY_HEADER.size,
+                                frameCount,
+                                landmarkCount,
+                                2,
+                                track.firstFrame,
+                                dataOffset)
+
+    data = numpy.ascontiguousarray(track.data, dtype='<f4')
+    outfile.write(header)
+    outfile.write(track.frames.astype('<i4').tobytes())
+    outfile.write(b'\0' * (dataOffset - BINARY_HEADER.size - framesSize))
+    outfile.write(data.tobytes())
+    return dataOffset + data.nbytes
+
+
+def readBinaryHeader(filepath, offset=0):
+    """Reads the header of a binary track file.
+
+    :parameters:
+        filepath : str
+            The .fntrk file to read.
+
+        offset : int
+            Where the track starts in the file, for tracks embedded in a container. Default: 0
+
+    :return: The header fields.
+    :rtype: dict
+    """
+    with open(filepath, 'rb') as infile:
+        infile.seek(offset)
+        raw = infile.read(BINARY_HEADER.size)
+    if len(raw) < BINARY_HEADER.size:
+        raise ValueError('{} is too short to be a binary track'.format(filepath))
+
+    fields = BINARY_HEADER.unpack(raw)
+    if fields[0] != BINARY_MAGIC:
+        raise ValueError('{} is not a binary track'.format(filepath))
+    if fields[1] > BINARY_VERSION:
+        raise ValueError('{} is binary track version {}, only {} is supported'.format(filepath,
+                                                                                       fields[1],
+                                                                                       BINARY_VERSION))
+
+    return {'version': fields[1],
+            'headerSize': fields[2],
+            'frameCount': fields[3],
+            'landmarkCount': fields[4],
+            'dims': fields[5],
+            'firstFrame': fields[6],
+            'dataOffset': fields[7]}
+
+
+def loadBinaryTrack(filepath, offset=0):
+    """Memory maps a binary track file.
+
+    :parameters:
+        filepath : str
+            The .fntrk file to load.
+
+        offset : int
+            Where the track starts in the file, for tracks embedded in a container. Default: 0
+
+    :return: The track, its data block is a read only numpy.memmap.
+    :rtype: Track
+    """
+    header = readBinaryHeader(filepath, offset)
+    frameCount = header['frameCount']
+    shape = (frameCount, header['landmarkCount'], header['dims'])
+
+    with open(filepath, 'rb') as infile:
+        infile.seek(offset + header['headerSize'])
+        frames = numpy.frombuffer(infile.read(frameCount * 4), dtype='<i4').astype(numpy.int32)
+
+    if frameCount:
+        data = numpy.memmap(filepath, dtype='<f4', mode='r', offset=offset + header['dataOffset'],
+                            shape=shape)
+    else:
+        data = numpy.zeros(shape, dtype=numpy.float32)
+
+    return Track(frames, data)
+
+
+def isBinaryTrack(filepath):
+    """Checks if the file starts with the binary track magic."""
+    with open(filepath, 'rb') as infile:
+        return infile.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def isCompressedTrack(filepath):
+    """Checks if the file starts with the compressed track magic."""
+    with open(filepath, 'rb') as infile:
+        return infile.read(len(COMPRESSED_MAGIC)) == COMPRESSED_MAGIC
+
+
+def isTrackContainer(filepath):
+    """Checks if the file starts with the track container magic."""
+    with open(filepath, 'rb') as infile:
+        return infile.read(len(CONTAINER_MAGIC)) == CONTAINER_MAGIC
+
+
+def writeTrackContainer(filepath, actors):
+    """Writes the face and head tracks of many actors to one track container.
+
+    :parameters:
+        filepath : str
+            The .fnact file to write. Written to a temp file then renamed.
+
+        actors : list
+            One dict per actor, in actor index order, with a face Track and \
+            optional head Track and name.
+
+    :return: The written filepath.
+    :rtype: str
+    """
+    entries = []
+    for actorIndex, actor in enumerate(actors):
+        name = actor.get('name') or 'actor{}'.format(actorIndex)
+        for kind in CONTAINER_KINDS:
+            if actor.get(kind) is not None:
+                entries.append((actorIndex, kind, name, actor[kind]))
+
+    offset = CONTAINER_HEADER.size + len(entries) * CONTAINER_ENTRY.size
+    tempPath = _tempPath(filepath)
+    try:
+        with open(tempPath, 'wb') as outfile:
+            outfile.write(CONTAINER_HEADER.pack(CONTAINER_MAGIC,
+                                                CONTAINER_VERSION,
+                                                CONTAINER_HEADER.size,
+                                                len(entries),
+                                                len(actors)))
+            # the table is written once the track sizes are known
+            outfile.write(b'\0' * (len(entries) * CONTAINER_ENTRY.size))
+
+            table = []
+            for actorIndex, kind, name, track in entries:
+                outfile.write(b'\0' * (-offset % BINARY_ALIGNMENT))
+                offset += -offset % BINARY_ALIGNMENT
+                size = writeBinaryTrackData(outfile, track)
+                table.append(CONTAINER_ENTRY.pack(actorIndex,
+                                                  CONTAINER_KINDS.index(kind),
+                                                  offset,
+                                                  size,
+                                                  name.encode('utf-8')[:CONTAINER_NAME_SIZE]))
+                offset += size
+
+            outfile.seek(CONTAINER_HEADER.size)
+            outfile.write(b''.join(table))
+        os.replace(tempPath, filepath)
+    except BaseException:
+        _discard(tempPath)
+        raise
+
+    log.debug('wrote %s actors to %s', len(actors), filepath)
+    return filepath
+
+
+def readContainerHeader(filepath):
+    """Reads the header and table of contents of a track container.
+
+    :parameters:
+        filepath : str
+            The .fnact file to read.
+
+    :return: The actor count and the table of contents entries.
+    :rtype: dict
+    """
+    with open(filepath, 'rb') as infile:
+        raw = infile.read(CONTAINER_HEADER.size)
+        if len(raw) < CONTAINER_HEADER.size:
+            raise ValueError('{} is too short to be a track container'.format(filepath))
+
+        fields = CONTAINER_HEADER.unpack(raw)
+        if fields[0] != CONTAINER_MAGIC:
+            raise ValueError('{} is not a track container'.format(filepath))
+        if fields[1] > CONTAINER_VERSION:
+            raise ValueError('{} is track container version {}, only {} is supported'.format(
+                filepath, fields[1], CONTAINER_VERSION))
+
+        infile.seek(fields[2])
+        table = infile.read(fields[3] * CONTAINER_ENTRY.size)
+
+    entries = []
+    for index in range(fields[3]):
+        actorIndex, kind, offset, size, name = CONTAINER_ENTRY.unpack_from(table, index * CONTAINER_ENTRY.size)
+        entries.append({'actor': actorIndex,
+                        'kind': CONTAINER_KINDS[kind],
+                        'offset': offset,
+                        'size': size,
+                        'name': name.rstrip(b'\0').decode('utf-8', 'ignore')})
+    return {'version': fields[1], 'actorCount': fields[4], 'entries': entries}
+
+
+def loadTrackContainer(filepath):
+    """Memory maps every track of a track container.
+
+    :parameters:
+        filepath : str
+            The .fnact file to load.
+
+    :return: The container holding the tracks of every actor.
+    :rtype: TrackContainer
+    """
+    header = readContainerHeader(filepath)
+    actors = [{'name': None, 'face': None, 'head': None} for _ in range(header['actorCount'])]
+    for entry in header['entries']:
+        actor = actors[entry['actor']]
+        actor['name'] = entry['name']
+        actor[entry['kind']] = loadBinaryTrack(filepath, entry['offset'])
+    return TrackContainer(filepath, actors)
+
+
+def packTrackContainer(outPath, facePaths, headPaths=None, names=None):
+    """Loads face and head track files of any format and writes them to one container.
+
+    :parameters:
+        outPath : str
+            The .fnact file to write.
+
+        facePaths : list
+            The face track file of each actor.
+
+        headPaths : list
+            The head track file of each actor, None entries have no head track. Default: None
+
+        names : list
+            The name of each actor. Default: None, the face track file names
+
+    :return: The written filepath.
+    :rtype: str
+    """
+    headPaths = headPaths or [None] * len(facePaths)
+    names = names or [os.path.splitext(os.path.basename(path))[0] for path in facePaths]
+    actors = []
+    for facePath, headPath, name in zip(facePaths, headPaths, names):
+        actors.append({'name': name,
+                       'face': loadTrack(facePath),
+                       'head': loadTrack(headPath) if headPath else None})
+    return writeTrackContainer(outPath, actors)
+
+
+def _compress(raw, codec, level):
+    if codec == COMPRESSED_CODECS['lzma']:
+        return lzma.compress(raw, preset=level)
+    return zlib.compress(raw, level)
+
+
+def _decompress(raw, codec):
+    if codec == COMPRESSED_CODECS['lzma']:
+        return lzma.decompress(raw)
+    return zlib.decompress(raw)
+
+
+def encodeBlock(data, step, codec=COMPRESSED_CODECS['zlib'], level=6):
+    """Quantizes, delta codes and compresses a rows x landmarks x 2 block.
+
+    :parameters:
+        data : numpy.ndarray
+            The landmark rows of the block, the first row becomes the keyframe.
+
+        step : float
+            The quantization step.
+
+        codec : int
+            The COMPRESSED_CODECS value to compress with.
+
+        level : int
+            The compression level.
+
+    :return: The compressed block.
+    :rtype: bytes
+    """
+    quantized = numpy.rint(numpy.asarray(data, dtype=numpy.float64) / step).astype(numpy.int32)
+    deltas = numpy.diff(quantized, axis=0, prepend=numpy.zeros_like(quantized[:1]))
+    zigzag = ((deltas << 1) ^ (deltas >> 31)).astype('<u4')
+    planes = zigzag.view(numpy.uint8).reshape(-1, 4).T
+    return _compress(numpy.ascontiguousarray(planes).tobytes(), codec, level)
+
+
+def decodeBlock(raw, rows, landmarkCount, step, codec=COMPRESSED_CODECS['zlib']):
+    """Decodes a block written by encodeBlock.
+
+    :return: The float32 rows x landmarks x 2 block.
+    :rtype: numpy.ndarray
+    """
+    planes = numpy.frombuffer(_decompress(raw, codec), dtype=numpy.uint8).reshape(4, -1)
+    zigzag = numpy.ascontiguousarray(planes.T).view('<u4').reshape(rows, landmarkCount, 2)
+    deltas = (zigzag >> 1).astype(numpy.int32) ^ -(zigzag & 1).astype(numpy.int32)
+    quantized = numpy.cumsum(deltas, axis=0, dtype=numpy.int64)
+    return (quantized * step).astype(numpy.float32)
+
+
+def writeCompressedTrack(filepath,
+                         track,
+                         precision=DEFAULT_PRECISION,
+                         blockFrames=DEFAULT_BLOCK_FRAMES,
+                         codec='zlib',
+                         level=6):
+    """Writes the track to the compressed track format.
+
+    :parameters:
+        filepath : str
+            The .fntz file to write. Written to a temp file then renamed.
+
+        track : Track
+            The track to write.
+
+        precision : float
+            The quantization step, in the units of the track coordinates. Default: DEFAULT_PRECISION
+
+        blockFrames : int
+            The number of frames per independently decodable block. Default: DEFAULT_BLOCK_FRAMES
+
+        codec : str
+            The general purpose compressor, zlib or lzma. Default: zlib
+
+        level : int
+            The compression level of the codec. Default: 6
+
+    :return: The written filepath.
+    :rtype: str
+    """
+    if codec not in COMPRESSED_CODECS:
+        raise ValueError('Unknown codec {}, use one of {}'.format(codec, sorted(COMPRESSED_CODECS)))
+    codecId = COMPRESSED_CODECS[codec]
+    frameCount = track.frameCount
+    landmarkCount = track.landmarkCount if frameCount else 0
+    blockFrames = max(int(blockFrames), 1)
+    blockCount = (frameCount + blockFrames - 1) // blockFrames
+
+    blocks = []
+    for blockIndex in range(blockCount):
+        firstRow = blockIndex * blockFrames
+        blocks.append((firstRow, encodeBlock(track.data[firstRow:firstRow + blockFrames],
+                                             precision, codecId, level)))
+
+    header = COMPRESSED_HEADER.pack(COMPRESSED_MAGIC,
+                                    COMPRESSED_VERSION,
+                                    COMPRESSED_HEADER.size,
+                                    frameCount,
+                                    landmarkCount,
+                                    2,
+                                    blockFrames,
+                                    blockCount,
+                                    codecId,
+                                    0,
+                                    precision)
+
+    offset = COMPRESSED_HEADER.size + frameCount * 4 + blockCount * COMPRESSED_BLOCK.size
+    tempPath = _tempPath(filepath)
+    try:
+        with open(tempPath, 'wb') as outfile:
+            outfile.write(header)
+            outfile.write(track.frames.astype('<i4').tobytes())
+            for firstRow, raw in blocks:
+                outfile.write(COMPRESSED_BLOCK.pack(offset, len(raw), firstRow))
+                offset += len(raw)
+            for firstRow, raw in blocks:
+                outfile.write(raw)
+        os.replace(tempPath, filepath)
+    except BaseException:
+        _discard(tempPath)
+        raise
+
+    log.debug('wrote %s frames x %s landmarks to %s', frameCount, landmarkCount, filepath)
+    return filepath
+
+
+def readCompressedHeader(filepath):
+    """Reads the header, frame numbers and block table of a compressed track file.
+
+    :parameters:
+        filepath : str
+            The .fntz file to read.
+
+    :return: The header fields with the frames and blocks.
+    :rtype: dict
+    """
+    with open(filepath, 'rb') as infile:
+        raw = infile.read(COMPRESSED_HEADER.size)
+        if len(raw) < COMPRESSED_HEADER.size:
+            raise ValueError('{} is too short to be a compressed track'.format(filepath))
+
+        fields = COMPRESSED_HEADER.unpack(raw)
+        if fields[0] != COMPRESSED_MAGIC:
+            raise ValueError('{} is not a compressed track'.format(filepath))
+        if fields[1] > COMPRESSED_VERSION:
+            raise ValueError('{} is compressed track version {}, only {} is supported'.format(
+                filepath, fields[1], COMPRESSED_VERSION))
+
+        header = {'version': fields[1],
+                  'headerSize': fields[2],
+                  'frameCount': fields[3],
+                  'landmarkCount': fields[4],
+                  'dims': fields[5],
+                  'blockFrames': fields[6],
+                  'blockCount': fields[7],
+                  'codec': fields[8],
+                  'step': fields[10]}
+
+        infile.seek(header['headerSize'])
+        header['frames'] = numpy.frombuffer(infile.read(header['frameCount'] * 4),
+                                            dtype='<i4').astype(numpy.int32)
+        table = infile.read(header['blockCount'] * COMPRESSED_BLOCK.size)
+        header['blocks'] = [COMPRESSED_BLOCK.unpack_from(table, i * COMPRESSED_BLOCK.size)
+                            for i in range(header['blockCount'])]
+    return header
+
+
+def iterCompressedTrack(filepath, startFrame=None):
+    """Streams the blocks of a compressed track, starting from the block holding startFrame.
+
+    :parameters:
+        filepath : str
+            The .fntz file to read.
+
+        startFrame : int
+            The frame to start from, decoding begins at the keyframe of its \
+            block. Default: None, the first frame
+
+    :return: Yields the frame numbers and the decoded landmark rows of each block.
+    :rtype: generator
+    """
+    header = readCompressedHeader(filepath)
+    frames = header['frames']
+    firstBlock = 0
+    if startFrame is not None and len(frames):
+        row = max(int(numpy.searchsorted(frames, startFrame, side='right')) - 1, 0)
+        firstBlock = row // header['blockFrames']
+
+    with open(filepath, 'rb') as infile:
+        for offset, size, firstRow in header['blocks'][firstBlock:]:
+            infile.seek(offset)
+            rows = min(header['blockFrames'], header['frameCount'] - firstRow)
+            data = decodeBlock(infile.read(size), rows, header['landmarkCount'],
+                               header['step'], header['codec'])
+            yield frames[firstRow:firstRow + rows], data
+
+
+def loadCompressedTrack(filepath, progress=None):
+    """Decodes a whole compressed track file.
+
+    :parameters:
+        filepath : str
+            The .fntz file to load.
+
+        progress : callable
+            Called with the decoded fraction from 0.0 to 1.0. Default: None
+
+    :return: The decoded track.
+    :rtype: Track
+    """
+    header = readCompressedHeader(filepath)
+    data = numpy.empty((header['frameCount'], header['landmarkCount'], header['dims']),
+                       dtype=numpy.float32)
+    row = 0
+    for frames, block in iterCompressedTrack(filepath):
+        data[row:row + len(block)] = block
+        row += len(block)
+        if progress is not None:
+            progress(float(row) / max(header['frameCount'], 1))
+    if progress is not None:
+        progress(1.0)
+    return Track(header['frames'], data)
+
+
+def loadTrack(filepath, progress=None):
+    """Loads a track file of any supported format.
+
+    :parameters:
+        filepath : str
+            A binary, compressed, container or json track file.
+
+        progress : callable
+            Called with the loaded fraction from 0.0 to 1.0. Default: None
+
+    :return: The loaded track, or a TrackContainer for container files.
+    :rtype: Track
+    """
+    if isTrackContainer(filepath):
+        container = loadTrackContainer(filepath)
+        if progress is not None:
+            progress(1.0)
+        return container
+    if isCompressedTrack(filepath):
+        return loadCompressedTrack(filepath, progress=progress)
+    if isBinaryTrack(filepath):
+        track = loadBinaryTrack(filepath)
+        if progress is not None:
+            progress(1.0)
+        return track
+    return loadJsonTrack(filepath, progress=progress)
+
+
+def trackStats(track):
+    """Summarizes a track.
+
+    :parameters:
+        track : Track
+            The track to summarize.
+
+    :return: The frame range, landmark count, missing frames, largest gap \
+             and non finite value count of the track.
+    :rtype: dict
+    """
+    stats = {'frames': track.frameCount,
+             'firstFrame': track.firstFrame,
+             'lastFrame': track.lastFrame,
+             'landmarks': track.landmarkCount if track.frameCount else 0,
+             'missingFrames': 0,
+             'largestGap': 0,
+             'nonFinite': 0,
+             'bytes': track.data.nbytes}
+    if track.frameCount:
+        steps = numpy.diff(track.frames)
+        stats['missingFrames'] = (track.lastFrame - track.firstFrame + 1) - track.frameCount
+        stats['largestGap'] = int(steps.max()) - 1 if len(steps) else 0
+        stats['nonFinite'] = int(track.data.size - numpy.count_nonzero(numpy.isfinite(track.data)))
+    return stats
+
+
+def validateTrack(track, landmarkCount=None, maxGap=0):
+    """Checks a track for the problems that break playback or retargeting.
+
+    :parameters:
+        track : Track
+            The track to check.
+
+        landmarkCount : int
+            The landmark count every frame must hold. Default: None, any count
+
+        maxGap : int
+            The largest run of missing frames allowed. Default: 0, the frames must be continuous
+
+    :return: A description of every problem found, empty if the track is valid.
+    :rtype: list
+    """
+    stats = trackStats(track)
+    problems = []
+    if not stats['frames']:
+        problems.append('track holds no frames')
+        return problems
+    if landmarkCount is not None and stats['landmarks'] != landmarkCount:
+        problems.append('{} landmarks per frame, expected {}'.format(stats['landmarks'], landmarkCount))
+    if stats['largestGap'] > maxGap:
+        problems.append('{} missing frames, the largest gap is {} frames'.format(stats['missingFrames'],
+                                                                                stats['largestGap']))
+    if stats['nonFinite']:
+        problems.append('{} nan or inf values'.format(stats['nonFinite']))
+    return problems
+
+
+def convertJsonTrack(jsonPath, outPath=None, compressed=False, **kwargs):
+    """Converts a faceTrack or headTrack json file to the binary or compressed track format.
+
+    :parameters:
+        jsonPath : str
+            The json file to convert.
+
+        outPath : str
+            The file to write. Defaults to jsonPath with the extension of the format.
+
+        compressed : bool
+            If True, writes the compressed format, kwargs are passed to \
+            writeCompressedTrack. Default: False
+
+    :return: The written filepath.
+    :rtype: str
+    """
+    if outPath is None:
+        ext = COMPRESSED_TRACK_EXT if compressed else BINARY_TRACK_EXT
+        outPath = os.path.splitext(jsonPath)[0] + ext
+    if compressed:
+        return writeCompressedTrack(outPath, loadJsonTrack(jsonPath), **kwargs)
+    return writeBinaryTrack(outPath, loadJsonTrack(jsonPath))
+
+
+# ----------------------------------------------------------------------------#
+# ----------------------------------------------------------------- Classes --#
+
+
+class FrameIndexed(object):
+    """The frame to row lookup shared by the track types.
+
+    Frame numbers don't need to be contiguous, tracker dropouts leave gaps \
+    that a dense frame to row table built once with gapRows fills in.
+
+    :parameters:
+        frames : numpy.ndarray
+            The sorted frame numbers present in the track.
+
+        gapPolicy : str
+            How missing frames are looked up, see gapRows. Default: hold
+    """
+    def __init__(self, frames, gapPolicy='hold'):
+        self.frames = numpy.ascontiguousarray(frames, dtype=numpy.int32)
+
+        if len(self.frames):
+            self.firstFrame = int(self.frames[0])
+            self.lastFrame = int(self.frames[-1])
+        else:
+            self.firstFrame = 0
+            self.lastFrame = -1
+
+        self.gapPolicy = None
+        self._rows = None
+        self.setGapPolicy(gapPolicy)
+
+    @property
+    def frameCount(self):
+        return len(self.frames)
+
+    def span(self):
+        """Gets every frame number from the first to the last present frame."""
+        return numpy.arange(self.firstFrame, self.lastFrame + 1, dtype=numpy.int32)
+
+    def hasGaps(self):
+        return len(self.frames) != self.lastFrame - self.firstFrame + 1
+
+    def isEmpty(self):
+        return not len(self.frames)
+
+    def setGapPolicy(self, gapPolicy):
+        """Rebuilds the frame to row table for the policy, interpolate looks rows up as nearest."""
+        if gapPolicy != self.gapPolicy:
+            self._rows = gapRows(self.frames, self.span(), gapPolicy)
+            self.gapPolicy = gapPolicy
+
+    def clampFrame(self, frame):
+        """Clamps the frame to the frame range of the track."""
+        return min(max(frame, self.firstFrame), self.lastFrame)
+
+    def rowForFrame(self, frame):
+        """Gets the row of the data block for the frame, clamped to the track range."""
+        return int(self._rows[self.clampFrame(frame) - self.firstFrame])
+
+    def rowsForFrames(self, frames):
+        """Gets the rows of the data block for an array of frames, clamped to the track range."""
+        frames = numpy.clip(numpy.asarray(frames), self.firstFrame, self.lastFrame)
+        return self._rows[frames - self.firstFrame]
+
+
+class Track(FrameIndexed):
+    """A landmark track stored as one contiguous frames x landmarks x 2 array.
+
+    :parameters:
+        frames : numpy.ndarray
+            The sorted frame numbers present in the track.
+
+        data : numpy.ndarray
+            The float32 landmark block, one row per frame in frames.
+    """
+    def __init__(self, frames, data):
+        FrameIndexed.__init__(self, frames)
+        self.data = data
+        if len(self.frames) != len(self.data):
+            raise ValueError('Track has {} frames but {} rows of data'.format(len(self.frames),
+                                                                              len(self.data)))
+
+    @property
+    def landmarkCount(self):
+        return self.data.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.frames.nbytes + self._rows.nbytes
+
+    def frameData(self, frame):
+        """Gets the landmarks x 2 block for the frame as a view of the track data."""
+        return self.data[self.rowForFrame(frame)]
+
+    def subset(self, indices):
+        """Gets a track holding only the landmarks at the indices, this track if indices is None."""
+        if indices is None:
+            return self
+        return Track(self.frames, numpy.ascontiguousarray(self.data[:, indices]))
+
+    def filled(self, gapPolicy):
+        """Fills the gaps of the whole take in one pass.
+
+        :parameters:
+            gapPolicy : str
+                One of GAP_POLICIES. interpolate blends linearly between the \
+                present frames around each gap.
+
+        :return: A track with a row for every frame of the span, or this track if it has no gaps.
+        :rtype: Track
+        """
+        if not self.hasGaps():
+            return self
+
+        span = self.span()
+        if gapPolicy != 'interpolate':
+            return Track(span, self.data[gapRows(self.frames, span, gapPolicy)])
+
+        before = gapRows(self.frames, span, 'hold')
+        after = numpy.minimum(before + 1, len(self.frames) - 1)
+        gap = (self.frames[after] - self.frames[before]).astype(numpy.float32)
+        weight = numpy.where(gap > 0, (span - self.frames[before]) / numpy.maximum(gap, 1), 0)
+        weight = weight.astype(numpy.float32)[:, None, None]
+        data = self.data[before] + (self.data[after] - self.data[before]) * weight
+        return Track(span, data.astype(numpy.float32, copy=False))
+
+
+class TrackContainer(object):
+    """The face and head tracks of every actor in a track container file.
+
+    :parameters:
+        filepath : str
+            The .fnact file the tracks are mapped from.
+
+        actors : list
+            One dict per actor with its name and face and head tracks.
+    """
+    def __init__(self, filepath, actors):
+        self.filepath = filepath
+        self.actors = actors
+
+    @property
+    def actorCount(self):
+        return len(self.actors)
+
+    @property
+    def nbytes(self):
+        return sum(actor[kind].nbytes for actor in self.actors
+                   for kind in CONTAINER_KINDS if actor[kind] is not None)
+
+    def names(self):
+        return [actor['name'] for actor in self.actors]
+
+    def isEmpty(self):
+        return not self.actors
+
+    def track(self, actorIndex, kind):
+        """Gets the face or head track of an actor, None if the container does not hold it."""
+        if not 0 <= actorIndex < len(self.actors):
+            return None
+        return self.actors[actorIndex][kind]
+
+
+class WindowedTrack(FrameIndexed):
+    """A binary track that only holds a sliding window of frames in memory.
+
+    Frames are read in blocks of WINDOW_BLOCK_FRAMES. A prefetch thread keeps \
+    the blocks ahead of the last requested frame, in the playback direction, \
+    resident and evicts the ones behind it, so memory stays flat no matter \
+    how long the take is. A frame outside the window is read on the calling \
+    thread and counted as a miss. Windowed tracks keep per node playback \
+    state and are not shared through the TrackCache. Gaps are filled per \
+    frame through the row table, so interpolate plays as nearest.
+
+    :parameters:
+        filepath : str
+            The .fntrk file to read.
+
+        windowSize : int
+            The number of frames kept resident.
+
+        headTrack : Track
+            Subtracted from each block as it is read for head relative playback. Default: None
+    """
+    def __init__(self, filepath, windowSize, headTrack=None):
+        header = readBinaryHeader(filepath)
+        with open(filepath, 'rb') as infile:
+            infile.seek(header['headerSize'])
+            frames = numpy.frombuffer(infile.read(header['frameCount'] * 4), dtype='<i4')
+        FrameIndexed.__init__(self, frames)
+
+        self.filepath = filepath
+        self.blockSize = WINDOW_BLOCK_FRAMES
+        self.windowSize = max(int(windowSize), self.blockSize)
+        self.headTrack = headTrack
+        self.hits = 0
+        self.misses = 0
+
+        self._shape = (header['landmarkCount'], header['dims'])
+        self._rowBytes = header['landmarkCount'] * header['dims'] * 4
+        self._dataOffset = header['dataOffset']
+        self._file = open(filepath, 'rb')
+        self._fileLock = threading.Lock()
+
+        self._blocks = {}
+        self._row = 0
+        self._direction = 1
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._prefetch, name='facenetTrackPrefetch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def landmarkCount(self):
+        return self._shape[0]
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            blockBytes = sum(block.nbytes for block in self._blocks.values())
+        return blockBytes + self.frames.nbytes + self._rows.nbytes
+
+    def frameData(self, frame):
+        """Gets the landmarks x 2 block for the frame, reading it if it is outside the window."""
+        row = self.rowForFrame(frame)
+        blockIndex = row // self.blockSize
+
+        with self._lock:
+            block = self._blocks.get(blockIndex)
+            if row != self._row:
+                self._direction = 1 if row > self._row else -1
+            self._row = row
+            if block is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._wake.notify()
+
+        if block is None:
+            block = self._readBlock(blockIndex)
+            with self._lock:
+                self._blocks[blockIndex] = block
+                self._wake.notify()
+
+        return block[row - blockIndex * self.blockSize]
+
+    def setHeadTrack(self, headTrack):
+        """Sets the head track subtracted from the blocks, dropping the resident blocks if it changed."""
+        with self._lock:
+            if headTrack is not self.headTrack:
+                self.headTrack = headTrack
+                self._blocks.clear()
+
+    def stats(self):
+        with self._lock:
+            residentFrames = sum(len(block) for block in self._blocks.values())
+        return {'windowSize': self.windowSize,
+                'residentFrames': residentFrames,
+                'hits': self.hits,
+                'misses': self.misses}
+
+    def close(self):
+        """Stops the prefetch thread and closes the file."""
+        with self._lock:
+            self._closed = True
+            self._blocks.clear()
+            self._wake.notify()
+        self._thread.join()
+        with self._fileLock:
+            self._file.close()
+
+    def _readBlock(self, blockIndex):
+        start = blockIndex * self.blockSize
+        count = min(self.blockSize, self.frameCount - start)
+        with self._fileLock:
+            self._file.seek(self._dataOffset + start * self._rowBytes)
+            raw = self._file.read(count * self._rowBytes)
+        block = numpy.frombuffer(raw, dtype='<f4').reshape((count,) + self._shape)
+
+        headTrack = self.headTrack
+        if headTrack is not None:
+            headRows = headTrack.rowsForFrames(self.frames[start:start + count])
+            block = block - headTrack.data[headRows, :1, :]
+        return block.astype(numpy.float32, copy=False)
+
+    def _wantedBlocks(self):
+        # three quarters of the window ahead of the playback direction, a quarter behind
+        ahead = self.windowSize * 3 // 4
+        behind = self.windowSize - ahead
+        if self._direction > 0:
+            first, last = self._row - behind, self._row + ahead
+        else:
+            first, last = self._row - ahead, self._row + behind
+        first = max(first, 0) // self.blockSize
+        last = min(last, self.frameCount - 1) // self.blockSize
+
+        current = self._row // self.blockSize
+        return sorted(range(first, last + 1), key=lambda b: (abs(b - current), (b - current) * -self._direction))
+
+    def _prefetch(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                wanted = self._wantedBlocks()
+                for blockIndex in list(self._blocks):
+                    if blockIndex not in wanted:
+                        del self._blocks[blockIndex]
+                missing = [blockIndex for blockIndex in wanted if blockIndex not in self._blocks]
+                if not missing:
+                    self._wake.wait()
+                    continue
+                headTrack = self.headTrack
+
+            block = self._readBlock(missing[0])
+            with self._lock:
+                # drop the block if the head track changed while it was read
+                if headTrack is self.headTrack and not self._closed:
+                    self._blocks[missing[0]] = block
+
+
+class TrackCache(object):
+    """Shares loaded tracks between nodes that reference the same file.
+
+    Entries are keyed by the resolved path, mtime and size of the file so an \
+    edited file is loaded again. Nodes acquire and release entries, entries \
+    nobody holds stay cached and are evicted least recently used first once \
+    the cached bytes exceed the budget. Memory mapped tracks count their full \
+    mapped size. Safe to use from the loader threads, loading happens outside \
+    the lock.
+
+    :parameters:
+        budget : int
+            The byte budget for the cached tracks.
+
+        loader : callable
+            Loads a track from a filepath and a progress callable. Default: loadTrack
+    """
+    def __init__(self, budget=DEFAULT_CACHE_BUDGET, loader=loadTrack):
+        self.budget = budget
+        self.loader = loader
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def trackKey(filepath):
+        """Gets the cache key of a filepath, the resolved path plus mtime and size."""
+        realPath = os.path.realpath(filepath)
+        stat = os.stat(realPath)
+        return (realPath, stat.st_mtime, stat.st_size)
+
+    @property
+    def cachedBytes(self):
+        return sum(entry['track'].nbytes for entry in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def acquire(self, filepath, progress=None):
+        """Gets the track for the filepath, loading it if it is not cached.
+
+        :parameters:
+            filepath : str
+                The track file to acquire.
+
+            progress : callable
+                Passed to the loader when the track is not cached. Default: None
+
+        :return: The cache key to release with and the track.
+        :rtype: tuple
+        """
+        key = self.trackKey(filepath)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+
+        if entry is None:
+            track = self.loader(filepath, progress=progress)
+            with self._lock:
+                # another thread may have loaded the same file meanwhile
+                entry = self._entries.setdefault(key, {'track': track, 'refcount': 0})
+            log.debug('cached track %s', key[0])
+        elif progress is not None:
+            progress(1.0)
+
+        with self._lock:
+            entry['refcount'] += 1
+            self._evict()
+        return key, entry['track']
+
+    def release(self, key):
+        """Releases a track acquired with the key.
+
+        :parameters:
+            key : tuple
+                The key returned by acquire.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                log.debug('released track %s is not cached', key[0])
+                return
+            entry['refcount'] = max(entry['refcount'] - 1, 0)
+            self._evict()
+
+    def refcount(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['refcount'] if entry else 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        cachedBytes = self.cachedBytes
+        for key in list(self._entries):
+            if cachedBytes <= self.budget:
+                break
+            entry = self._entries[key]
+            if entry['refcount'] == 0:
+                cachedBytes -= entry['track'].nbytes
+                del self._entries[key]
+                log.debug('evicted track %s', key[0])
+        if cachedBytes > self.budget:
+            log.warning('tracks in use hold %s bytes, over the cache budget of %s bytes',
+                        cachedBytes, self.budget)
+
+
+class DiskTrackCache(object):
+    """Keeps decoded tracks in a local directory as memory mappable binary tracks.
+
+    Entries are named by a hash of the source file key, either its resolved \
+    path, size and mtime, or a hash of its content for files that get copied \
+    around with new mtimes. Cache files are written to a temp file and \
+    renamed so farm machines sharing a directory never read half a file. \
+    The mtime of a cache file is touched on every hit and the least recently \
+    used files are removed once the directory is over the budget, temp files \
+    count toward it and the ones left by a writer that died are removed. Binary \
+    track and container sources are already memory mapped and skip the cache.
+
+    :parameters:
+        directory : str
+            The cache directory, created if it does not exist.
+
+        budget : int
+            The byte budget of the cache directory. Default: DEFAULT_DISK_CACHE_BUDGET
+
+        contentHash : bool
+            If True, keys sources by a hash of their content instead of their \
+            path, size and mtime. Default: False
+
+        loader : callable
+            Loads a track from a filepath and a progress callable on a miss. Default: loadTrack
+    """
+    def __init__(self, directory, budget=DEFAULT_DISK_CACHE_BUDGET, contentHash=False, loader=loadTrack):
+        self.directory = directory
+        self.budget = budget
+        self.contentHash = contentHash
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @classmethod
+    def fromEnvironment(cls, **kwargs):
+        """Creates the cache in the FACENET_TRACK_CACHE directory, None if it is not set or empty."""
+        directory = os.environ.get(DISK_CACHE_ENV)
+        if not directory:
+            return None
+        try:
+            return cls(directory, **kwargs)
+        except OSError as e:
+            log.warning('Track disk cache %s is not available: %s', directory, e)
+            return None
+
+    def cachePath(self, filepath):
+        """Gets the cache file of a source track file."""
+        digest = hashlib.sha1()
+        if self.contentHash:
+            with open(filepath, 'rb') as infile:
+                for chunk in iter(lambda: infile.read(HASH_READ_CHUNK), b''):
+                    digest.update(chunk)
+        else:
+            realPath = os.path.realpath(filepath)
+            stat = os.stat(realPath)
+            digest.update('{}|{}|{}'.format(realPath, stat.st_size, stat.st_mtime).encode('utf-8'))
+        return os.path.join(self.directory, digest.hexdigest() + BINARY_TRACK_EXT)
+
+    def load(self, filepath, progress=None):
+        """Loads a track, memory mapping the cached copy when there is one.
+
+        :parameters:
+            filepath : str
+                The track file to load.
+
+            progress : callable
+                Passed to the loader on a miss. Default: None
+
+        :return: The loaded track.
+        :rtype: Track
+        """
+        if isBinaryTrack(filepath) or isTrackContainer(filepath):
+            return self.loader(filepath, progress=progress)
+
+        cachePath = self.cachePath(filepath)
+        if os.path.exists(cachePath):
+            try:
+                track = loadBinaryTrack(cachePath)
+                os.utime(cachePath, None)
+                with self._lock:
+                    self.hits += 1
+                if progress is not None:
+                    progress(1.0)
+                log.debug('loaded %s from the disk cache %s', filepath, cachePath)
+                return track
+            except (OSError, ValueError) as e:
+                log.warning('Discarding unreadable cached track %s: %s', cachePath, e)
+                self._remove(cachePath)
+
+        track = self.loader(filepath, progress=progress)
+        with self._lock:
+            self.misses += 1
+        try:
+            writeBinaryTrack(cachePath, track)
+            self.cleanup()
+        except (OSError, IOError) as e:
+            log.warning('Failed to write %s to the disk cache: %s', filepath, e)
+        return track
+
+    def entries(self):
+        """Gets the path, size and mtime of the cache files, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(BINARY_TRACK_EXT):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def sweepTempFiles(self, maxAge=STALE_TEMP_SECONDS):
+        """Removes the temp files older than maxAge, left by writers that died.
+
+        :return: The bytes of the temp files still being written.
+        :rtype: int
+        """
+        now = time.time()
+        pendingBytes = 0
+        for name in os.listdir(self.directory):
+            if TEMP_EXT not in name:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > maxAge:
+                if self._remove(path):
+                    log.debug('removed stale temp file %s', path)
+                    continue
+            pendingBytes += stat.st_size
+        return pendingBytes
+
+    @property
+    def cachedBytes(self):
+        return sum(entry[1] for entry in self.entries())
+
+    def cleanup(self, budget=None):
+        """Removes the least recently used cache files until the directory fits the budget.
+
+        :parameters:
+            budget : int
+                The byte budget to clean up to. Default: None, the cache budget
+
+        :return: The number of removed files.
+        :rtype: int
+        """
+        budget = self.budget if budget is None else budget
+        pendingBytes = self.sweepTempFiles()
+        entries = self.entries()
+        cachedBytes = pendingBytes + sum(entry[1] for entry in entries)
+        removed = 0
+        for path, size, mtime in entries:
+            if cachedBytes <= budget:
+                break
+            # mapped files stay readable on posix and fail to remove on windows
+            if self._remove(path):
+                cachedBytes -= size
+                removed += 1
+        return removed
+
+    def clear(self):
+        return self.cleanup(0)
+
+    def stats(self):
+        entries = self.entries()
+        return {'directory': self.directory,
+                'files': len(entries),
+                'cachedBytes': sum(entry[1] for entry in entries),
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses}
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError as e:
+            log.debug('could not remove cached track %s: %s', path, e)
+            return False
+
+
+class TrackLoad(object):
+    """A track load requested from a TrackLoader.
+
+    :parameters:
+        filepath : str
+            The track file being loaded.
+    """
+    PENDING = 'pending'
+    LOADING = 'loading'
+    READY = 'ready'
+    ERROR = 'error'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.state = TrackLoad.PENDING
+        self.progress = 0.0
+        self.error = None
+        self.key = None
+        self.track = None
+        self.cancelled = False
+        self._done = threading.Event()
+
+    def setProgress(self, progress):
+        self.progress = progress
+
+    def cancel(self):
+        """Flags the load as no longer wanted. A finished load keeps its key for the owner to release."""
+        self.cancelled = True
+
+    def isDone(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the load finishes, returns False on a timeout."""
+        return self._done.wait(timeout)
+
+    def status(self):
+        return {'filepath': self.filepath,
+                'state': self.state,
+                'progress': self.progress,
+                'error': self.error}
+
+
+class TrackLoader(object):
+    """Loads tracks through a TrackCache on worker threads.
+
+    :parameters:
+        cache : TrackCache
+            The cache the tracks are acquired from.
+
+        workers : int
+            The number of worker threads. Default: 1
+    """
+    def __init__(self, cache, workers=1):
+        self.cache = cache
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, filepath, callback=None):
+        """Queues a track load.
+
+        :parameters:
+            filepath : str
+                The track file to load.
+
+            callback : callable
+                Called with the TrackLoad from the worker thread once it is \
+                ready or failed. Default: None
+
+        :return: The queued load.
+        :rtype: TrackLoad
+        """
+        load = TrackLoad(filepath)
+        self._startWorkers()
+        self._queue.put((load, callback))
+        return load
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads once the queued loads finish."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _startWorkers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name='facenetTrackLoader')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            load, callback = request
+
+            if load.cancelled:
+                load.state = TrackLoad.CANCELLED
+                load._done.set()
+                continue
+
+            load.state = TrackLoad.LOADING
+            try:
+                load.key, load.track = self.cache.acquire(load.filepath, progress=load.setProgress)
+                load.progress = 1.0
+                load.state = TrackLoad.READY
+            except Exception as e:
+                log.exception('failed to load track %s', load.filepath)
+                load.error = str(e)
+                load.state = TrackLoad.ERROR
+            load._done.set()
+
+            if callback is not None:
+                try:
+                    callback(load)
+                except Exception:
+                    log.exception('track load callback failed for %s', load.filepath)
+
+
+class FrameCache(object):
+    """A bounded least recently used cache of evaluated output frames.
+
+    :parameters:
+        capacity : int
+            The number of frames kept, 0 disables the cache. Default: 0
+    """
+    def __init__(self, capacity=0):
+        self._frames = collections.OrderedDict()
+        self._capacity = 0
+        self.hits = 0
+        self.misses = 0
+        self.capacity = capacity
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, capacity):
+        self._capacity = max(int(capacity), 0)
+        while len(self._frames) > self._capacity:
+            self._frames.popitem(last=False)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def get(self, key):
+        """Gets the cached frame for the key, None on a miss."""
+        if not self._capacity:
+            return None
+        value = self._frames.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self._frames[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if not self._capacity:
+            return
+        self._frames.pop(key, None)
+        self._frames[key] = value
+        if len(self._frames) > self._capacity:
+            self._frames.popitem(last=False)
+
+    def clear(self):
+        self._frames.clear()
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'capacity': self._capacity,
+                'frames': len(self._frames),
+                'hits': self.hits,
+                'misses': self.misses}
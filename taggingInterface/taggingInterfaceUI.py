@@ -213,6 +213,8 @@ class TagInterfaceUI(MayaQWidgetDockableMixin, window.Window):
         self.windowPreferences.update(self.getWindowState())
         self.savePreferences()
         self._removeWindow(self)
+        # the index callbacks would keep running on every scene edit after the tool is gone
+        taggingUtils.removeTagIndex()
         super(TagInterfaceUI, self).close()
 
     def closeEvent(self, event):
@@ -334,6 +336,13 @@ class MainMenu(QtWidgets.QMenuBar):
             checkable=True
         )
 
+        self.rebuildIndexAction = util.createAction(
+            self,
+            'Rebuild Tag Index',
+            self.cb_rebuildIndex,
+            tip='Rebuilds the scene tag index the searches answer from.'
+        )
+
         self.loggingAction = util.createAction(
             self,
             'Logging',
@@ -359,7 +368,8 @@ class MainMenu(QtWidgets.QMenuBar):
         )
 
         self.editActions = [
-            self.liveSelection
+            self.liveSelection,
+            self.rebuildIndexAction
         ]
 
     def initHelpActions(self):
@@ -427,6 +437,15 @@ class MainMenu(QtWidgets.QMenuBar):
         else:
             log.error('Filepath does not exist: %s', filepath)
 
+    @QtCore.Slot()
+    def cb_rebuildIndex(self):
+        index = taggingUtils.getTagIndex()
+        problems = index.validate()
+        for problem in problems:
+            log.warning('tag index: %s', problem)
+        index.rebuild()
+        log.info('Rebuilt the tag index, %s tagged nodes, %s problems fixed', len(index), len(problems))
+
     @QtCore.Slot()
     def cb_setLogging(self):
         pass
@@ -478,6 +497,9 @@ class AttributeTreeWidget(QtWidgets.QTreeWidget):
         self.objectTypes = {}
         self.objDict = {}
 
+        # the top level items whose rows have not read their values yet
+        self.unresolvedItems = set()
+
         # these lists are for populating the filter comboboxes
         self.attrNames = []
         self.attrTypes = []
@@ -492,6 +514,7 @@ class AttributeTreeWidget(QtWidgets.QTreeWidget):
 
         self.itemSelectionChanged.connect(self.selectObjectInScene)
         self.itemClicked.connect(self.selectObjectInScene)
+        self.itemExpanded.connect(self.resolveTopItem)
 
         self.setColumnWidth(0, 300)
 
@@ -500,7 +523,7 @@ class AttributeTreeWidget(QtWidgets.QTreeWidget):
 
     def _showContextMenu(self, position):
         menu = QtWidgets.QMenu(self)
-        menu.addAction('Expand All', self.expandAll)
+        menu.addAction('Expand All', self.expandAllItems)
         menu.addAction('Collapse All', self.collapseAll)
         menu.addSeparator()
         menu.addAction('Copy Object Name', partial(self.copyObjectName, position))
@@ -521,6 +544,7 @@ class AttributeTreeWidget(QtWidgets.QTreeWidget):
 
         self.topLevelItems = []
         self.objectTypes = {}
+        self.unresolvedItems = set()
 
         self.settings = self.parent.settingsWidget
 
@@ -541,7 +565,8 @@ class AttributeTreeWidget(QtWidgets.QTreeWidget):
                                                     searchExact=exact,
                                                     selection=selected,
                                                     dagObjects=dag,
-                                                    progressBar=self.progressBar)
+                                                    progressBar=self.progressBar,
+                                                    engine='index')
 
         try:
             x = (1.0/len(self.objDict)) * 50.0
@@ -551,15 +576,17 @@ class AttributeTreeWidget(QtWidgets.QTreeWidget):
         self.progress = 50.0
         self.progressBar.setValue(self.progress)
 
+        # the value and type columns are read when a node is expanded, see resolveTopItem
         for obj in self.objDict:
             top = self.addTopTreeItem(obj)
             for attr in self.objDict[obj]:
                 self.addSubTreeItem(top,
                                     self.objDict[obj][attr]['name'],
-                                    self.objDict[obj][attr]['value'],
-                                    self.objDict[obj][attr]['type'],
+                                    '',
+                                    '',
                                     self.objDict[obj][attr]['association'],
                                     self.objDict[obj][attr]['description'])
+            self.unresolvedItems.add(obj)
             self.progress += x
             self.progressBar.setValue(self.progress)
 
@@ -602,13 +629,49 @@ class AttributeTreeWidget(QtWidgets.QTreeWidget):
         # these lists are used for populating the filter comboboxes
         if name not in self.attrNames:
             self.attrNames.append(name)
-        if attrType not in self.attrTypes:
+        if attrType and attrType not in self.attrTypes:
             self.attrTypes.append(attrType)
         if association not in self.associations:
             self.associations.append(association)
 
         return item
 
+    @QtCore.Slot(QtWidgets.QTreeWidgetItem)
+    def resolveTopItem(self, top):
+        # reads the values and types of a node's rows once they are shown
+        obj = top.text(0)
+        if obj not in self.unresolvedItems:
+            return
+        self.unresolvedItems.discard(obj)
+        for index in range(top.childCount()):
+            item = top.child(index)
+            data = self.objDict[obj][item.text(0)]
+            item.setText(1, data['value'])
+            item.setText(2, data['type'])
+            if data['type'] not in self.attrTypes:
+                self.attrTypes.append(data['type'])
+
+    def resolveTypes(self):
+        """Reads the type column of every row not read yet, leaving the values for later."""
+        for top in self.topLevelItems:
+            obj = top.text(0)
+            if obj not in self.unresolvedItems:
+                continue
+            for index in range(top.childCount()):
+                item = top.child(index)
+                if not item.text(2):
+                    attrType = self.objDict[obj][item.text(0)]['type']
+                    item.setText(2, attrType)
+                    if attrType not in self.attrTypes:
+                        self.attrTypes.append(attrType)
+
+    @QtCore.Slot()
+    def expandAllItems(self):
+        # expandAll does not emit itemExpanded, every row is read first
+        for top in self.topLevelItems:
+            self.resolveTopItem(top)
+        self.expandAll()
+
     @QtCore.Slot()
     def selectObjectInScene(self):
         if self.parent.mainMenu.liveSelection.isChecked():
@@ -832,6 +895,8 @@ class FilterWidget(QtWidgets.QWidget):
         self.filterAttrName.setEnabled(self.state)
         self.filterAttrType.setEnabled(self.state)
         self.filterAssociation.setEnabled(self.state)
+        if self.state:
+            self._populateAttrTypes()
 
         self.filterObjectName.textChanged.connect(self.parent.tagTree.applyFilters)
         self.filterObjectType.currentIndexChanged.connect(self.parent.tagTree.applyFilters)
@@ -865,6 +930,9 @@ class FilterWidget(QtWidgets.QWidget):
         self.filterAttrName.addItems(names)
 
     def _populateAttrTypes(self):
+        # the types are only read for every row while the filters are on
+        if self.state:
+            self.parent.tagTree.resolveTypes()
         self.filterAttrType.clear()
         self.filterAttrType.addItem("<Attr Types>")
         types = self.parent.tagTree.attrTypes
@@ -42,11 +42,18 @@ Notes
 
 # Built-in
 import os
+import re
 import datetime
+import itertools
 import logging
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 # Third party
 from maya import cmds
+from maya import OpenMaya as om
 
 # Custom
 from rig_tools.ui.pyside import dialog
@@ -59,6 +66,41 @@ import tags
 
 log = logging.getLogger(__name__)
 
+# cmds.getAttr type names of the api attribute types, anything missing is asked of cmds
+_NUMERIC_TYPES = {om.MFnNumericData.kBoolean: 'bool',
+                  om.MFnNumericData.kByte: 'byte',
+                  om.MFnNumericData.kChar: 'char',
+                  om.MFnNumericData.kShort: 'short',
+                  om.MFnNumericData.kLong: 'long',
+                  om.MFnNumericData.kFloat: 'float',
+                  om.MFnNumericData.kDouble: 'double',
+                  om.MFnNumericData.k2Short: 'short2',
+                  om.MFnNumericData.k2Long: 'long2',
+                  om.MFnNumericData.k2Float: 'float2',
+                  om.MFnNumericData.k2Double: 'double2',
+                  om.MFnNumericData.k3Short: 'short3',
+                  om.MFnNumericData.k3Long: 'long3',
+                  om.MFnNumericData.k3Float: 'float3',
+                  om.MFnNumericData.k3Double: 'double3',
+                  om.MFnNumericData.k4Double: 'double4'}
+
+_TYPED_TYPES = {om.MFnData.kString: 'string',
+                om.MFnData.kMatrix: 'matrix',
+                om.MFnData.kStringArray: 'stringArray',
+                om.MFnData.kDoubleArray: 'doubleArray',
+                om.MFnData.kIntArray: 'Int32Array',
+                om.MFnData.kPointArray: 'pointArray',
+                om.MFnData.kVectorArray: 'vectorArray'}
+
+_UNIT_TYPES = {om.MFnUnitAttribute.kDistance: 'doubleLinear',
+               om.MFnUnitAttribute.kAngle: 'doubleAngle',
+               om.MFnUnitAttribute.kTime: 'time'}
+
+_INT_TYPES = ('byte', 'char', 'short', 'long', 'enum')
+
+# the scene tag index shared by the searches, see getTagIndex
+_tagIndex = None
+
 # ----------------------------------------------------------------------------#
 # --------------------------------------------------------------- FUNCTIONS --#
 
@@ -72,13 +114,373 @@ def getStandardTags(validDicts=tags.STANDARD_TAGS_LIST):
     return tagList
 
 
+def _describeHits(hits):
+    # wraps (node, attrs) hits in TagHits, nothing is read from the scene yet
+    obj_dict = {}
+    for obj, attrs in hits:
+        obj_dict[obj] = dict((attr, TagHit(obj, attr)) for attr in attrs)
+    return obj_dict
+
+
+def resolveHits(obj_dict):
+    """Reads every hit of a search into plain dicts.
+
+    Searches only read the type, value, association and description of a \
+    hit when it is first asked for them, the plain result can be exported \
+    with json or compared with the result of another search.
+
+    :parameters:
+        obj_dict : dict
+            The result of searchWithTerms.
+
+    :return: The result with every hit read, {node: {attr: dict}}.
+    :rtype: dict
+    """
+    return dict((obj, dict((attr, hit.asDict()) for attr, hit in attr_dict.items()))
+                for obj, attr_dict in obj_dict.items())
+
+
+def compileTerms(terms, searchExact=True):
+    """Compiles the search terms once into a test run on every attribute name.
+
+    Exact terms go in a frozenset, substring terms in one case insensitive \
+    regex, so each attribute name is tested once however many terms there are.
+
+    :parameters:
+        terms : list
+            The terms to look for.
+
+        searchExact : bool
+            If True, an attribute matches when its name is one of the terms, \
+            otherwise when it contains one of them in any case. Default: True
+
+    :return: A function taking an attribute name and returning whether it matches.
+    :rtype: function
+    """
+    terms = frozenset(terms)
+    if searchExact:
+        return terms.__contains__
+    if not terms:
+        return lambda attr: False
+    # the longest terms go first so the alternation fails fast on shared prefixes
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)),
+                         re.IGNORECASE)
+    return lambda attr: pattern.search(attr) is not None
+
+
+def _scopeNodes(nodes, nodeType=None, selection=False, dagObjects=False):
+    """Filters nodes down to the nodeType, selection and dag scope of a search.
+
+    Only the given nodes are queried, so the cost follows the number of nodes \
+    and not the size of the scene.
+    """
+    if not nodes:
+        return []
+    if selection:
+        scope = set(cmds.ls(sl=True, dag=dagObjects) or [])
+        nodes = [node for node in nodes if node in scope]
+    elif dagObjects:
+        nodes = cmds.ls(nodes, type='dagNode') or []
+    if nodeType and nodes:
+        nodes = cmds.ls(nodes, type=nodeType) or []
+    return nodes
+
+
+def _scanSearch(terms, nodeType, userDefined, selection, dagObjects, searchExact, progressBar):
+    # the original search, lists every node in scope and every attribute on it
+    hits = []
+    matches = compileTerms(terms, searchExact)
+
+    if nodeType:
+        obj_list = cmds.ls(type=nodeType, sl=selection, dag=dagObjects)
+    else:
+        obj_list = cmds.ls(sl=selection, dag=dagObjects)
+
+    if progressBar:
+        x = (1.0 / max(len(obj_list), 1)) * 50.0
+
+        progress = 0.0
+        progressBar.setValue(progress)
+
+    for obj in obj_list:
+        attrs = cmds.listAttr(obj, ud=userDefined)
+        if attrs:
+            matched = [attr for attr in attrs if matches(attr)]
+            if matched:
+                hits.append((obj, matched))
+
+        if progressBar:
+            progress += x
+            progressBar.setValue(progress)
+
+    return _describeHits(hits)
+
+
+def _attributeSearch(terms, nodeType, userDefined, selection, dagObjects, searchExact, progressBar):
+    # asks the scene for the plugs named like each term, only the matching nodes are touched
+    if not searchExact:
+        # ls wildcards are case sensitive, substring terms match in any case so every node is scanned
+        return _scanSearch(terms, nodeType, userDefined, selection, dagObjects, searchExact, progressBar)
+
+    node_attrs = {}
+    nodes = []
+    matches = compileTerms(terms, searchExact)
+    queries = []
+    for term in terms:
+        pattern = '*.{}'.format(term)
+        if pattern not in queries:
+            queries.append(pattern)
+
+    if progressBar:
+        x = (1.0 / max(len(queries), 1)) * 40.0
+
+        progress = 0.0
+        progressBar.setValue(progress)
+
+    for pattern in queries:
+        for plug in cmds.ls(pattern, r=True) or []:
+            node, attr = plug.split('.', 1)
+            if '.' in attr or '[' in attr:
+                # child and element plugs are reported by their own names
+                continue
+            if not matches(attr):
+                continue
+            if node not in node_attrs:
+                node_attrs[node] = []
+                nodes.append(node)
+            if attr not in node_attrs[node]:
+                node_attrs[node].append(attr)
+
+        if progressBar:
+            progress += x
+            progressBar.setValue(progress)
+
+    hits = []
+    for node in _scopeNodes(nodes, nodeType=nodeType, selection=selection, dagObjects=dagObjects):
+        attrs = node_attrs[node]
+        if userDefined:
+            udAttrs = set(cmds.listAttr(node, ud=True) or [])
+            attrs = [attr for attr in attrs if attr in udAttrs]
+        if attrs:
+            hits.append((node, attrs))
+
+    if progressBar:
+        progressBar.setValue(50.0)
+
+    return _describeHits(hits)
+
+
+def _apiNodeName(mobject):
+    # dag nodes are named by their shortest unique path, the same as cmds.ls
+    if mobject.hasFn(om.MFn.kDagNode):
+        return om.MFnDagNode(mobject).partialPathName()
+    return om.MFnDependencyNode(mobject).name()
+
+
+def _apiAttrType(attrObj):
+    if om.MFnAttribute(attrObj).isArray():
+        return 'TdataCompound'
+    if attrObj.hasFn(om.MFn.kNumericAttribute):
+        return _NUMERIC_TYPES.get(om.MFnNumericAttribute(attrObj).unitType())
+    if attrObj.hasFn(om.MFn.kEnumAttribute):
+        return 'enum'
+    if attrObj.hasFn(om.MFn.kUnitAttribute):
+        return _UNIT_TYPES.get(om.MFnUnitAttribute(attrObj).unitType())
+    if attrObj.hasFn(om.MFn.kTypedAttribute):
+        return _TYPED_TYPES.get(om.MFnTypedAttribute(attrObj).attrType())
+    if attrObj.hasFn(om.MFn.kMessageAttribute):
+        return 'message'
+    if attrObj.hasFn(om.MFn.kMatrixAttribute):
+        return 'matrix'
+    if attrObj.hasFn(om.MFn.kCompoundAttribute):
+        return 'TdataCompound'
+    return None
+
+
+def _apiScalar(plug, attrType):
+    if attrType == 'bool':
+        return plug.asBool()
+    if attrType in _INT_TYPES:
+        return plug.asInt()
+    if attrType == 'float':
+        return plug.asFloat()
+    if attrType == 'double':
+        return plug.asDouble()
+    if attrType == 'doubleLinear':
+        return plug.asMDistance().asUnits(om.MDistance.uiUnit())
+    if attrType == 'doubleAngle':
+        return plug.asMAngle().asUnits(om.MAngle.uiUnit())
+    if attrType == 'time':
+        return plug.asMTime().asUnits(om.MTime.uiUnit())
+    raise TypeError(attrType)
+
+
+def _apiConnections(plug):
+    plugs = om.MPlugArray()
+    connections = []
+    for asDst, asSrc in ((True, False), (False, True)):
+        plug.connectedTo(plugs, asDst, asSrc)
+        connections.extend(_apiNodeName(plugs[i].node()) for i in range(plugs.length()))
+    return connections or None
+
+
+def _apiValue(plug, attrType):
+    """Reads the value text of a plug the way str(cmds.getAttr) prints it.
+
+    Message attributes fall back to their connections, like the cmds engines. \
+    Returns None for the types it cannot read, those are asked of cmds.
+    """
+    if attrType == 'message':
+        return str(_apiConnections(plug))
+    if attrType == 'string':
+        return str(plug.asString())
+    if attrType in ('short2', 'long2', 'float2', 'double2', 'short3', 'long3', 'float3', 'double3', 'double4'):
+        childType = attrType[:-1]
+        return str([tuple(_apiScalar(plug.child(i), childType) for i in range(plug.numChildren()))])
+    try:
+        return str(_apiScalar(plug, attrType))
+    except TypeError:
+        return None
+
+
+def _apiScopeNodes(nodeType=None, selection=False, dagObjects=False):
+    """Yields the nodes in the scope of a search as MObjects."""
+    if nodeType:
+        nodeTypes = set(cmds.nodeType(nodeType, derived=True, isTypeName=True) or [nodeType])
+
+    if selection:
+        selectionList = om.MSelectionList()
+        om.MGlobal.getActiveSelectionList(selectionList)
+        roots = []
+        for i in range(selectionList.length()):
+            mobject = om.MObject()
+            selectionList.getDependNode(i, mobject)
+            roots.append(mobject)
+    else:
+        roots = [None]
+
+    seen = set()
+    for root in roots:
+        if dagObjects:
+            dagIter = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kInvalid)
+            if root is not None:
+                if not root.hasFn(om.MFn.kDagNode):
+                    continue
+                dagIter.reset(root, om.MItDag.kDepthFirst, om.MFn.kInvalid)
+            items = []
+            while not dagIter.isDone():
+                if not dagIter.currentItem().hasFn(om.MFn.kWorld):
+                    items.append(dagIter.currentItem())
+                dagIter.next()
+        elif root is not None:
+            items = [root]
+        else:
+            items = []
+            nodeIter = om.MItDependencyNodes()
+            while not nodeIter.isDone():
+                items.append(nodeIter.thisNode())
+                nodeIter.next()
+
+        for mobject in items:
+            handle = om.MObjectHandle(mobject).hashCode()
+            if handle in seen:
+                continue
+            seen.add(handle)
+            if nodeType and om.MFnDependencyNode(mobject).typeName() not in nodeTypes:
+                continue
+            yield mobject
+
+
+def _apiSearch(terms, nodeType, userDefined, selection, dagObjects, searchExact, progressBar):
+    # reads names, types, values and connections through the api, no plug path strings are built
+    obj_dict = {}
+    matches = compileTerms(terms, searchExact)
+
+    if progressBar:
+        progressBar.setValue(0.0)
+
+    nodeFn = om.MFnDependencyNode()
+    attrFn = om.MFnAttribute()
+    for mobject in _apiScopeNodes(nodeType=nodeType, selection=selection, dagObjects=dagObjects):
+        nodeFn.setObject(mobject)
+        obj = None
+        attr_dict = {}
+        for i in range(nodeFn.attributeCount()):
+            attrObj = nodeFn.attribute(i)
+            attrFn.setObject(attrObj)
+            if userDefined and not attrFn.isDynamic():
+                continue
+            attr = attrFn.name()
+            if attr in attr_dict or not matches(attr):
+                continue
+
+            if obj is None:
+                obj = _apiNodeName(mobject)
+            attr_dict[attr] = ApiTagHit(obj, attr, mobject, attrObj)
+        if attr_dict:
+            obj_dict[obj] = attr_dict
+
+    if progressBar:
+        progressBar.setValue(50.0)
+
+    return obj_dict
+
+
+def _indexSearch(terms, nodeType, userDefined, selection, dagObjects, searchExact, progressBar):
+    # answers from the scene tag index, which only holds the user defined attributes
+    if not userDefined:
+        log.debug('the tag index only holds user defined attributes, searching by attribute')
+        return _attributeSearch(terms, nodeType, userDefined, selection, dagObjects, searchExact, progressBar)
+
+    if progressBar:
+        progressBar.setValue(0.0)
+
+    hits = getTagIndex().find(terms, searchExact)
+    nodes = _scopeNodes([node for node, attrs in hits], nodeType=nodeType, selection=selection,
+                        dagObjects=dagObjects)
+    hits = dict(hits)
+
+    if progressBar:
+        progressBar.setValue(50.0)
+
+    return _describeHits([(node, hits[node]) for node in nodes])
+
+
+def getTagIndex():
+    """Gets the scene tag index, building it and attaching its callbacks on first use.
+
+    :return: The tag index kept current by scene callbacks.
+    :rtype: TagIndex
+    """
+    global _tagIndex
+    if _tagIndex is None:
+        _tagIndex = TagIndex()
+        _tagIndex.rebuild()
+    return _tagIndex
+
+
+def removeTagIndex():
+    """Detaches the callbacks of the scene tag index and drops it."""
+    global _tagIndex
+    if _tagIndex is not None:
+        _tagIndex.detach()
+        _tagIndex = None
+
+
+SEARCH_ENGINES = {'attributes': _attributeSearch,
+                  'scan': _scanSearch,
+                  'api': _apiSearch,
+                  'index': _indexSearch}
+
+
 def searchWithTerms(terms=tags.COMMON_TERMS,
                     nodeType=None,
                     userDefined=True,
                     selection=False,
                     dagObjects=False,
                     searchExact=True,
-                    progressBar=None):
+                    progressBar=None,
+                    engine='attributes'):
     """Searches for nodes with attributes containing the terms.
 
     :parameters:
@@ -103,63 +505,24 @@ def searchWithTerms(terms=tags.COMMON_TERMS,
         progressBar : QtWidgets.QProgressBar
             This will add progress to the progressBar starting from 0 and will max out at 50.
 
-    :return: The tagged nodes with the given terms.
+        engine : str
+            How the tagged nodes are found, one of SEARCH_ENGINES. "attributes" asks \
+            the scene for the attributes named exactly like each term and scans \
+            like "scan" for substring searches, "scan" lists the \
+            attributes of every node in scope and "api" walks the nodes in scope \
+            with OpenMaya function sets, reading the attribute types, values and \
+            connections without cmds. "index" answers from the scene tag index \
+            of getTagIndex in time proportional to the result. Default: attributes
+
+    :return: The tagged nodes with the given terms, {node: {attr: TagHit}}. The \
+             hits read their type, value, association and description when \
+             first asked for them, see resolveHits.
     :rtype: dict
     """
+    if engine not in SEARCH_ENGINES:
+        raise ValueError('unknown search engine {}, use one of {}'.format(engine, sorted(SEARCH_ENGINES)))
 
-    def _updateAttrDataDict(dict, attr, obj):
-        dict['name'] = attr
-        dict['type'] = cmds.getAttr('{}.{}'.format(obj, attr), type=True)
-        try:
-            value = str(cmds.getAttr('{}.{}'.format(obj, attr)))
-        except:
-            try:
-                value = str(cmds.listConnections('{}.{}'.format(obj, attr)))
-            except:
-                value = "HELP"
-        dict['value'] = value
-        dict['association'] = getTagAssociation(attr)
-        dict['description'] = getTagDescription(attr)
-
-
-    ### TODO need to move the searchExact outside the for loop and search \
-    ### by cmds.ls("*.attr") for speed purposes but leaving it alone for now.
-    obj_dict = {}
-
-    if nodeType:
-        obj_list = cmds.ls(type=nodeType, sl=selection, dag=dagObjects)
-    else:
-        obj_list = cmds.ls(sl=selection, dag=dagObjects)
-
-    if progressBar:
-        x = (1.0 / len(obj_list)) * 50.0
-
-        progress = 0.0
-        progressBar.setValue(progress)
-
-    for obj in obj_list:
-        attr_dict = {}
-        attrs = cmds.listAttr(obj, ud=userDefined)
-        if attrs:
-            for attr in attrs:
-                attr_data_dict = {}
-                for term in terms:
-                    if searchExact:
-                        if term == attr and attr not in attr_dict:
-                            _updateAttrDataDict(attr_data_dict, attr, obj)
-                    else:
-                        if term.lower() in attr.lower() and attr not in attr_dict:
-                            _updateAttrDataDict(attr_data_dict, attr, obj)
-                if attr_data_dict:
-                    attr_dict[attr] = attr_data_dict
-        if attr_dict:
-            obj_dict[obj] = attr_dict
-
-        if progressBar:
-            progress += x
-            progressBar.setValue(progress)
-
-    return obj_dict
+    return SEARCH_ENGINES[engine](terms, nodeType, userDefined, selection, dagObjects, searchExact, progressBar)
 
 
 def createTagMetaData(node):
@@ -550,4 +913,474 @@ class Tag(object):
             return False
 
 
+class TagHit(Mapping):
+    """The data of one search hit, read from the scene when a key is first asked for.
+
+    Holds the name up front, the type, value, association and description \
+    are read on first access and kept, so a search does not pay for the rows \
+    nobody looks at. Reading a value goes through the read, indexing, get, \
+    values, items and dict(hit) all see the five keys, in only checks the \
+    key names and reads nothing. It is not a dict, export asDict or \
+    resolveHits with json.
 
+        hit = TagHit('pCube1', 'rigHookup')
+        hit['value']
+        hit.asDict()
+    """
+
+    KEYS = ('name', 'type', 'value', 'association', 'description')
+
+    def __init__(self, obj, attr):
+        self.obj = obj
+        self.attr = attr
+        self._data = {'name': attr}
+
+    def __getitem__(self, key):
+        if key in self._data:
+            return self._data[key]
+        if key == 'type':
+            value = self._readType()
+        elif key == 'value':
+            value = self._readValue()
+        elif key == 'association':
+            value = getTagAssociation(self.attr)
+        elif key == 'description':
+            value = getTagDescription(self.attr)
+        else:
+            raise KeyError(key)
+        self._data[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(type(self).__name__, self.obj, self.attr)
+
+    @property
+    def plug(self):
+        return '{}.{}'.format(self.obj, self.attr)
+
+    @property
+    def resolved(self):
+        return all(key in self._data for key in self.KEYS)
+
+    def resolve(self):
+        """Reads every key not read yet."""
+        for key in self.KEYS:
+            self[key]
+        return self
+
+    def asDict(self):
+        """Reads every key and returns them in a plain dict."""
+        return dict((key, self[key]) for key in self.KEYS)
+
+    def _readType(self):
+        if not cmds.objExists(self.plug):
+            return 'N/A'
+        return cmds.getAttr(self.plug, type=True)
+
+    def _readValue(self):
+        try:
+            return str(cmds.getAttr(self.plug))
+        except:
+            try:
+                return str(cmds.listConnections(self.plug))
+            except:
+                return "HELP"
+
+
+class ApiTagHit(TagHit):
+    """A search hit of the api engine, reading its type and value through the attribute MObject.
+
+    The types the api reading does not cover go through cmds like a TagHit.
+    """
+
+    def __init__(self, obj, attr, mobject, attrObj):
+        super(ApiTagHit, self).__init__(obj, attr)
+        self.handle = om.MObjectHandle(mobject)
+        self.attrObj = attrObj
+
+    def _readType(self):
+        if self.handle.isAlive():
+            attrType = _apiAttrType(self.attrObj)
+            if attrType:
+                return attrType
+        return super(ApiTagHit, self)._readType()
+
+    def _readValue(self):
+        value = None
+        if self.handle.isAlive():
+            try:
+                plug = om.MFnDependencyNode(self.handle.object()).findPlug(self.attrObj, False)
+                value = _apiValue(plug, self['type'])
+            except RuntimeError:
+                value = None
+        if value is None:
+            return super(ApiTagHit, self)._readValue()
+        return value
+
+
+class TagIndex(object):
+    """In memory index of the user defined attributes in the scene, node to tags and tag to nodes.
+
+    Only the nodes carrying tags are kept, as object handles, so their names \
+    are read when a search returns them and node renames need no update. \
+    Each tagged node has an attribute changed callback following its tags \
+    being added, removed and renamed, untagged nodes have none. Created nodes \
+    and the nodes named by an addAttr, deleteAttr or renameAttr command, or by \
+    the command an undo or redo replays, are queued and read again at the \
+    next search. Scene open and new rebuild it.
+
+    Object handle hash codes are not unique, nodes are keyed by a counter and \
+    the handles sharing a hash code are told apart by comparing them.
+
+        index = TagIndex()
+        index.rebuild()
+        index.find(['rigHookup'])
+        index.validate()
+    """
+
+    # commands that can give a node a tag or take one away, their node arguments are read again
+    TAG_COMMANDS = ('addAttr', 'deleteAttr', 'renameAttr')
+
+    def __init__(self):
+        self.nodeTags = {}
+        self.tagNodes = {}
+        self.handles = {}
+        self.nodeCallbacks = {}
+        self.pending = {}
+        self.hashKeys = {}
+        self.keyHashes = {}
+        self.keyIds = itertools.count(1)
+        self.sceneCallbacks = []
+        self.paused = False
+
+    def __len__(self):
+        return len(self.nodeTags)
+
+    def _key(self, handle, create=False):
+        # the key of a tagged or queued node, a new one is only made when asked for
+        hashCode = handle.hashCode()
+        for key in self.hashKeys.get(hashCode, ()):
+            other = self.handles.get(key) or self.pending.get(key)
+            if other is not None and other == handle:
+                return key
+        if not create:
+            return None
+        key = next(self.keyIds)
+        self.hashKeys.setdefault(hashCode, []).append(key)
+        self.keyHashes[key] = hashCode
+        return key
+
+    def _forgetKey(self, key):
+        hashCode = self.keyHashes.pop(key, None)
+        keys = self.hashKeys.get(hashCode)
+        if keys is not None and key in keys:
+            keys.remove(key)
+            if not keys:
+                del self.hashKeys[hashCode]
+
+    @staticmethod
+    def _readTags(mobject):
+        nodeFn = om.MFnDependencyNode(mobject)
+        attrFn = om.MFnAttribute()
+        found = set()
+        for i in range(nodeFn.attributeCount()):
+            attrFn.setObject(nodeFn.attribute(i))
+            if attrFn.isDynamic():
+                found.add(attrFn.name())
+        return found
+
+    def _scan(self):
+        # (key, node, tags) of every node in the scene, untagged nodes not in the index have no key
+        scanned = []
+        nodeIter = om.MItDependencyNodes()
+        while not nodeIter.isDone():
+            mobject = nodeIter.thisNode()
+            scanned.append((self._key(om.MObjectHandle(mobject)), mobject, self._readTags(mobject)))
+            nodeIter.next()
+        return scanned
+
+    @staticmethod
+    def _commandNodes(command):
+        # the existing nodes named by the arguments of a mel command, flag values that are not nodes drop out
+        nodes = []
+        for token in command.replace(';', ' ').split()[1:]:
+            token = token.strip('"\'')
+            if not token or token.startswith('-'):
+                continue
+            selectionList = om.MSelectionList()
+            try:
+                selectionList.add(token.split('.', 1)[0])
+            except RuntimeError:
+                continue
+            for i in range(selectionList.length()):
+                mobject = om.MObject()
+                selectionList.getDependNode(i, mobject)
+                nodes.append(mobject)
+        return nodes
+
+    @staticmethod
+    def _selectedNodes():
+        selectionList = om.MSelectionList()
+        om.MGlobal.getActiveSelectionList(selectionList)
+        nodes = []
+        for i in range(selectionList.length()):
+            mobject = om.MObject()
+            selectionList.getDependNode(i, mobject)
+            nodes.append(mobject)
+        return nodes
+
+    def _addTag(self, key, tag):
+        self.nodeTags.setdefault(key, set()).add(tag)
+        self.tagNodes.setdefault(tag, set()).add(key)
+
+    def _removeTag(self, key, tag):
+        nodeTags = self.nodeTags.get(key)
+        if nodeTags is not None:
+            nodeTags.discard(tag)
+            if not nodeTags:
+                del self.nodeTags[key]
+        tagNodes = self.tagNodes.get(tag)
+        if tagNodes is not None:
+            tagNodes.discard(key)
+            if not tagNodes:
+                del self.tagNodes[tag]
+
+    def _watch(self, key, handle):
+        self.handles[key] = handle
+        if self.sceneCallbacks and key not in self.nodeCallbacks:
+            self.nodeCallbacks[key] = om.MNodeMessage.addAttributeChangedCallback(handle.object(),
+                                                                                 self._attributeChanged)
+
+    def _unwatch(self, key):
+        # drops an untagged node, its key goes unless the node is queued
+        self.handles.pop(key, None)
+        callbackId = self.nodeCallbacks.pop(key, None)
+        if callbackId is not None:
+            om.MMessage.removeCallback(callbackId)
+        if key not in self.pending:
+            self._forgetKey(key)
+
+    def queueNode(self, mobject):
+        """Queues a node to be read again at the next search."""
+        handle = om.MObjectHandle(mobject)
+        key = self._key(handle, create=True)
+        self.pending[key] = handle
+
+    def addNode(self, mobject):
+        """Indexes the user defined attributes of a node, a tagged node is kept and watched."""
+        handle = om.MObjectHandle(mobject)
+        nodeTags = self._readTags(mobject)
+        key = self._key(handle, create=bool(nodeTags))
+        if key is None:
+            return
+        self.pending.pop(key, None)
+        for tag in self.nodeTags.get(key, set()) - nodeTags:
+            self._removeTag(key, tag)
+        for tag in nodeTags:
+            self._addTag(key, tag)
+        if nodeTags:
+            self._watch(key, handle)
+        else:
+            self._unwatch(key)
+
+    def removeNode(self, mobject):
+        """Drops a node from the index and removes its attribute callback."""
+        key = self._key(om.MObjectHandle(mobject))
+        if key is None:
+            return
+        self.pending.pop(key, None)
+        for tag in list(self.nodeTags.get(key, ())):
+            self._removeTag(key, tag)
+        self._unwatch(key)
+
+    def build(self):
+        """Indexes every node of the scene."""
+        self.clear()
+        nodeIter = om.MItDependencyNodes()
+        while not nodeIter.isDone():
+            self.addNode(nodeIter.thisNode())
+            nodeIter.next()
+        log.debug('tag index built with %s tagged nodes and %s tags', len(self.nodeTags), len(self.tagNodes))
+
+    def refresh(self):
+        """Reads the nodes queued since the last search."""
+        for key, handle in list(self.pending.items()):
+            if handle.isAlive():
+                self.addNode(handle.object())
+                continue
+            del self.pending[key]
+            if key not in self.handles:
+                self._forgetKey(key)
+
+    def clear(self):
+        for callbackId in self.nodeCallbacks.values():
+            om.MMessage.removeCallback(callbackId)
+        self.nodeCallbacks = {}
+        self.nodeTags = {}
+        self.tagNodes = {}
+        self.handles = {}
+        self.pending = {}
+        self.hashKeys = {}
+        self.keyHashes = {}
+
+    def attach(self):
+        """Adds the scene callbacks keeping the index current and watches the tagged nodes."""
+        if self.sceneCallbacks:
+            return
+        self.sceneCallbacks = [
+            om.MDGMessage.addNodeAddedCallback(self._nodeAdded, 'dependNode'),
+            om.MDGMessage.addNodeRemovedCallback(self._nodeRemoved, 'dependNode'),
+            om.MCommandMessage.addCommandCallback(self._commandRan),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeOpen, self._pause),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeNew, self._pause),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, self._sceneChanged),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, self._sceneChanged)]
+        for key, handle in list(self.handles.items()):
+            if handle.isAlive():
+                self._watch(key, handle)
+
+    def detach(self):
+        """Removes every callback of the index, the index stops following the scene."""
+        for callbackId in self.sceneCallbacks:
+            om.MMessage.removeCallback(callbackId)
+        self.sceneCallbacks = []
+        for callbackId in self.nodeCallbacks.values():
+            om.MMessage.removeCallback(callbackId)
+        self.nodeCallbacks = {}
+
+    def rebuild(self):
+        """Rebuilds the index from the scene and attaches its callbacks."""
+        self.attach()
+        self.paused = False
+        self.build()
+
+    def _pause(self, clientData=None):
+        # a scene open or new replaces every node, the index is rebuilt once afterwards
+        self.paused = True
+
+    def _sceneChanged(self, clientData=None):
+        self.rebuild()
+
+    def _nodeAdded(self, mobject, clientData=None):
+        # fires for every created node, the read waits for the next search
+        if not self.paused:
+            self.queueNode(mobject)
+
+    def _nodeRemoved(self, mobject, clientData=None):
+        if not self.paused:
+            self.removeNode(mobject)
+
+    def _commandRan(self, command, clientData=None):
+        # queues the nodes a tag command names, an addAttr without nodes works on the selection
+        if self.paused:
+            return
+        if command.startswith(('undo', 'redo')):
+            # the callback may come before or after the replay, both names are read
+            commands = [cmds.undoInfo(q=True, undoName=True) or '', cmds.undoInfo(q=True, redoName=True) or '']
+        else:
+            commands = [command]
+        for command in commands:
+            if not command.startswith(self.TAG_COMMANDS):
+                continue
+            nodes = self._commandNodes(command)
+            if not nodes and command.startswith('addAttr'):
+                nodes = self._selectedNodes()
+            for mobject in nodes:
+                self.queueNode(mobject)
+
+    def _attributeChanged(self, msg, plug, otherPlug, clientData=None):
+        # only sent for tagged nodes
+        if self.paused:
+            return
+        if not msg & (om.MNodeMessage.kAttributeAdded | om.MNodeMessage.kAttributeRemoved |
+                      om.MNodeMessage.kAttributeRenamed):
+            return
+        attrFn = om.MFnAttribute(plug.attribute())
+        if not attrFn.isDynamic():
+            return
+        key = self._key(om.MObjectHandle(plug.node()))
+        if key is None:
+            return
+        if msg & om.MNodeMessage.kAttributeAdded:
+            self._addTag(key, attrFn.name())
+        elif msg & om.MNodeMessage.kAttributeRemoved:
+            self._removeTag(key, attrFn.name())
+            if key not in self.nodeTags:
+                self._unwatch(key)
+        else:
+            # the old name is not sent, the node is read again
+            self.addNode(plug.node())
+
+    def nodeName(self, key):
+        handle = self.handles.get(key)
+        if handle is None or not handle.isAlive():
+            return None
+        return _apiNodeName(handle.object())
+
+    def find(self, terms, searchExact=True):
+        """Finds the nodes carrying the terms.
+
+        Only the matching tags and their nodes are visited, exact terms are \
+        looked up directly and substring terms are tested against the distinct \
+        tag names.
+
+        :parameters:
+            terms : list
+                The terms to look for.
+
+            searchExact : bool
+                If True, only finds tags named exactly like a term. Default: True
+
+        :return: (node, tags) pairs of the nodes carrying the terms.
+        :rtype: list
+        """
+        self.refresh()
+        if searchExact:
+            found = [term for term in set(terms) if term in self.tagNodes]
+        else:
+            matches = compileTerms(terms, searchExact)
+            found = [tag for tag in self.tagNodes if matches(tag)]
+
+        nodeHits = {}
+        for tag in found:
+            for key in self.tagNodes[tag]:
+                nodeHits.setdefault(key, []).append(tag)
+
+        hits = []
+        for key, nodeTags in nodeHits.items():
+            name = self.nodeName(key)
+            if name is not None:
+                hits.append((name, sorted(nodeTags)))
+        return hits
+
+    def validate(self):
+        """Compares the index with a fresh scan of the scene.
+
+        :return: The differences found, empty when the index is current.
+        :rtype: list
+        """
+        self.refresh()
+        problems = []
+        scanned = self._scan()
+        for key, mobject, scannedTags in scanned:
+            indexedTags = self.nodeTags.get(key, set())
+            if scannedTags != indexedTags:
+                problems.append('{} tags {} in the scene, {} in the index'.format(_apiNodeName(mobject),
+                                                                                 sorted(scannedTags),
+                                                                                 sorted(indexedTags)))
+        for key in set(self.nodeTags) - set(key for key, mobject, scannedTags in scanned):
+            problems.append('{} indexed node no longer in the scene'.format(self.nodeName(key) or key))
+        for tag, keys in self.tagNodes.items():
+            for key in keys:
+                if tag not in self.nodeTags.get(key, ()):
+                    problems.append('tag {} maps to a node not carrying it'.format(tag))
+        return problems